@@ -0,0 +1,104 @@
+"""
+Concurrency benchmark for the Supabase data-access layer.
+
+Runs a local stub PostgREST server that answers every request after a fixed
+latency, then drives the same number of concurrent "request handlers" through
+a single event loop (one uvicorn worker) twice:
+
+* before: the synchronous ``supabase.Client`` called inside ``async def``
+* after:  the ``supabase.AsyncClient`` used by ``database.get_supabase()``
+
+Usage (from backend/api):
+    python -m benchmarks.bench_db_concurrency --latency-ms 20 --concurrency 50 --requests 500
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from supabase import AsyncClient, Client
+
+# Any JWT-shaped string passes the client's key validation
+DUMMY_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    """Start a PostgREST stand-in that sleeps `latency` seconds per request"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = json.dumps([{"id": "00000000-0000-0000-0000-000000000000"}]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def run_sync_client(url: str, concurrency: int, total: int) -> float:
+    client = Client(url, DUMMY_KEY)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def handler():
+        async with semaphore:
+            # Blocks the event loop for the whole round trip
+            client.table('users').select('*').eq('id', 'x').execute()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def run_async_client(url: str, concurrency: int, total: int) -> float:
+    client = AsyncClient(url, DUMMY_KEY)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def handler():
+        async with semaphore:
+            await client.table('users').select('*').eq('id', 'x').execute()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handler() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    await client.postgrest.aclose()
+    return total / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated PostgREST round trip")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent in-flight requests")
+    parser.add_argument("--requests", type=int, default=500, help="Total requests per run")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.latency_ms / 1000)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        sync_rps = asyncio.run(run_sync_client(url, args.concurrency, args.requests))
+        async_rps = asyncio.run(run_async_client(url, args.concurrency, args.requests))
+    finally:
+        server.shutdown()
+
+    print(f"latency={args.latency_ms}ms concurrency={args.concurrency} requests={args.requests}")
+    print(f"{'client':<22}{'req/s per worker':>18}")
+    print(f"{'sync Client (before)':<22}{sync_rps:>18.1f}")
+    print(f"{'AsyncClient (after)':<22}{async_rps:>18.1f}")
+    print(f"speedup: {async_rps / sync_rps:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
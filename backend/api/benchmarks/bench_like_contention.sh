@@ -0,0 +1,113 @@
+#!/usr/bin/env bash
+# Like-counter contention benchmark: hundreds of concurrent likers on one post.
+#
+# Builds a throwaway `bench_likes` schema with copies of posts/post_likes,
+# post_like_shards and the like-count trigger from supabase/schema.sql, then
+# drives it with pgbench twice: with the row-level counter (every like updates
+# the single posts row) and with striped counters. Run it against a scratch
+# database, never production:
+#
+#     DATABASE_URL=postgres://... benchmarks/bench_like_contention.sh [clients] [seconds]
+#
+# Compare the tps / latency lines; the final check folds the stripes and
+# verifies likes_count matches the number of like rows.
+set -euo pipefail
+
+CLIENTS=${1:-200}
+DURATION=${2:-30}
+THREADS=${THREADS:-8}
+: "${DATABASE_URL:?Set DATABASE_URL to a scratch database}"
+
+WORKDIR=$(mktemp -d)
+trap 'rm -rf "$WORKDIR"' EXIT
+
+setup() {
+    psql "$DATABASE_URL" -q -v ON_ERROR_STOP=1 <<'SQL'
+DROP SCHEMA IF EXISTS bench_likes CASCADE;
+CREATE SCHEMA bench_likes;
+SET search_path = bench_likes;
+
+CREATE TABLE posts (
+    id BIGINT PRIMARY KEY,
+    likes_count INTEGER DEFAULT 0
+);
+CREATE TABLE post_likes (
+    id BIGSERIAL PRIMARY KEY,
+    post_id BIGINT REFERENCES posts(id) ON DELETE CASCADE,
+    user_id BIGINT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE(post_id, user_id)
+);
+CREATE TABLE post_like_shards (
+    post_id BIGINT NOT NULL,
+    shard SMALLINT NOT NULL,
+    delta INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (post_id, shard)
+);
+
+-- Same body as update_post_likes_count() in schema.sql
+CREATE FUNCTION update_post_likes_count()
+RETURNS TRIGGER AS $$
+DECLARE
+    sharded BOOLEAN := current_setting('app.settings.like_counter_mode', true) = 'sharded';
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF sharded THEN
+            INSERT INTO bench_likes.post_like_shards (post_id, shard, delta)
+            VALUES (NEW.post_id, floor(random() * 16)::SMALLINT, 1)
+            ON CONFLICT (post_id, shard) DO UPDATE SET delta = post_like_shards.delta + 1;
+        ELSE
+            UPDATE bench_likes.posts SET likes_count = likes_count + 1 WHERE id = NEW.post_id;
+        END IF;
+        RETURN NEW;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF sharded THEN
+            INSERT INTO bench_likes.post_like_shards (post_id, shard, delta)
+            VALUES (OLD.post_id, floor(random() * 16)::SMALLINT, -1)
+            ON CONFLICT (post_id, shard) DO UPDATE SET delta = post_like_shards.delta - 1;
+        ELSE
+            UPDATE bench_likes.posts SET likes_count = likes_count - 1 WHERE id = OLD.post_id;
+        END IF;
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+CREATE TRIGGER trigger_update_post_likes_count AFTER INSERT OR DELETE ON post_likes
+FOR EACH ROW EXECUTE FUNCTION update_post_likes_count();
+
+INSERT INTO posts (id) VALUES (1);
+SQL
+}
+
+check() {
+    psql "$DATABASE_URL" -q -v ON_ERROR_STOP=1 -At <<'SQL'
+WITH claimed AS (
+    DELETE FROM bench_likes.post_like_shards RETURNING post_id, delta
+), totals AS (
+    SELECT post_id, SUM(delta) AS delta FROM claimed GROUP BY post_id
+)
+UPDATE bench_likes.posts SET likes_count = posts.likes_count + totals.delta
+FROM totals WHERE posts.id = totals.post_id;
+SELECT 'likes_count=' || likes_count || ' like_rows=' || (SELECT COUNT(*) FROM bench_likes.post_likes)
+FROM bench_likes.posts WHERE id = 1;
+SQL
+}
+
+# Each transaction is one like from a random user on the same post
+cat > "$WORKDIR/like.sql" <<'SQL'
+\set uid random(1, 1000000000)
+INSERT INTO bench_likes.post_likes (post_id, user_id) VALUES (1, :uid) ON CONFLICT DO NOTHING;
+SQL
+
+for mode in row sharded; do
+    setup
+    echo "== like_counter_mode=$mode clients=$CLIENTS duration=${DURATION}s"
+    PGOPTIONS="-c app.settings.like_counter_mode=$mode" \
+        pgbench -n -c "$CLIENTS" -j "$THREADS" -T "$DURATION" -f "$WORKDIR/like.sql" "$DATABASE_URL" \
+        | grep -E "^(tps|latency)"
+    check
+done
+
+psql "$DATABASE_URL" -q -c "DROP SCHEMA bench_likes CASCADE"
@@ -0,0 +1,94 @@
+"""
+Login throughput benchmark for password verification.
+
+Simulates bursts of concurrent logins on a single event loop (one uvicorn
+worker) and compares:
+
+* inline: ``verify_password`` called directly inside the handler (before)
+* pool:   ``verify_password_async`` on the bounded hashing pool (after)
+
+For each concurrency level it reports logins/second, the worst event-loop
+stall seen by a 10ms heartbeat task, and how many logins were rejected with
+"busy" (HTTP 503 in the API).
+
+Usage (from backend/api):
+    python -m benchmarks.bench_password_pool --levels 1 4 16 64 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import time
+
+# utils.security loads settings at import time; the benchmark needs no real services
+for name in ("SUPABASE_URL", "SUPABASE_KEY", "SUPABASE_SERVICE_ROLE_KEY",
+             "TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN", "TWILIO_VERIFY_SERVICE_SID"):
+    os.environ.setdefault(name, "benchmark")
+
+from passlib.hash import bcrypt  # noqa: E402
+
+from utils.security import PasswordHasherBusy, verify_password, verify_password_async  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+async def heartbeat(stop: asyncio.Event, stalls: list):
+    """Record how late a 10ms sleep wakes up, i.e. how long the loop was blocked"""
+    interval = 0.01
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - start - interval)
+
+
+async def run_level(mode: str, concurrency: int, total: int, hashed: str) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    stop = asyncio.Event()
+    stalls = []
+    rejected = 0
+
+    async def login():
+        nonlocal rejected
+        async with semaphore:
+            if mode == "inline":
+                verify_password(PASSWORD, hashed)
+            else:
+                try:
+                    await verify_password_async(PASSWORD, hashed)
+                except PasswordHasherBusy:
+                    rejected += 1
+
+    beat = asyncio.create_task(heartbeat(stop, stalls))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await beat
+
+    return {
+        "logins_per_s": (total - rejected) / elapsed,
+        "max_stall_ms": max(stalls, default=0.0) * 1000,
+        "rejected": rejected
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 64], help="Concurrent logins")
+    parser.add_argument("--requests", type=int, default=32, help="Logins per level")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor of the stored hash")
+    args = parser.parse_args()
+
+    hashed = bcrypt.using(rounds=args.rounds).hash(PASSWORD)
+
+    print(f"bcrypt rounds={args.rounds} requests per level={args.requests}")
+    print(f"{'mode':<8}{'concurrency':>12}{'logins/s':>12}{'max stall ms':>14}{'rejected':>10}")
+    for mode in ("inline", "pool"):
+        for level in args.levels:
+            result = asyncio.run(run_level(mode, level, args.requests, hashed))
+            print(f"{mode:<8}{level:>12}{result['logins_per_s']:>12.1f}"
+                  f"{result['max_stall_ms']:>14.1f}{result['rejected']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Load test for /notifications/stream: concurrent open SSE streams on one worker.
+
+Starts the app under uvicorn in a background thread (one worker, its own event
+loop), opens --streams authenticated EventSource-style clients from the main
+thread, and reports:
+
+* connect time and resident memory per stream (the process hosts both the
+  server and the clients, so the per-stream figure is an upper bound)
+* fan-out latency p50/p99 when one notification is published to every user
+* that idle streams receive heartbeats (with --heartbeat seconds between them)
+
+No database is needed: the stream only verifies the JWT, and no client sends
+Last-Event-ID.
+
+Usage (from backend/api):
+    python -m benchmarks.bench_sse_streams --streams 2000
+"""
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import threading
+import time
+import uuid
+from datetime import datetime
+
+# The app builds its Supabase clients at import time; the benchmark never calls them
+DUMMY_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+for name in ("SUPABASE_KEY", "SUPABASE_SERVICE_ROLE_KEY"):
+    os.environ.setdefault(name, DUMMY_KEY)
+for name in ("TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN", "TWILIO_VERIFY_SERVICE_SID"):
+    os.environ.setdefault(name, "benchmark")
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+
+from config import settings  # noqa: E402
+from main import app  # noqa: E402
+from services.notification_broadcaster import notification_broadcaster  # noqa: E402
+from utils.security import generate_token_pair  # noqa: E402
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as status_file:
+        for line in status_file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def start_server() -> tuple:
+    """Run uvicorn in a thread; returns (server, loop, port)"""
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off", backlog=4096)
+    server = uvicorn.Server(config)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_until_complete, args=(server.serve(),), daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, loop, port
+
+
+class StreamClient:
+    """One open stream; records when events arrive"""
+
+    def __init__(self, client: httpx.AsyncClient, url: str):
+        self.client = client
+        self.url = url
+        self.opened = asyncio.Event()
+        self.notification_at = None
+        self.notified = asyncio.Event()
+        self.heartbeats = 0
+        self.task = asyncio.create_task(self._read())
+
+    async def _read(self):
+        async with self.client.stream("GET", self.url) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("retry:"):
+                    self.opened.set()
+                elif line.startswith(": heartbeat"):
+                    self.heartbeats += 1
+                elif line == "event: notification":
+                    self.notification_at = time.perf_counter()
+                    self.notified.set()
+
+
+async def run(streams: int, batch: int, heartbeat: int):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < streams * 2 + 100:
+        print(f"warning: open file limit {hard} is too low for {streams} streams")
+
+    settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS = heartbeat
+    server, server_loop, port = start_server()
+    user_ids = [str(uuid.uuid4()) for _ in range(streams)]
+    client = httpx.AsyncClient(timeout=None, limits=httpx.Limits(max_connections=None, max_keepalive_connections=0))
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    clients = []
+    for offset in range(0, streams, batch):
+        chunk = [
+            StreamClient(client, f"http://127.0.0.1:{port}/notifications/stream?token="
+                         + generate_token_pair(user_id, "+15555550100")["access_token"])
+            for user_id in user_ids[offset:offset + batch]
+        ]
+        await asyncio.gather(*(stream.opened.wait() for stream in chunk))
+        clients += chunk
+    connect_seconds = time.perf_counter() - start
+    while notification_broadcaster.stats()["connections"] < streams:
+        await asyncio.sleep(0.05)
+    connected = rss_mb()
+
+    # Idle long enough for every stream to get a heartbeat
+    await asyncio.sleep(heartbeat + 1)
+    with_heartbeat = sum(1 for stream in clients if stream.heartbeats)
+
+    # Fan-out: one notification per user, published on the server's loop
+    published_at = time.perf_counter()
+
+    def publish_all():
+        now = datetime.utcnow().isoformat()
+        notification_broadcaster.publish_notifications([{
+            "id": str(uuid.uuid4()), "user_id": user_id, "type": "post_like",
+            "title": "New like", "message": "Someone liked your post", "is_read": False, "created_at": now
+        } for user_id in user_ids])
+
+    server_loop.call_soon_threadsafe(publish_all)
+    await asyncio.gather(*(stream.notified.wait() for stream in clients))
+    latencies = sorted((stream.notification_at - published_at) * 1000 for stream in clients)
+
+    for stream in clients:
+        stream.task.cancel()
+    await asyncio.gather(*(stream.task for stream in clients), return_exceptions=True)
+    await client.aclose()
+    server.should_exit = True
+
+    print(f"streams={streams}")
+    print(f"connect: {connect_seconds:.2f}s ({streams / connect_seconds:.0f}/s)")
+    print(f"memory: +{connected - baseline:.1f} MB "
+          f"({(connected - baseline) * 1024 / streams:.1f} KB per stream, client+server)")
+    print(f"heartbeat received by {with_heartbeat}/{streams} idle streams")
+    print(f"fan-out to all: p50 {statistics.median(latencies):.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, last {latencies[-1]:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=2000, help="Concurrent open SSE streams")
+    parser.add_argument("--batch", type=int, default=250, help="Streams opened concurrently")
+    parser.add_argument("--heartbeat", type=int, default=2, help="Heartbeat interval in seconds for the run")
+    args = parser.parse_args()
+    asyncio.run(run(args.streams, args.batch, args.heartbeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Memory benchmark for POST /upload/: concurrent 10MB uploads on one worker.
+
+Starts the API in a child process (one uvicorn worker) with a stub storage
+server in the same process that discards what it receives, then sends
+--concurrency simultaneous uploads of a ~10MB image and samples the child's
+resident memory. The same load is sent to a copy of the previous handler
+(`await file.read()` before any check) mounted at /bench/buffered for
+comparison, and a 50MB upload is sent to both to show how much of an oversized
+body each one reads before rejecting it.
+
+No database is needed: authentication is overridden in the child process.
+
+Usage (from backend/api):
+    python -m benchmarks.bench_upload_memory --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+# The app builds its Supabase clients at import time; they point at the stub
+DUMMY_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+for name in ("SUPABASE_KEY", "SUPABASE_SERVICE_ROLE_KEY"):
+    os.environ.setdefault(name, DUMMY_KEY)
+for name in ("TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN", "TWILIO_VERIFY_SERVICE_SID"):
+    os.environ.setdefault(name, "benchmark")
+
+import httpx  # noqa: E402
+
+FILE_SIZE = 10 * 1024 * 1024 - 1024
+OVERSIZED = 50 * 1024 * 1024
+PNG_HEADER = b'\x89PNG\r\n\x1a\n'
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def serve(port: int, storage_port: int):
+    """Child process: stub storage plus the API with auth overridden"""
+    import uvicorn
+    from fastapi import Depends, File, HTTPException, UploadFile
+
+    async def storage_app(scope, receive, send):
+        # Discard the body as it arrives, like a remote object store would
+        if scope["type"] != "http":
+            return
+        more = True
+        while more:
+            message = await receive()
+            more = message.get("more_body", False)
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": b'{"Key": "uploads/bench"}'})
+
+    storage = uvicorn.Server(uvicorn.Config(storage_app, host="127.0.0.1", port=storage_port,
+                                            log_level="warning", lifespan="off"))
+    threading.Thread(target=storage.run, daemon=True).start()
+
+    from main import app
+    from routers.auth import get_current_user_dependency
+
+    app.dependency_overrides[get_current_user_dependency] = lambda: {"id": "00000000-0000-0000-0000-000000000001"}
+
+    # The handler as it was before streaming: read everything, then check
+    @app.post("/bench/buffered")
+    async def buffered_upload(file: UploadFile = File(...), current_user: dict = Depends(get_current_user_dependency)):
+        content = await file.read()
+        if len(content) > 10 * 1024 * 1024:
+            raise HTTPException(status_code=400, detail="File too large")
+        return {"success": True, "size": len(content)}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status_file:
+        for line in status_file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class Sampler:
+    """Tracks the peak RSS of a process while active"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.peak = 0.0
+        self._running = False
+
+    def __enter__(self):
+        self.peak = rss_mb(self.pid)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while self._running:
+            self.peak = max(self.peak, rss_mb(self.pid))
+            time.sleep(0.005)
+
+    def __exit__(self, *exc):
+        self._running = False
+        self._thread.join()
+
+
+async def upload_all(client: httpx.AsyncClient, url: str, body: bytes, concurrency: int) -> list:
+    responses = await asyncio.gather(*(
+        client.post(url, files={"file": ("bench.png", body, "image/png")}) for _ in range(concurrency)
+    ))
+    return [response.status_code for response in responses]
+
+
+async def oversized(client: httpx.AsyncClient, url: str) -> tuple:
+    """Send a 50MB body without Content-Length; returns (status, seconds until the response)"""
+    async def body():
+        # Multipart framing written by hand so the client streams it in chunks
+        yield b'--bench\r\nContent-Disposition: form-data; name="file"; filename="big.png"\r\n'
+        yield b'Content-Type: image/png\r\n\r\n' + PNG_HEADER
+        chunk = b'\0' * (256 * 1024)
+        for _ in range(OVERSIZED // len(chunk)):
+            yield chunk
+        yield b'\r\n--bench--\r\n'
+
+    start = time.perf_counter()
+    try:
+        response = await client.post(url, content=body(),
+                                     headers={"content-type": "multipart/form-data; boundary=bench"})
+        status_code = response.status_code
+    except httpx.HTTPError:
+        # The server may close the connection while the client is still sending
+        status_code = "closed"
+    return status_code, time.perf_counter() - start
+
+
+async def run(concurrency: int):
+    port, storage_port = free_port(), free_port()
+    env = dict(os.environ, SUPABASE_URL=f"http://127.0.0.1:{storage_port}")
+    child = subprocess.Popen([sys.executable, "-m", "benchmarks.bench_upload_memory", "--serve",
+                              str(port), str(storage_port)], env=env)
+    try:
+        base = f"http://127.0.0.1:{port}"
+        async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=None)) as client:
+            for _ in range(200):
+                try:
+                    await client.get(f"{base}/health")
+                    break
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.1)
+
+            body = PNG_HEADER + b'\0' * (FILE_SIZE - len(PNG_HEADER))
+            idle = rss_mb(child.pid)
+            print(f"concurrency={concurrency}, file={FILE_SIZE / 1024 / 1024:.1f}MB, idle RSS {idle:.1f} MB")
+
+            for label, path in (("streaming", "/upload/"), ("buffered", "/bench/buffered")):
+                with Sampler(child.pid) as sampler:
+                    start = time.perf_counter()
+                    statuses = await upload_all(client, base + path, body, concurrency)
+                    seconds = time.perf_counter() - start
+                ok = sum(1 for code in statuses if code == 200)
+                print(f"{label:>9}: {ok}/{concurrency} ok in {seconds:.2f}s, "
+                      f"peak RSS +{sampler.peak - idle:.1f} MB "
+                      f"({(sampler.peak - idle) / concurrency:.2f} MB per upload)")
+                idle = rss_mb(child.pid)
+
+            for label, path in (("streaming", "/upload/"), ("buffered", "/bench/buffered")):
+                status_code, seconds = await oversized(client, base + path)
+                print(f"{label:>9}: 50MB upload -> {status_code} after {seconds:.2f}s")
+    finally:
+        child.terminate()
+        child.wait()
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == "--serve":
+        serve(int(sys.argv[2]), int(sys.argv[3]))
+        return
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=20, help="Simultaneous 10MB uploads")
+    args = parser.parse_args()
+    asyncio.run(run(args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
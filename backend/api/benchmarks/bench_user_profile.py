@@ -0,0 +1,146 @@
+"""
+Latency benchmark for GET /users/{user_id}.
+
+Runs a local stub PostgREST server that answers every request after a fixed
+latency and calls the profile handler directly, reporting p50/p99 for:
+
+* before: the lookups awaited one after another
+* after:  ``routers.users.get_user_profile``, which issues them concurrently
+
+The friend cache is cleared before each call so the friendship check always
+costs a round trip, as it does for a viewer's first visit.
+
+Usage (from backend/api):
+    python -m benchmarks.bench_user_profile --latency-ms 20 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Any JWT-shaped string passes the client's key validation
+DUMMY_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+VIEWER_ID = "00000000-0000-0000-0000-000000000001"
+PROFILE_ID = "00000000-0000-0000-0000-000000000002"
+
+PROFILE_ROW = {
+    "id": PROFILE_ID,
+    "first_name": "Bench",
+    "last_name": "User",
+    "username": "bench",
+    "avatar_url": None,
+    "bio": "",
+    "is_private": False,
+    "friend_count": 42,
+    "post_count": 42
+}
+
+
+def start_stub_server(latency: float) -> ThreadingHTTPServer:
+    """Start a PostgREST stand-in that sleeps `latency` seconds per request"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            table = urlparse(self.path).path.rsplit('/', 1)[-1]
+            rows = [PROFILE_ROW] if table == 'users' else []
+            body = json.dumps(rows).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Range", "*/42")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def sequential_profile(user_id: str, current_user: dict):
+    """The handler's previous shape: every lookup awaited in turn"""
+    from database import get_supabase
+    from services.friend_cache import friend_cache
+
+    supabase = get_supabase()
+    await supabase.table('users').select('*').eq('id', user_id).execute()
+    is_friend = await friend_cache.are_friends(current_user['id'], user_id)
+    if not is_friend:
+        await supabase.table('friend_requests').select('id').eq('sender_id', current_user['id']).eq(
+            'recipient_id', user_id
+        ).eq('status', 'pending').execute()
+    await supabase.table('friendships').select('id', count='exact').or_(
+        f"user1_id.eq.{user_id}",
+        f"user2_id.eq.{user_id}"
+    ).execute()
+    await supabase.table('posts').select('id', count='exact').eq('user_id', user_id).execute()
+
+
+async def measure(handler, total: int) -> list:
+    from services.friend_cache import friend_cache
+
+    current_user = {"id": VIEWER_ID}
+    samples = []
+    for _ in range(total):
+        friend_cache._cache.clear()
+        start = time.perf_counter()
+        await handler(PROFILE_ID, current_user)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(total: int):
+    from database import close_connections
+    from routers.users import get_user_profile
+
+    # Warm up the connection pool
+    await measure(get_user_profile, 5)
+    before = await measure(sequential_profile, total)
+    after = await measure(get_user_profile, total)
+    await close_connections()
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Simulated PostgREST round trip")
+    parser.add_argument("--requests", type=int, default=200, help="Profile requests per run")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.latency_ms / 1000)
+    # Point the app's clients at the stub before config is imported
+    os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["SUPABASE_KEY"] = DUMMY_KEY
+    os.environ["SUPABASE_SERVICE_ROLE_KEY"] = DUMMY_KEY
+    for name in ("TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN", "TWILIO_VERIFY_SERVICE_SID"):
+        os.environ.setdefault(name, "benchmark")
+
+    try:
+        before, after = asyncio.run(run(args.requests))
+    finally:
+        server.shutdown()
+
+    print(f"latency={args.latency_ms}ms requests={args.requests}")
+    print(f"{'handler':<24}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'sequential (before)':<24}{statistics.median(before):>10.1f}{percentile(before, 99):>10.1f}")
+    print(f"{'concurrent (after)':<24}{statistics.median(after):>10.1f}{percentile(after, 99):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
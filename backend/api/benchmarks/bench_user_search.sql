@@ -0,0 +1,100 @@
+-- User search benchmark over a 1M-row synthetic users table.
+--
+-- Compares the original unindexed `ILIKE '%q%'` OR-scan with the trigram-indexed,
+-- ranked query behind search_users(). Everything lives in a throwaway `bench`
+-- schema; run it against a scratch database, never production:
+--
+--     psql "$DATABASE_URL" -f benchmarks/bench_user_search.sql
+--
+-- Compare the "Execution Time" lines of each EXPLAIN ANALYZE pair.
+
+\timing on
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
+DROP SCHEMA IF EXISTS bench CASCADE;
+CREATE SCHEMA bench;
+
+CREATE TABLE bench.users (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    first_name VARCHAR(50) NOT NULL,
+    last_name VARCHAR(50) NOT NULL,
+    username VARCHAR(30),
+    avatar_url TEXT,
+    is_private BOOLEAN DEFAULT FALSE,
+    is_active BOOLEAN DEFAULT TRUE
+);
+
+-- 1M users drawn from small first/last name pools plus a numeric suffix
+INSERT INTO bench.users (first_name, last_name, username)
+SELECT f.name, l.name, lower(f.name || l.name) || n
+FROM generate_series(1, 1000000) AS n
+CROSS JOIN LATERAL (SELECT (ARRAY['Alex','Jordan','Taylor','Morgan','Casey','Riley','Jamie','Avery','Quinn','Harper',
+    'Rowan','Emerson','Finley','Sawyer','Reese','Parker','Dakota','Skyler','Elliot','Marlowe'])[1 + (n * 7) % 20] AS name) f
+CROSS JOIN LATERAL (SELECT (ARRAY['Smith','Johnson','Williams','Brown','Jones','Garcia','Miller','Davis','Rodriguez','Martinez',
+    'Hernandez','Lopez','Gonzalez','Wilson','Anderson','Thomas','Moore','Jackson','Martin','Lee'])[1 + (n * 13) % 20] || (n % 997) AS name) l;
+ANALYZE bench.users;
+
+-- Before: the original OR of three unanchored ILIKEs (sequential scan)
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT id, first_name, last_name, username, avatar_url
+FROM bench.users
+WHERE first_name ILIKE '%harper%' OR last_name ILIKE '%harper%' OR username ILIKE '%harper%'
+LIMIT 20;
+
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT id, first_name, last_name, username, avatar_url
+FROM bench.users
+WHERE first_name ILIKE '%zzqx%' OR last_name ILIKE '%zzqx%' OR username ILIKE '%zzqx%'
+LIMIT 20;
+
+-- After: the indexes from schema.sql
+CREATE INDEX ON bench.users USING gin (username gin_trgm_ops);
+CREATE INDEX ON bench.users USING gin (first_name gin_trgm_ops);
+CREATE INDEX ON bench.users USING gin (last_name gin_trgm_ops);
+CREATE INDEX ON bench.users USING gin ((first_name || ' ' || last_name) gin_trgm_ops);
+CREATE INDEX ON bench.users (lower(username) text_pattern_ops);
+CREATE INDEX ON bench.users (lower(first_name) text_pattern_ops);
+CREATE INDEX ON bench.users (lower(last_name) text_pattern_ops);
+ANALYZE bench.users;
+
+-- Ranked query body of search_users() for a selective username query
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT u.id, u.username,
+    (CASE
+        WHEN lower(u.username) = 'harpermiller42' THEN 3.0
+        WHEN lower(u.username) LIKE 'harpermiller42%' THEN 2.0
+        WHEN lower(u.first_name) LIKE 'harpermiller42%' OR lower(u.last_name) LIKE 'harpermiller42%' THEN 1.0
+        ELSE 0.0
+    END + GREATEST(similarity(u.username, 'harpermiller42'),
+                   similarity(u.first_name || ' ' || u.last_name, 'harpermiller42')))::REAL AS score
+FROM bench.users u
+WHERE u.is_active
+  AND (u.username ILIKE '%harpermiller42%'
+       OR u.first_name ILIKE '%harpermiller42%'
+       OR u.last_name ILIKE '%harpermiller42%'
+       OR (u.first_name || ' ' || u.last_name) % 'harpermiller42')
+ORDER BY score DESC, u.username
+LIMIT 20;
+
+-- Same query shape with no matches: the index answers without touching the heap
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT u.id
+FROM bench.users u
+WHERE u.is_active
+  AND (u.username ILIKE '%zzqx%'
+       OR u.first_name ILIKE '%zzqx%'
+       OR u.last_name ILIKE '%zzqx%'
+       OR (u.first_name || ' ' || u.last_name) % 'zzqx')
+LIMIT 20;
+
+-- Short-query branch of search_users(): a two-letter prefix on the pattern indexes
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT u.id, u.username
+FROM bench.users u
+WHERE u.is_active
+  AND (lower(u.username) LIKE 'zz%'
+       OR lower(u.first_name) LIKE 'zz%'
+       OR lower(u.last_name) LIKE 'zz%')
+ORDER BY u.username
+LIMIT 20;
+
+DROP SCHEMA bench CASCADE;
@@ -0,0 +1,139 @@
+"""
+Load test for /messages/ws: thousands of idle WebSocket connections on one worker.
+
+Starts the app under uvicorn in a background thread (one worker, its own event
+loop), opens --connections authenticated WebSocket clients from the main
+thread, and reports:
+
+* connect time and resident memory per connection (the process hosts both the
+  server and the clients, so the per-connection figure is an upper bound)
+* fan-out latency p50/p99 when one event is published to every connected user
+* ping round trip on a connection while all the others sit idle
+
+No database is needed: the endpoint only verifies the JWT.
+
+Usage (from backend/api):
+    python -m benchmarks.bench_ws_idle --connections 5000
+"""
+import argparse
+import asyncio
+import os
+import resource
+import statistics
+import threading
+import time
+import uuid
+
+# The app builds its Supabase clients at import time; the benchmark never calls them
+DUMMY_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark"
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+for name in ("SUPABASE_KEY", "SUPABASE_SERVICE_ROLE_KEY"):
+    os.environ.setdefault(name, DUMMY_KEY)
+for name in ("TWILIO_ACCOUNT_SID", "TWILIO_AUTH_TOKEN", "TWILIO_VERIFY_SERVICE_SID"):
+    os.environ.setdefault(name, "benchmark")
+
+import uvicorn  # noqa: E402
+from websockets.asyncio.client import connect  # noqa: E402
+
+from main import app  # noqa: E402
+from services.message_hub import message_hub  # noqa: E402
+from utils.security import generate_token_pair  # noqa: E402
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status") as status_file:
+        for line in status_file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def start_server() -> tuple:
+    """Run uvicorn in a thread; returns (server, loop, port)"""
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", lifespan="off",
+                            ws_ping_interval=None, backlog=4096)
+    server = uvicorn.Server(config)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_until_complete, args=(server.serve(),), daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, loop, port
+
+
+async def open_clients(port: int, user_ids: list, batch: int) -> list:
+    clients = []
+    for start in range(0, len(user_ids), batch):
+        chunk = user_ids[start:start + batch]
+        tokens = [generate_token_pair(user_id, "+15555550100")["access_token"] for user_id in chunk]
+        clients += await asyncio.gather(*(
+            connect(f"ws://127.0.0.1:{port}/messages/ws?token={token}", max_queue=None, ping_interval=None)
+            for token in tokens
+        ))
+    return clients
+
+
+async def run(connections: int, batch: int):
+    # Each client and its server side hold one socket each
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < connections * 2 + 100:
+        print(f"warning: open file limit {hard} is too low for {connections} connections")
+
+    server, server_loop, port = start_server()
+    user_ids = [str(uuid.uuid4()) for _ in range(connections)]
+
+    baseline = rss_mb()
+    start = time.perf_counter()
+    clients = await open_clients(port, user_ids, batch)
+    connect_seconds = time.perf_counter() - start
+    # Let the server finish registering every subscription
+    while message_hub.stats()["connections"] < connections:
+        await asyncio.sleep(0.05)
+    connected = rss_mb()
+
+    # Fan-out: publish one event per user from the server's loop, time each delivery
+    async def receive(client):
+        await client.recv()
+        return time.perf_counter()
+
+    receivers = [asyncio.create_task(receive(client)) for client in clients]
+    published_at = time.perf_counter()
+
+    def publish_all():
+        for user_id in user_ids:
+            message_hub.publish(user_id, {"type": "message", "message": {"content": "hi"}})
+
+    server_loop.call_soon_threadsafe(publish_all)
+    latencies = sorted((at - published_at) * 1000 for at in await asyncio.gather(*receivers))
+
+    # Ping round trip on one connection while the rest idle
+    pings = []
+    for _ in range(50):
+        ping_start = time.perf_counter()
+        await clients[0].send("ping")
+        await clients[0].recv()
+        pings.append((time.perf_counter() - ping_start) * 1000)
+
+    await asyncio.gather(*(client.close() for client in clients))
+    server.should_exit = True
+
+    print(f"connections={connections}")
+    print(f"connect: {connect_seconds:.2f}s ({connections / connect_seconds:.0f}/s)")
+    print(f"memory: +{connected - baseline:.1f} MB "
+          f"({(connected - baseline) * 1024 / connections:.1f} KB per connection, client+server)")
+    print(f"fan-out to all: p50 {statistics.median(latencies):.1f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.1f} ms, last {latencies[-1]:.1f} ms")
+    print(f"ping while idle: p50 {statistics.median(pings):.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=5000, help="Idle WebSocket connections to hold")
+    parser.add_argument("--batch", type=int, default=250, help="Connections opened concurrently")
+    args = parser.parse_args()
+    asyncio.run(run(args.connections, args.batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,73 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "Only Friends API"
     
+    # Feed settings
+    # "query": build the feed from posts on read; "timeline": fan-out-on-write home_timeline;
+    # "ring": k-way merge over per-author recent-post ring buffers
+    FEED_ENGINE: str = "query"
+    TIMELINE_MEMORY_SIZE: int = 500
+    TIMELINE_MEMORY_USERS: int = 10000
+    TIMELINE_MEMORY_TTL_SECONDS: int = 300
+    TIMELINE_BACKFILL_DEPTH: int = 500
+    FEED_RING_SIZE: int = 50
+    FEED_RING_AUTHORS: int = 50000
+    FEED_RING_TTL_SECONDS: int = 60
+    FEED_RING_WARM_ROWS: int = 1000
+    
+    # Password hashing pool settings
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 32
+    
+    # Cache settings
+    USER_CACHE_TTL_SECONDS: int = 60
+    USER_CACHE_MAX_SIZE: int = 10000
+    FRIEND_CACHE_TTL_SECONDS: int = 300
+    FRIEND_CACHE_MAX_USERS: int = 10000
+    NETWORK_INDEX_TTL_SECONDS: int = 600
+    NETWORK_INDEX_MAX_USERS: int = 2000
+    # User IDs per `in.()` filter when building an index (keeps request URLs short)
+    NETWORK_INDEX_ID_BATCH: int = 100
+    STORY_TRAY_TTL_SECONDS: int = 120
+    STORY_TRAY_MAX_VIEWERS: int = 10000
+    
+    # Like counters: "row" updates posts.likes_count per like; "sharded" writes
+    # striped deltas (must match app.settings.like_counter_mode in the database)
+    LIKE_COUNTER_MODE: str = "row"
+    LIKE_COUNTER_FOLD_SECONDS: float = 2.0
+    
+    # Real-time delivery: events queued per WebSocket before a slow client is dropped
+    WS_SEND_QUEUE_SIZE: int = 100
+    
+    # Story view write-behind buffer
+    STORY_VIEW_FLUSH_MS: int = 500
+    STORY_VIEW_FLUSH_MAX: int = 500
+    STORY_VIEW_DEDUP_SIZE: int = 100000
+    STORY_VIEW_DEDUP_TTL_SECONDS: int = 3600
+    
+    # Notification SSE streams: queued events per stream, heartbeat interval and
+    # how many missed notifications are replayed after a reconnect
+    NOTIFICATION_STREAM_QUEUE_SIZE: int = 100
+    NOTIFICATION_STREAM_HEARTBEAT_SECONDS: int = 15
+    NOTIFICATION_STREAM_REPLAY_LIMIT: int = 100
+    
+    # Notification pipeline: bounded event queue drained by batching workers;
+    # user_settings preferences and post authors are cached per worker
+    NOTIFICATION_QUEUE_SIZE: int = 10000
+    NOTIFICATION_WORKERS: int = 2
+    NOTIFICATION_BATCH_SIZE: int = 200
+    NOTIFICATION_BATCH_WAIT_MS: int = 50
+    # Pause before a worker retries a batch that failed on a transient error
+    NOTIFICATION_RETRY_SECONDS: float = 1.0
+    NOTIFICATION_SETTINGS_TTL_SECONDS: int = 300
+    NOTIFICATION_SETTINGS_CACHE_SIZE: int = 10000
+    # Likes/comments on one post collapse into one notification per window,
+    # keeping this many recent actors
+    NOTIFICATION_AGGREGATION_WINDOW_SECONDS: int = 86400
+    NOTIFICATION_SAMPLE_ACTORS: int = 3
+    
+    # Read watermarks: advances are coalesced and written at most this often
+    READ_RECEIPT_FLUSH_MS: int = 1000
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -1,24 +1,32 @@
-from supabase import create_client, Client
+from supabase import AsyncClient
 from config import settings
 
-# Initialize Supabase client
-supabase: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+# Initialize Supabase client.
+# The async client issues PostgREST/storage calls over a pooled httpx.AsyncClient,
+# so every query must be awaited (`await supabase.table(...).execute()`) and a slow
+# round trip only suspends the calling request instead of the whole event loop.
+supabase: AsyncClient = AsyncClient(settings.SUPABASE_URL, settings.SUPABASE_KEY)
 
 # Service role client for admin operations
-supabase_admin: Client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
+supabase_admin: AsyncClient = AsyncClient(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_ROLE_KEY)
 
-def get_supabase() -> Client:
+def get_supabase() -> AsyncClient:
     """Get Supabase client instance"""
     return supabase
 
-def get_supabase_admin() -> Client:
+def get_supabase_admin() -> AsyncClient:
     """Get Supabase admin client instance"""
     return supabase_admin
 
+async def close_connections():
+    """Close the pooled HTTP connections held by the Supabase clients"""
+    for client in (supabase, supabase_admin):
+        await client.postgrest.aclose()
+
 async def test_connection():
     """Test database connection"""
     try:
-        result = supabase.table('users').select("count").execute()
+        result = await supabase.table('users').select("count").execute()
         return True
     except Exception as e:
         print(f"Database connection failed: {e}")
@@ -1,12 +1,44 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import auth, users, posts, messages, friends, stories, upload
+from routers import auth, users, posts, messages, friends, stories, upload, badges, notifications
+from database import close_connections
+from utils.cache import user_cache
+from utils.security import password_pool_stats
+from services.friend_cache import friend_cache
+from services.timeline_service import timeline_service
+from services.recent_posts import recent_posts
+from services.network_search import network_search
+from services.story_tray import story_tray
+from services.story_view_buffer import story_view_buffer
+from services.like_counter import like_counter
+from services.message_hub import message_hub
+from services.read_receipts import read_receipts
+from services.notification_broadcaster import notification_broadcaster
+from services.notification_queue import notification_queue
 from config import settings
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    story_view_buffer.start()
+    like_counter.start()
+    read_receipts.start()
+    notification_queue.start()
+    yield
+    # Write buffered story views, pending like stripes, read watermarks and
+    # queued notifications before the connections go away
+    await story_view_buffer.stop()
+    await like_counter.stop()
+    await read_receipts.stop()
+    await notification_queue.stop()
+    # Release pooled Supabase connections on shutdown
+    await close_connections()
+
 app = FastAPI(
     title="Only Friends API",
     description="Backend API for Only Friends social app",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -26,6 +58,8 @@ app.include_router(messages.router, prefix="/messages", tags=["messages"])
 app.include_router(friends.router, prefix="/friends", tags=["friends"])
 app.include_router(stories.router, prefix="/stories", tags=["stories"])
 app.include_router(upload.router, prefix="/upload", tags=["upload"])
+app.include_router(badges.router, prefix="/badges", tags=["badges"])
+app.include_router(notifications.router, prefix="/notifications", tags=["notifications"])
 
 @app.get("/")
 async def root():
@@ -35,6 +69,24 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "user_cache": user_cache.stats(),
+        "friend_cache": friend_cache.stats(),
+        "timeline_memory": timeline_service.stats(),
+        "recent_posts": recent_posts.stats(),
+        "network_search": network_search.stats(),
+        "story_tray": story_tray.stats(),
+        "story_views": story_view_buffer.stats(),
+        "like_counter": like_counter.stats(),
+        "message_hub": message_hub.stats(),
+        "read_receipts": read_receipts.stats(),
+        "notification_streams": notification_broadcaster.stats(),
+        "notification_queue": notification_queue.stats(),
+        "password_pool": password_pool_stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
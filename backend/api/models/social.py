@@ -61,6 +61,9 @@ class Conversation(BaseModel):
     user_first_name: str
     user_last_name: str
     user_avatar_url: Optional[str]
+    conversation_key: Optional[str] = None
+    last_message_id: Optional[uuid.UUID] = None
+    last_message_sender_id: Optional[uuid.UUID] = None
     last_message: Optional[str]
     last_message_time: Optional[datetime]
     unread_count: int = 0
@@ -101,6 +104,19 @@ class Friend(BaseModel):
 class LikeCreate(BaseModel):
     post_id: uuid.UUID
 
+class LikeAction(BaseModel):
+    post_id: uuid.UUID
+    liked: bool
+
+class LikeBatch(BaseModel):
+    # Replayed in order; only the last action per post matters
+    actions: List[LikeAction] = Field(..., max_length=100)
+
+class LikeState(BaseModel):
+    post_id: uuid.UUID
+    likes_count: int
+    is_liked: bool
+
 # Story models
 class StoryBase(BaseModel):
     content: Optional[str] = None
@@ -153,3 +169,23 @@ class Comment(CommentBase):
 
     class Config:
         from_attributes = True
+
+class Notification(BaseModel):
+    id: uuid.UUID
+    user_id: uuid.UUID
+    type: str
+    title: str
+    message: Optional[str] = None
+    data: Optional[dict] = None
+    is_read: bool = False
+    group_key: Optional[str] = None
+    actor_count: int = 1
+    recent_actors: List[dict] = []
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class NotificationMarkRead(BaseModel):
+    # Omit to mark every unread notification as read
+    notification_ids: Optional[List[uuid.UUID]] = Field(None, max_length=500)
@@ -59,3 +59,5 @@ class UserSearch(BaseModel):
     username: Optional[str]
     avatar_url: Optional[str]
     is_friend: bool = False
+    is_friend_request_sent: bool = False
+    request_received: bool = False
@@ -6,8 +6,9 @@ from models.auth import (
 )
 from models.user import User, UserCreate
 from services.sms_service import sms_service
-from utils.security import generate_token_pair, verify_token, get_password_hash, verify_password
+from utils.security import generate_token_pair, verify_token, get_password_hash_async, verify_password_async, PasswordHasherBusy
 from utils.helpers import format_phone_number, validate_phone_number, generate_username
+from utils.cache import user_cache
 from database import get_supabase
 import uuid
 from datetime import datetime
@@ -67,7 +68,7 @@ async def verify_phone_number(request: VerificationCheck):
     
     # Check if user exists
     supabase = get_supabase()
-    user_result = supabase.table('users').select('*').eq('phone_number', formatted_phone).execute()
+    user_result = await supabase.table('users').select('*').eq('phone_number', formatted_phone).execute()
     
     user_exists = len(user_result.data) > 0
     user_data = user_result.data[0] if user_exists else None
@@ -109,7 +110,7 @@ async def register_user(request: RegisterRequest):
     supabase = get_supabase()
     
     # Check if user already exists
-    existing_user = supabase.table('users').select('*').eq('phone_number', formatted_phone).execute()
+    existing_user = await supabase.table('users').select('*').eq('phone_number', formatted_phone).execute()
     if existing_user.data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -122,13 +123,20 @@ async def register_user(request: RegisterRequest):
         username = generate_username(request.first_name, request.last_name)
     
     # Check username uniqueness
-    username_check = supabase.table('users').select('id').eq('username', username).execute()
+    username_check = await supabase.table('users').select('id').eq('username', username).execute()
     if username_check.data:
         # Add random suffix if username exists
         username = f"{username}_{uuid.uuid4().hex[:6]}"
     
     # Hash password
-    hashed_password = get_password_hash(request.password)
+    try:
+        hashed_password = await get_password_hash_async(request.password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"}
+        )
     
     # Create user
     user_data = {
@@ -145,7 +153,7 @@ async def register_user(request: RegisterRequest):
         "updated_at": datetime.utcnow().isoformat()
     }
     
-    result = supabase.table('users').insert(user_data).execute()
+    result = await supabase.table('users').insert(user_data).execute()
     
     if not result.data:
         raise HTTPException(
@@ -182,7 +190,7 @@ async def login_user(request: LoginRequest):
     supabase = get_supabase()
     
     # Get user by phone number
-    user_result = supabase.table('users').select('*').eq('phone_number', formatted_phone).execute()
+    user_result = await supabase.table('users').select('*').eq('phone_number', formatted_phone).execute()
     
     if not user_result.data:
         raise HTTPException(
@@ -193,7 +201,16 @@ async def login_user(request: LoginRequest):
     user = user_result.data[0]
     
     # Verify password
-    if not verify_password(request.password, user['password_hash']):
+    try:
+        password_valid = await verify_password_async(request.password, user['password_hash'])
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again",
+            headers={"Retry-After": "1"}
+        )
+    
+    if not password_valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid phone number or password"
@@ -241,7 +258,7 @@ async def refresh_token(request: RefreshTokenRequest):
     
     # Verify user still exists and is active
     supabase = get_supabase()
-    user_result = supabase.table('users').select('is_active').eq('id', user_id).execute()
+    user_result = await supabase.table('users').select('is_active').eq('id', user_id).execute()
     
     if not user_result.data or not user_result.data[0]['is_active']:
         raise HTTPException(
@@ -276,7 +293,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     
     # Get user from database
     supabase = get_supabase()
-    user_result = supabase.table('users').select('*').eq('id', user_id).execute()
+    user_result = await supabase.table('users').select('*').eq('id', user_id).execute()
     
     if not user_result.data:
         raise HTTPException(
@@ -294,7 +311,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 # Dependency to get current user
 async def get_current_user_dependency(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """
-    Dependency to get current authenticated user
+    Dependency to get current authenticated user.
+    The user row is served from the in-process user cache when fresh.
     """
     payload = verify_token(credentials.credentials)
     if not payload:
@@ -310,13 +328,19 @@ async def get_current_user_dependency(credentials: HTTPAuthorizationCredentials
             detail="Invalid token payload"
         )
     
-    supabase = get_supabase()
-    user_result = supabase.table('users').select('*').eq('id', user_id).execute()
-    
-    if not user_result.data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    user = user_cache.get(user_id)
+    if user is None:
+        supabase = get_supabase()
+        user_result = await supabase.table('users').select('*').eq('id', user_id).execute()
+        
+        if not user_result.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        
+        user = user_result.data[0]
+        user_cache.set(user_id, user)
     
-    return user_result.data[0]
+    # Hand out a copy so handlers can't mutate the cached row
+    return user.copy()
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends
+from routers.auth import get_current_user_dependency
+from database import get_supabase
+
+router = APIRouter()
+
+BADGE_COLUMNS = 'unread_messages, pending_friend_requests, unread_notifications'
+
+@router.get("/", summary="Get badge counts")
+async def get_badges(
+    current_user: dict = Depends(get_current_user_dependency)
+):
+    """
+    Get unread message, pending friend request and unread notification counts.
+
+    The counters are kept up to date by database triggers (see user_badges in
+    schema.sql), so this is a single primary-key read.
+    """
+    supabase = get_supabase()
+
+    result = await supabase.table('user_badges').select(BADGE_COLUMNS).eq(
+        'user_id', current_user['id']
+    ).execute()
+
+    # No row yet means nothing has happened that needs a badge
+    badges = result.data[0] if result.data else {}
+    return {
+        "unread_messages": badges.get('unread_messages', 0),
+        "pending_friend_requests": badges.get('pending_friend_requests', 0),
+        "unread_notifications": badges.get('unread_notifications', 0)
+    }
@@ -2,6 +2,12 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from models.social import FriendRequest, FriendRequestCreate, FriendRequestUpdate, Friend
 from routers.auth import get_current_user_dependency
 from database import get_supabase
+from services.friend_cache import friend_cache
+from services.timeline_service import timeline_service
+from services.network_search import network_search
+from services.story_tray import story_tray
+from services.notification_queue import notification_queue
+from config import settings
 from datetime import datetime
 import uuid
 
@@ -17,7 +23,7 @@ async def get_friends(
     supabase = get_supabase()
     
     # Get friendships
-    friendships_result = supabase.table('friendships').select(
+    friendships_result = await supabase.table('friendships').select(
         '*, user1:users!user1_id(id, first_name, last_name, username, avatar_url), user2:users!user2_id(id, first_name, last_name, username, avatar_url)'
     ).or_(
         f"user1_id.eq.{current_user['id']}",
@@ -53,7 +59,7 @@ async def send_friend_request(
     supabase = get_supabase()
     
     # Check if recipient exists
-    recipient_check = supabase.table('users').select('id').eq('id', request_data.recipient_id).execute()
+    recipient_check = await supabase.table('users').select('id').eq('id', request_data.recipient_id).execute()
     if not recipient_check.data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -68,19 +74,14 @@ async def send_friend_request(
         )
     
     # Check if already friends
-    friendship_check = supabase.table('friendships').select('id').or_(
-        f"and(user1_id.eq.{current_user['id']},user2_id.eq.{request_data.recipient_id})",
-        f"and(user1_id.eq.{request_data.recipient_id},user2_id.eq.{current_user['id']})"
-    ).execute()
-    
-    if friendship_check.data:
+    if await friend_cache.are_friends(current_user['id'], str(request_data.recipient_id)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Already friends with this user"
         )
     
     # Check if request already exists
-    existing_request = supabase.table('friend_requests').select('id, status').or_(
+    existing_request = await supabase.table('friend_requests').select('id, status').or_(
         f"and(sender_id.eq.{current_user['id']},recipient_id.eq.{request_data.recipient_id})",
         f"and(sender_id.eq.{request_data.recipient_id},recipient_id.eq.{current_user['id']})"
     ).execute()
@@ -101,7 +102,7 @@ async def send_friend_request(
         "created_at": datetime.utcnow().isoformat()
     }
     
-    result = supabase.table('friend_requests').insert(friend_request).execute()
+    result = await supabase.table('friend_requests').insert(friend_request).execute()
     
     if not result.data:
         raise HTTPException(
@@ -109,6 +110,8 @@ async def send_friend_request(
             detail="Failed to send friend request"
         )
     
+    notification_queue.friend_request_sent(current_user, str(request_data.recipient_id), result.data[0]['id'])
+    
     return {"message": "Friend request sent successfully"}
 
 @router.get("/requests", summary="Get friend requests")
@@ -123,12 +126,12 @@ async def get_friend_requests(
     
     if type == "received":
         # Get requests received by current user
-        requests_result = supabase.table('friend_requests').select(
+        requests_result = await supabase.table('friend_requests').select(
             '*, sender:users!sender_id(first_name, last_name, username, avatar_url)'
         ).eq('recipient_id', current_user['id']).eq('status', 'pending').execute()
     else:
         # Get requests sent by current user
-        requests_result = supabase.table('friend_requests').select(
+        requests_result = await supabase.table('friend_requests').select(
             '*, recipient:users!recipient_id(first_name, last_name, username, avatar_url)'
         ).eq('sender_id', current_user['id']).eq('status', 'pending').execute()
     
@@ -146,7 +149,7 @@ async def respond_to_friend_request(
     supabase = get_supabase()
     
     # Get the friend request
-    request_result = supabase.table('friend_requests').select('*').eq('id', request_id).execute()
+    request_result = await supabase.table('friend_requests').select('*').eq('id', request_id).execute()
     
     if not request_result.data:
         raise HTTPException(
@@ -171,7 +174,7 @@ async def respond_to_friend_request(
         )
     
     # Update request status
-    update_result = supabase.table('friend_requests').update({
+    update_result = await supabase.table('friend_requests').update({
         'status': response.status
     }).eq('id', request_id).execute()
     
@@ -184,7 +187,7 @@ async def respond_to_friend_request(
             "created_at": datetime.utcnow().isoformat()
         }
         
-        friendship_result = supabase.table('friendships').insert(friendship).execute()
+        friendship_result = await supabase.table('friendships').insert(friendship).execute()
         
         if not friendship_result.data:
             raise HTTPException(
@@ -192,6 +195,15 @@ async def respond_to_friend_request(
                 detail="Failed to create friendship"
             )
         
+        friend_cache.add_friendship(friend_request['sender_id'], friend_request['recipient_id'])
+        await network_search.add_friendship(friend_request['sender_id'], friend_request['recipient_id'])
+        story_tray.invalidate(friend_request['sender_id'])
+        story_tray.invalidate(friend_request['recipient_id'])
+        if settings.FEED_ENGINE == "timeline":
+            await timeline_service.add_friendship(friend_request['sender_id'], friend_request['recipient_id'])
+        
+        notification_queue.friend_request_accepted(current_user, friend_request['sender_id'], request_id)
+        
         return {"message": "Friend request accepted"}
     else:
         return {"message": "Friend request rejected"}
@@ -207,7 +219,7 @@ async def remove_friend(
     supabase = get_supabase()
     
     # Find and delete the friendship
-    result = supabase.table('friendships').delete().or_(
+    result = await supabase.table('friendships').delete().or_(
         f"and(user1_id.eq.{current_user['id']},user2_id.eq.{friend_id})",
         f"and(user1_id.eq.{friend_id},user2_id.eq.{current_user['id']})"
     ).execute()
@@ -218,6 +230,13 @@ async def remove_friend(
             detail="Friendship not found"
         )
     
+    friend_cache.remove_friendship(current_user['id'], friend_id)
+    await network_search.remove_friendship(current_user['id'], friend_id)
+    story_tray.invalidate(current_user['id'])
+    story_tray.invalidate(friend_id)
+    if settings.FEED_ENGINE == "timeline":
+        await timeline_service.retract_friendship(current_user['id'], friend_id)
+    
     return {"message": "Friend removed successfully"}
 
 @router.get("/suggestions", summary="Get friend suggestions")
@@ -231,20 +250,11 @@ async def get_friend_suggestions(
     supabase = get_supabase()
     
     # Get current friends
-    friends_result = supabase.table('friendships').select('user1_id, user2_id').or_(
-        f"user1_id.eq.{current_user['id']}",
-        f"user2_id.eq.{current_user['id']}"
-    ).execute()
-    
-    friend_ids = [current_user['id']]  # Include self to exclude from suggestions
-    for friendship in friends_result.data:
-        if friendship['user1_id'] == current_user['id']:
-            friend_ids.append(friendship['user2_id'])
-        else:
-            friend_ids.append(friendship['user1_id'])
+    friend_ids = list(await friend_cache.get_friend_ids(current_user['id']))
+    friend_ids.append(current_user['id'])  # Include self to exclude from suggestions
     
     # Get users who are not friends
-    suggestions_result = supabase.table('users').select(
+    suggestions_result = await supabase.table('users').select(
         'id, first_name, last_name, username, avatar_url'
     ).not_.in_('id', friend_ids).limit(limit).execute()
     
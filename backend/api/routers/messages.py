@@ -1,42 +1,171 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect, status
 from models.social import Message, MessageCreate, Conversation
 from routers.auth import get_current_user_dependency
 from database import get_supabase
+from services.friend_cache import friend_cache
+from services.message_hub import message_hub, Subscription
+from services.read_receipts import read_receipts
+from utils.security import verify_token
+from utils.helpers import conversation_key
+from utils.pagination import encode_cursor, keyset_filter, next_cursor, sort_key
 from datetime import datetime
+from typing import Optional
+import asyncio
 import uuid
 
 router = APIRouter()
 
+@router.websocket("/ws")
+async def messages_websocket(websocket: WebSocket, token: Optional[str] = None):
+    """
+    Real-time message delivery.
+
+    Authenticate with the access token in the `token` query parameter (browsers
+    cannot set headers on WebSocket requests) or an `Authorization: Bearer`
+    header. The server pushes {"type": "message", "message": {...}} for messages
+    sent or received by the user, {"type": "read", "user_id", "conversation_key",
+    "last_read_at", "last_read_message_id"} when the other participant reads
+    up to a message, and answers a "ping" text frame with {"type": "pong"}. Connections that fall too far behind are closed with code
+    1013; clients should reconnect and refetch.
+    """
+    if token is None:
+        authorization = websocket.headers.get('authorization', '')
+        if authorization.lower().startswith('bearer '):
+            token = authorization[7:]
+
+    payload = verify_token(token) if token else None
+    if not payload or not payload.get("user_id"):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    subscription = message_hub.subscribe(payload['user_id'])
+    try:
+        await pump_websocket(websocket, subscription)
+    finally:
+        message_hub.unsubscribe(subscription)
+
+async def pump_websocket(websocket: WebSocket, subscription: Subscription):
+    """Relay queued events to the client until it disconnects or overflows"""
+
+    async def send_events():
+        while True:
+            await websocket.send_json(await subscription.queue.get())
+
+    async def receive_pings():
+        while True:
+            if await websocket.receive_text() == 'ping':
+                try:
+                    subscription.queue.put_nowait({"type": "pong"})
+                except asyncio.QueueFull:
+                    subscription.overflowed.set()
+
+    tasks = [
+        asyncio.create_task(send_events()),
+        asyncio.create_task(receive_pings()),
+        asyncio.create_task(subscription.overflowed.wait())
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    if subscription.overflowed.is_set():
+        await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+        return
+
+    # Surface unexpected errors; a client disconnect just ends the connection
+    for task in done:
+        error = None if task.cancelled() else task.exception()
+        if error is not None and not isinstance(error, WebSocketDisconnect):
+            raise error
+
+def format_conversation(row: dict, user_id: str) -> dict:
+    """Shape a conversations row from the point of view of one participant"""
+    is_one = row['participant_one_id'] == user_id
+    other = (row.get('participant_two') if is_one else row.get('participant_one')) or {}
+    return {
+        "user_id": row['participant_two_id'] if is_one else row['participant_one_id'],
+        "user_first_name": other.get('first_name', ''),
+        "user_last_name": other.get('last_name', ''),
+        "user_avatar_url": other.get('avatar_url'),
+        "conversation_key": row['conversation_key'],
+        "last_message_id": row['last_message_id'],
+        "last_message_sender_id": row['last_message_sender_id'],
+        "last_message": row['last_message_preview'],
+        "last_message_time": row['last_message_at'],
+        "unread_count": row['participant_one_unread'] if is_one else row['participant_two_unread']
+    }
+
 @router.get("/", summary="Get conversations")
 async def get_conversations(
-    current_user: dict = Depends(get_current_user_dependency)
+    current_user: dict = Depends(get_current_user_dependency),
+    limit: int = 50,
+    cursor: Optional[str] = None
 ):
     """
-    Get list of conversations for current user
+    Get the current user's conversations, most recent first
+
+    Reads the trigger-maintained `conversations` table (last message preview and
+    per-participant unread counts), one indexed read per page. Without `cursor`
+    the first `limit` conversations are returned as a list; pass `cursor=` (empty
+    for the first page) to get `{"conversations": [...], "next_cursor": str | null}`
+    and page on with `next_cursor`.
     """
     supabase = get_supabase()
     
-    # Get conversations with last message
-    conversations_result = supabase.rpc('get_user_conversations', {
-        'user_id': current_user['id']
-    }).execute()
+    sides = [f"participant_one_id.eq.{current_user['id']}", f"participant_two_id.eq.{current_user['id']}"]
+    if cursor:
+        try:
+            older = keyset_filter(cursor, column='last_message_at')
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        sides = [f"and({side},or({older}))" for side in sides]
+    
+    conversations_result = await supabase.table('conversations').select(
+        '*, participant_one:users!participant_one_id(first_name, last_name, avatar_url), '
+        'participant_two:users!participant_two_id(first_name, last_name, avatar_url)'
+    ).or_(','.join(sides)).order('last_message_at', desc=True).order('id', desc=True).limit(limit + 1).execute()
     
-    return conversations_result.data
+    rows = conversations_result.data
+    conversations = [format_conversation(row, current_user['id']) for row in rows[:limit]]
+    
+    if cursor is None:
+        return conversations
+    
+    return {
+        "conversations": conversations,
+        "next_cursor": next_cursor(rows, limit, column='last_message_at')
+    }
 
 @router.get("/{user_id}", summary="Get conversation with specific user")
 async def get_conversation(
     user_id: str,
     current_user: dict = Depends(get_current_user_dependency),
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    before: Optional[str] = None,
+    after: Optional[str] = None
 ):
     """
-    Get messages in conversation with specific user
+    Get messages in conversation with specific user, newest first
+
+    Without cursors the history is paged by `offset` and a list is returned.
+    With `before` (messages older than the cursor; send it empty for the newest
+    page) or `after` (messages newer than the cursor, e.g. to catch up after a
+    reconnect) the response is `{"messages": [...], "before": str | null,
+    "after": str | null}`. Pass `before` back to load older messages (null when
+    there are none) and `after` to fetch newer ones. Every page is one range scan
+    of the (conversation_key, created_at) index, however long the conversation.
     """
     supabase = get_supabase()
     
     # Verify the other user exists
-    user_check = supabase.table('users').select('id').eq('id', user_id).execute()
+    user_check = await supabase.table('users').select('id').eq('id', user_id).execute()
     if not user_check.data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -44,19 +173,60 @@ async def get_conversation(
         )
     
     # Get messages between current user and specified user
-    messages_result = supabase.table('messages').select(
+    key = conversation_key(current_user['id'], user_id)
+    query = supabase.table('messages').select(
         '*, sender:users!sender_id(first_name, last_name, avatar_url)'
-    ).or_(
-        f"and(sender_id.eq.{current_user['id']},recipient_id.eq.{user_id})",
-        f"and(sender_id.eq.{user_id},recipient_id.eq.{current_user['id']})"
-    ).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+    ).eq('conversation_key', key)
     
-    # Mark messages as read
-    supabase.table('messages').update({
-        'is_read': True
-    }).eq('sender_id', user_id).eq('recipient_id', current_user['id']).eq('is_read', False).execute()
+    if before is None and after is None:
+        messages_result = await query.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+        page = messages_result.data
+    else:
+        try:
+            if after:
+                query = query.or_(keyset_filter(after, descending=False))
+            elif before:
+                query = query.or_(keyset_filter(before))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+        
+        # `after` walks forward from the cursor; either way fetch one extra row
+        descending = not after
+        messages_result = await query.order('created_at', desc=descending).order(
+            'id', desc=descending
+        ).limit(limit + 1).execute()
+        has_more = len(messages_result.data) > limit
+        page = messages_result.data[:limit]
+        if not descending:
+            page.reverse()
     
-    return messages_result.data
+    if page:
+        # Read state comes from the participants' watermarks; viewing the page
+        # moves ours up to its newest message (written on the next flush)
+        watermarks = await read_receipts.get_watermarks(key)
+        own = watermarks.get(current_user['id'])
+        newest = page[0]
+        if own is None or sort_key(newest['created_at'], newest['id']) > sort_key(*own):
+            read_receipts.advance(current_user['id'], key, newest['created_at'], newest['id'])
+            watermarks[current_user['id']] = (newest['created_at'], newest['id'])
+        
+        for message in page:
+            watermark = watermarks.get(message['recipient_id'])
+            message['is_read'] = watermark is not None and (
+                sort_key(message['created_at'], message['id']) <= sort_key(*watermark)
+            )
+    
+    if before is None and after is None:
+        return page
+    
+    return {
+        "messages": page,
+        "before": encode_cursor(page[-1]['created_at'], page[-1]['id']) if page and (has_more or after) else None,
+        "after": encode_cursor(page[0]['created_at'], page[0]['id']) if page else (after or None)
+    }
 
 @router.post("/", response_model=Message, summary="Send message")
 async def send_message(
@@ -69,7 +239,7 @@ async def send_message(
     supabase = get_supabase()
     
     # Verify recipient exists
-    recipient_check = supabase.table('users').select('id').eq('id', message_data.recipient_id).execute()
+    recipient_check = await supabase.table('users').select('id').eq('id', message_data.recipient_id).execute()
     if not recipient_check.data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -77,12 +247,7 @@ async def send_message(
         )
     
     # Check if users are friends (optional - you might want to allow messages between non-friends)
-    friendship_check = supabase.table('friendships').select('id').or_(
-        f"and(user1_id.eq.{current_user['id']},user2_id.eq.{message_data.recipient_id})",
-        f"and(user1_id.eq.{message_data.recipient_id},user2_id.eq.{current_user['id']})"
-    ).execute()
-    
-    if not friendship_check.data:
+    if not await friend_cache.are_friends(current_user['id'], str(message_data.recipient_id)):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only send messages to friends"
@@ -99,7 +264,7 @@ async def send_message(
         "is_read": False
     }
     
-    result = supabase.table('messages').insert(message).execute()
+    result = await supabase.table('messages').insert(message).execute()
     
     if not result.data:
         raise HTTPException(
@@ -107,6 +272,11 @@ async def send_message(
             detail="Failed to send message"
         )
     
+    # Push to the live connections of both participants (the sender's other devices too)
+    event = {"type": "message", "message": result.data[0]}
+    message_hub.publish(message['recipient_id'], event)
+    message_hub.publish(message['sender_id'], event)
+    
     return result.data[0]
 
 @router.put("/{message_id}/read", summary="Mark message as read")
@@ -115,12 +285,14 @@ async def mark_message_read(
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """
-    Mark a message as read
+    Mark a message, and everything before it in the conversation, as read
     """
     supabase = get_supabase()
     
     # Verify message exists and current user is the recipient
-    message_check = supabase.table('messages').select('recipient_id').eq('id', message_id).execute()
+    message_check = await supabase.table('messages').select(
+        'recipient_id, conversation_key, created_at'
+    ).eq('id', message_id).execute()
     
     if not message_check.data:
         raise HTTPException(
@@ -134,10 +306,9 @@ async def mark_message_read(
             detail="You can only mark your own messages as read"
         )
     
-    # Mark as read
-    result = supabase.table('messages').update({
-        'is_read': True
-    }).eq('id', message_id).execute()
+    # Advance the conversation watermark; no message rows are updated
+    message = message_check.data[0]
+    read_receipts.advance(current_user['id'], message['conversation_key'], message['created_at'], message_id)
     
     return {"message": "Message marked as read"}
 
@@ -150,8 +321,9 @@ async def get_unread_count(
     """
     supabase = get_supabase()
     
-    result = supabase.table('messages').select('id', count='exact').eq(
-        'recipient_id', current_user['id']
-    ).eq('is_read', False).execute()
+    # Trigger-maintained counter (see GET /badges) instead of counting rows
+    result = await supabase.table('user_badges').select('unread_messages').eq(
+        'user_id', current_user['id']
+    ).execute()
     
-    return {"unread_count": result.count or 0}
+    return {"unread_count": result.data[0]['unread_messages'] if result.data else 0}
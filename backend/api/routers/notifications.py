@@ -0,0 +1,167 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Request, status
+from fastapi.responses import StreamingResponse
+from models.social import NotificationMarkRead
+from routers.auth import get_current_user_dependency
+from database import get_supabase
+from services.notification_broadcaster import notification_broadcaster
+from utils.security import verify_token
+from utils.pagination import encode_cursor, keyset_filter, next_cursor
+from config import settings
+from typing import Optional
+import asyncio
+import json
+
+router = APIRouter()
+
+@router.get("/", summary="Get notifications")
+async def get_notifications(
+    current_user: dict = Depends(get_current_user_dependency),
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    unread_only: bool = False
+):
+    """
+    Get the current user's notifications, newest first
+
+    Without `cursor` the first `limit` notifications are returned as a list; pass
+    `cursor=` (empty for the first page) to get `{"notifications": [...],
+    "next_cursor": str | null}` and page on with `next_cursor`. Every page is one
+    range scan of the (user_id, created_at, id) index.
+    """
+    supabase = get_supabase()
+    
+    query = supabase.table('notifications').select('*').eq('user_id', current_user['id'])
+    if unread_only:
+        query = query.eq('is_read', False)
+    if cursor:
+        try:
+            query = query.or_(keyset_filter(cursor))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    
+    result = await query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute()
+    notifications = result.data[:limit]
+    
+    if cursor is None:
+        return notifications
+    
+    return {"notifications": notifications, "next_cursor": next_cursor(result.data, limit)}
+
+@router.put("/read", summary="Mark notifications as read")
+async def mark_notifications_read(
+    update: NotificationMarkRead,
+    current_user: dict = Depends(get_current_user_dependency)
+):
+    """
+    Mark the given notifications, or all unread ones when `notification_ids` is
+    omitted, as read with a single UPDATE
+    """
+    supabase = get_supabase()
+    
+    query = supabase.table('notifications').update({'is_read': True}, returning='minimal', count='exact').eq(
+        'user_id', current_user['id']
+    ).eq('is_read', False)
+    if update.notification_ids is not None:
+        if not update.notification_ids:
+            return {"updated": 0}
+        query = query.in_('id', [str(notification_id) for notification_id in update.notification_ids])
+    
+    result = await query.execute()
+    
+    # Let the user's other open streams clear their unread state
+    notification_broadcaster.publish(current_user['id'], {
+        "type": "read",
+        "notification_ids": None if update.notification_ids is None else [
+            str(notification_id) for notification_id in update.notification_ids
+        ]
+    })
+    
+    return {"updated": result.count or 0}
+
+def format_event(event: dict) -> str:
+    """Encode an event in SSE wire format; notifications carry a resumable id"""
+    if event['type'] == 'notification':
+        notification = event['notification']
+        event_id = encode_cursor(notification['created_at'], notification['id'])
+        return f"id: {event_id}\nevent: notification\ndata: {json.dumps(notification, default=str)}\n\n"
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+@router.get("/stream", summary="Stream new notifications (Server-Sent Events)")
+async def stream_notifications(
+    request: Request,
+    token: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Server-Sent Events stream of new notifications.
+
+    Authenticate with the access token in the `token` query parameter
+    (EventSource cannot set headers) or an `Authorization: Bearer` header. Each
+    new notification is sent as a `notification` event whose id is a cursor;
+    after a reconnect the browser sends it back as `Last-Event-ID` and the
+    notifications created since then are replayed first (up to
+    NOTIFICATION_STREAM_REPLAY_LIMIT). `read` events report notifications
+    marked read elsewhere, and a comment line is sent every
+    NOTIFICATION_STREAM_HEARTBEAT_SECONDS so proxies keep the connection open.
+    A stream that falls too far behind is closed; the browser then reconnects
+    and catches up.
+    """
+    if token is None:
+        authorization = request.headers.get('authorization', '')
+        if authorization.lower().startswith('bearer '):
+            token = authorization[7:]
+    
+    payload = verify_token(token) if token else None
+    if not payload or not payload.get("user_id"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid access token"
+        )
+    user_id = payload['user_id']
+    
+    replay_filter = None
+    if last_event_id:
+        try:
+            replay_filter = keyset_filter(last_event_id, descending=False)
+        except ValueError:
+            # Unknown id (e.g. from an older deployment): resume with live events only
+            replay_filter = None
+    
+    async def events():
+        # Subscribe before replaying so nothing created in between is missed
+        subscription = notification_broadcaster.subscribe(user_id)
+        try:
+            yield "retry: 3000\n\n"
+            
+            replayed = set()
+            if replay_filter:
+                supabase = get_supabase()
+                result = await supabase.table('notifications').select('*').eq('user_id', user_id).or_(
+                    replay_filter
+                ).order('created_at').order('id').limit(settings.NOTIFICATION_STREAM_REPLAY_LIMIT).execute()
+                for notification in result.data:
+                    replayed.add(notification['id'])
+                    yield format_event({"type": "notification", "notification": notification})
+            
+            while not subscription.overflowed.is_set():
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event['type'] == 'notification' and event['notification']['id'] in replayed:
+                    continue
+                yield format_event(event)
+        finally:
+            notification_broadcaster.unsubscribe(subscription)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        # Stop nginx from buffering the stream
+        "X-Accel-Buffering": "no"
+    })
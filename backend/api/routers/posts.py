@@ -1,78 +1,158 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from models.social import Post, PostCreate, PostUpdate, Comment, CommentCreate
+from models.social import Post, PostCreate, PostUpdate, Comment, CommentCreate, LikeBatch, LikeState
 from routers.auth import get_current_user_dependency
 from database import get_supabase
+from services.friend_cache import friend_cache
+from services.timeline_service import timeline_service
+from services.recent_posts import recent_posts
+from services.notification_queue import notification_queue
+from utils.pagination import keyset_filter, next_cursor
+from config import settings
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 import uuid
 
 router = APIRouter()
 
+def format_feed_post(post: dict, liked_post_ids: set) -> dict:
+    """Shape a posts row (joined with its author) for the feed response"""
+    user_info = post.get('users', {})
+    return {
+        'id': post['id'],
+        'user_id': post['user_id'],
+        'content': post['content'],
+        'image_url': post.get('image_url'),
+        'location': post.get('location'),
+        'created_at': post['created_at'],
+        'updated_at': post['updated_at'],
+        'likes_count': post.get('likes_count', 0),
+        'comments_count': post.get('comments_count', 0),
+        'is_liked': post['id'] in liked_post_ids,
+        'user_first_name': user_info.get('first_name', ''),
+        'user_last_name': user_info.get('last_name', ''),
+        'user_username': user_info.get('username'),
+        'user_avatar_url': user_info.get('avatar_url'),
+    }
+
 @router.get("/", summary="Get feed posts")
 async def get_feed_posts(
     current_user: dict = Depends(get_current_user_dependency),
     limit: int = 20,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
     """
     Get posts for user's feed (friends' posts + own posts)
+
+    Without `cursor` the feed is paged by `offset` and a list of posts is returned.
+    Passing `cursor` switches to keyset pagination on (created_at, id): send an
+    empty `cursor=` for the first page, then the `next_cursor` from each response.
+    The response is then `{"posts": [...], "next_cursor": str | null}` and every
+    page costs the same index range scan regardless of depth.
     """
     supabase = get_supabase()
     
-    # Get user's friends
-    friends_result = supabase.table('friendships').select('user1_id, user2_id').or_(
-        f"user1_id.eq.{current_user['id']}",
-        f"user2_id.eq.{current_user['id']}"
-    ).execute()
+    if settings.FEED_ENGINE == "timeline":
+        rows, page_cursor = await get_timeline_rows(current_user['id'], limit, offset, cursor)
+    elif settings.FEED_ENGINE == "ring":
+        rows, page_cursor = await get_ring_rows(current_user['id'], limit, offset, cursor)
+    else:
+        rows, page_cursor = await get_query_rows(current_user['id'], limit, offset, cursor)
+
+    if not rows:
+        return [] if cursor is None else {"posts": [], "next_cursor": None}
+
+    # Check which posts current user has liked
+    post_ids = [post['id'] for post in rows]
+    likes_result = await supabase.table('post_likes').select('post_id').eq(
+        'user_id', current_user['id']
+    ).in_('post_id', post_ids).execute()
+
+    liked_post_ids = {like['post_id'] for like in likes_result.data}
+
+    # Add is_liked field to each post
+    posts = [format_feed_post(post, liked_post_ids) for post in rows]
+
+    if cursor is None:
+        return posts
+    return {"posts": posts, "next_cursor": page_cursor}
+
+async def get_query_rows(user_id: str, limit: int, offset: int, cursor: Optional[str]):
+    """Feed page built on read from friends' posts"""
+    supabase = get_supabase()
     
-    friend_ids = []
-    for friendship in friends_result.data:
-        if friendship['user1_id'] == current_user['id']:
-            friend_ids.append(friendship['user2_id'])
-        else:
-            friend_ids.append(friendship['user1_id'])
+    # Get user's friends
+    friend_ids = list(await friend_cache.get_friend_ids(user_id))
     
     # Include current user's posts
-    friend_ids.append(current_user['id'])
+    friend_ids.append(user_id)
     
     # Get posts from friends and self
-    posts_result = supabase.table('posts').select(
+    query = supabase.table('posts').select(
         '*, users(first_name, last_name, username, avatar_url)'
-    ).in_('user_id', friend_ids).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+    ).in_('user_id', friend_ids)
+
+    if cursor is None:
+        posts_result = await query.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+        return posts_result.data, None
+
+    if cursor:
+        try:
+            query = query.or_(keyset_filter(cursor))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor"
+            )
+    # Fetch one extra row to learn whether another page exists
+    posts_result = await query.order('created_at', desc=True).order('id', desc=True).limit(limit + 1).execute()
+    return posts_result.data[:limit], next_cursor(posts_result.data, limit)
+
+async def get_timeline_rows(user_id: str, limit: int, offset: int, cursor: Optional[str]):
+    """Feed page read from the user's materialized home timeline"""
+    try:
+        post_ids, page_cursor = await timeline_service.get_page(user_id, limit, offset, cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
 
-    if not posts_result.data:
-        return []
+    return await fetch_posts_by_ids(post_ids), page_cursor
 
-    # Check which posts current user has liked
-    post_ids = [post['id'] for post in posts_result.data]
-    likes_result = supabase.table('post_likes').select('post_id').eq(
-        'user_id', current_user['id']
-    ).in_('post_id', post_ids).execute()
+async def get_ring_rows(user_id: str, limit: int, offset: int, cursor: Optional[str]):
+    """Feed page merged from friends' in-memory recent-post buffers"""
+    author_ids = list(await friend_cache.get_friend_ids(user_id))
+    author_ids.append(user_id)
 
-    liked_post_ids = {like['post_id'] for like in likes_result.data}
+    try:
+        page = await recent_posts.get_page(author_ids, limit, offset, cursor or None)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
 
-    # Add is_liked field to each post
-    posts = []
-    for post in posts_result.data:
-        user_info = post.get('users', {})
-        posts.append({
-            'id': post['id'],
-            'user_id': post['user_id'],
-            'content': post['content'],
-            'image_url': post.get('image_url'),
-            'location': post.get('location'),
-            'created_at': post['created_at'],
-            'updated_at': post['updated_at'],
-            'likes_count': post.get('likes_count', 0),
-            'comments_count': post.get('comments_count', 0),
-            'is_liked': post['id'] in liked_post_ids,
-            'user_first_name': user_info.get('first_name', ''),
-            'user_last_name': user_info.get('last_name', ''),
-            'user_username': user_info.get('username'),
-            'user_avatar_url': user_info.get('avatar_url'),
-        })
+    if page is None:
+        # Older than the buffered window
+        return await get_query_rows(user_id, limit, offset, cursor)
+
+    post_ids, page_cursor = page
+    return await fetch_posts_by_ids(post_ids), page_cursor
 
-    return posts
+async def fetch_posts_by_ids(post_ids: List[str]) -> List[dict]:
+    """Load feed rows by primary key, keeping the order of `post_ids`"""
+    if not post_ids:
+        return []
+
+    supabase = get_supabase()
+    posts_result = await supabase.table('posts').select(
+        '*, users(first_name, last_name, username, avatar_url)'
+    ).in_('id', post_ids).execute()
+
+    # Posts deleted since the IDs were read simply drop out
+    posts_by_id = {post['id']: post for post in posts_result.data}
+    return [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
 
 @router.post("/", response_model=Post, summary="Create new post")
 async def create_post(
@@ -94,7 +174,7 @@ async def create_post(
         "updated_at": datetime.utcnow().isoformat()
     }
     
-    result = supabase.table('posts').insert(post).execute()
+    result = await supabase.table('posts').insert(post).execute()
     
     if not result.data:
         raise HTTPException(
@@ -102,6 +182,11 @@ async def create_post(
             detail="Failed to create post"
         )
     
+    if settings.FEED_ENGINE == "timeline":
+        await timeline_service.fan_out_post(result.data[0])
+    elif settings.FEED_ENGINE == "ring":
+        recent_posts.add_post(result.data[0])
+    
     return result.data[0]
 
 @router.get("/{post_id}", summary="Get post by ID")
@@ -114,7 +199,7 @@ async def get_post(
     """
     supabase = get_supabase()
     
-    result = supabase.table('posts').select(
+    result = await supabase.table('posts').select(
         '*, users(first_name, last_name, username, avatar_url)'
     ).eq('id', post_id).execute()
     
@@ -137,7 +222,7 @@ async def delete_post(
     supabase = get_supabase()
     
     # Check if post exists and belongs to current user
-    post_result = supabase.table('posts').select('user_id').eq('id', post_id).execute()
+    post_result = await supabase.table('posts').select('user_id').eq('id', post_id).execute()
     
     if not post_result.data:
         raise HTTPException(
@@ -152,74 +237,92 @@ async def delete_post(
         )
     
     # Delete the post
-    result = supabase.table('posts').delete().eq('id', post_id).execute()
+    result = await supabase.table('posts').delete().eq('id', post_id).execute()
+    
+    if settings.FEED_ENGINE == "timeline":
+        await timeline_service.retract_post(post_id, current_user['id'])
+    elif settings.FEED_ENGINE == "ring":
+        recent_posts.remove_post(post_id, current_user['id'])
 
     return {"message": "Post deleted successfully"}
 
 # ============ LIKES ENDPOINTS ============
 
-@router.post("/{post_id}/like", summary="Like a post")
+async def set_likes(user_id: str, like_ids: List[str], unlike_ids: List[str]) -> List[dict]:
+    """
+    Apply likes/unlikes in one idempotent round trip (see set_post_likes() in schema.sql)
+
+    Returns:
+        list: {post_id, likes_count, is_liked, newly_liked} for every existing post touched
+    """
+    supabase = get_supabase()
+    result = await supabase.rpc('set_post_likes', {
+        'acting_user_id': user_id,
+        'like_post_ids': like_ids,
+        'unlike_post_ids': unlike_ids
+    }).execute()
+    return result.data
+
+@router.post("/likes/batch", response_model=List[LikeState], summary="Replay queued likes/unlikes")
+async def batch_like_posts(
+    batch: LikeBatch,
+    current_user: dict = Depends(get_current_user_dependency)
+):
+    """
+    Apply a batch of like/unlike actions (e.g. queued while offline).
+    Only the last action per post counts; unknown posts are skipped.
+    """
+    final_state = {str(action.post_id): action.liked for action in batch.actions}
+    if not final_state:
+        return []
+
+    result = await set_likes(
+        current_user['id'],
+        [post_id for post_id, liked in final_state.items() if liked],
+        [post_id for post_id, liked in final_state.items() if not liked]
+    )
+    # Only likes this call inserted notify; replayed likes that already exist do not
+    for state in result:
+        if state['newly_liked']:
+            notification_queue.post_liked(current_user, str(state['post_id']))
+
+    return result
+
+@router.post("/{post_id}/like", response_model=LikeState, summary="Like a post")
 async def like_post(
     post_id: str,
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """
-    Like a post
+    Like a post (liking twice is a no-op)
     """
-    supabase = get_supabase()
-
-    # Check if post exists
-    post_result = supabase.table('posts').select('id').eq('id', post_id).execute()
-    if not post_result.data:
+    result = await set_likes(current_user['id'], [post_id], [])
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found"
         )
 
-    # Check if already liked
-    existing_like = supabase.table('post_likes').select('id').eq(
-        'post_id', post_id
-    ).eq('user_id', current_user['id']).execute()
-
-    if existing_like.data:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Post already liked"
-        )
+    if result[0]['newly_liked']:
+        notification_queue.post_liked(current_user, post_id)
+    return result[0]
 
-    # Insert like
-    like = {
-        "id": str(uuid.uuid4()),
-        "post_id": post_id,
-        "user_id": current_user['id'],
-        "created_at": datetime.utcnow().isoformat()
-    }
-    supabase.table('post_likes').insert(like).execute()
-
-    return {"message": "Post liked"}
-
-@router.delete("/{post_id}/like", summary="Unlike a post")
+@router.delete("/{post_id}/like", response_model=LikeState, summary="Unlike a post")
 async def unlike_post(
     post_id: str,
     current_user: dict = Depends(get_current_user_dependency)
 ):
     """
-    Unlike a post
+    Unlike a post (unliking a post that is not liked is a no-op)
     """
-    supabase = get_supabase()
-
-    # Delete the like
-    result = supabase.table('post_likes').delete().eq(
-        'post_id', post_id
-    ).eq('user_id', current_user['id']).execute()
-
-    if not result.data:
+    result = await set_likes(current_user['id'], [], [post_id])
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="Like not found"
+            detail="Post not found"
         )
 
-    return {"message": "Post unliked"}
+    return result[0]
 
 @router.get("/{post_id}/likes", summary="Get users who liked a post")
 async def get_post_likes(
@@ -234,7 +337,7 @@ async def get_post_likes(
     supabase = get_supabase()
 
     # Check if post exists
-    post_result = supabase.table('posts').select('id').eq('id', post_id).execute()
+    post_result = await supabase.table('posts').select('id').eq('id', post_id).execute()
     if not post_result.data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -242,7 +345,7 @@ async def get_post_likes(
         )
 
     # Get likes with user info
-    likes_result = supabase.table('post_likes').select(
+    likes_result = await supabase.table('post_likes').select(
         'user_id, created_at, users(id, first_name, last_name, username, avatar_url)'
     ).eq('post_id', post_id).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
 
@@ -275,7 +378,7 @@ async def get_post_comments(
     supabase = get_supabase()
 
     # Check if post exists
-    post_result = supabase.table('posts').select('id').eq('id', post_id).execute()
+    post_result = await supabase.table('posts').select('id').eq('id', post_id).execute()
     if not post_result.data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -283,7 +386,7 @@ async def get_post_comments(
         )
 
     # Get comments with user info
-    comments_result = supabase.table('post_comments').select(
+    comments_result = await supabase.table('post_comments').select(
         '*, users(first_name, last_name, avatar_url)'
     ).eq('post_id', post_id).order('created_at', desc=False).range(offset, offset + limit - 1).execute()
 
@@ -315,7 +418,7 @@ async def add_comment(
     supabase = get_supabase()
 
     # Check if post exists
-    post_result = supabase.table('posts').select('id').eq('id', post_id).execute()
+    post_result = await supabase.table('posts').select('id').eq('id', post_id).execute()
     if not post_result.data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -331,7 +434,7 @@ async def add_comment(
         "created_at": datetime.utcnow().isoformat(),
         "updated_at": datetime.utcnow().isoformat()
     }
-    result = supabase.table('post_comments').insert(comment).execute()
+    result = await supabase.table('post_comments').insert(comment).execute()
 
     if not result.data:
         raise HTTPException(
@@ -340,12 +443,14 @@ async def add_comment(
         )
 
     # Get user info for response
-    user_result = supabase.table('users').select(
+    user_result = await supabase.table('users').select(
         'first_name, last_name, avatar_url'
     ).eq('id', current_user['id']).execute()
 
     user_info = user_result.data[0] if user_result.data else {}
 
+    notification_queue.post_commented(current_user, post_id, result.data[0])
+
     return {
         **result.data[0],
         'user_first_name': user_info.get('first_name', ''),
@@ -365,7 +470,7 @@ async def delete_comment(
     supabase = get_supabase()
 
     # Get comment and post info
-    comment_result = supabase.table('post_comments').select('user_id, post_id').eq('id', comment_id).execute()
+    comment_result = await supabase.table('post_comments').select('user_id, post_id').eq('id', comment_id).execute()
 
     if not comment_result.data:
         raise HTTPException(
@@ -376,7 +481,7 @@ async def delete_comment(
     comment = comment_result.data[0]
 
     # Get post owner
-    post_result = supabase.table('posts').select('user_id').eq('id', post_id).execute()
+    post_result = await supabase.table('posts').select('user_id').eq('id', post_id).execute()
     post_owner_id = post_result.data[0]['user_id'] if post_result.data else None
 
     # Check permission: comment author or post owner
@@ -387,6 +492,6 @@ async def delete_comment(
         )
 
     # Delete the comment
-    supabase.table('post_comments').delete().eq('id', comment_id).execute()
+    await supabase.table('post_comments').delete().eq('id', comment_id).execute()
 
     return {"message": "Comment deleted successfully"}
@@ -2,6 +2,8 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from models.social import Story, StoryCreate, StoryGroup
 from routers.auth import get_current_user_dependency
 from database import get_supabase
+from services.story_tray import story_tray
+from services.story_view_buffer import story_view_buffer
 from datetime import datetime, timedelta
 from typing import List
 import uuid
@@ -15,85 +17,7 @@ async def get_friends_stories(
     """
     Get active stories from friends, grouped by user
     """
-    supabase = get_supabase()
-
-    # Get user's friends
-    friends_result = supabase.table('friendships').select('user1_id, user2_id').or_(
-        f"user1_id.eq.{current_user['id']}",
-        f"user2_id.eq.{current_user['id']}"
-    ).execute()
-
-    friend_ids = []
-    for friendship in friends_result.data:
-        if friendship['user1_id'] == current_user['id']:
-            friend_ids.append(friendship['user2_id'])
-        else:
-            friend_ids.append(friendship['user1_id'])
-
-    # Include current user's own stories
-    friend_ids.append(current_user['id'])
-
-    # Get active stories (not expired)
-    now = datetime.utcnow().isoformat()
-    stories_result = supabase.table('stories').select(
-        '*, users(first_name, last_name, avatar_url)'
-    ).in_('user_id', friend_ids).gt('expires_at', now).order('created_at', desc=True).execute()
-
-    if not stories_result.data:
-        return []
-
-    # Get story views for current user
-    story_ids = [story['id'] for story in stories_result.data]
-    views_result = supabase.table('story_views').select('story_id').eq(
-        'viewer_id', current_user['id']
-    ).in_('story_id', story_ids).execute()
-
-    viewed_story_ids = {view['story_id'] for view in views_result.data}
-
-    # Group stories by user
-    user_stories = {}
-    for story in stories_result.data:
-        user_id = story['user_id']
-        user_info = story.get('users', {})
-
-        story_data = {
-            'id': story['id'],
-            'user_id': user_id,
-            'content': story.get('content'),
-            'image_url': story.get('image_url'),
-            'background_color': story.get('background_color', '#000000'),
-            'views_count': story.get('views_count', 0),
-            'expires_at': story['expires_at'],
-            'created_at': story['created_at'],
-            'is_viewed': story['id'] in viewed_story_ids,
-            'user_first_name': user_info.get('first_name', ''),
-            'user_last_name': user_info.get('last_name', ''),
-            'user_avatar_url': user_info.get('avatar_url'),
-        }
-
-        if user_id not in user_stories:
-            user_stories[user_id] = {
-                'user_id': user_id,
-                'user_first_name': user_info.get('first_name', ''),
-                'user_last_name': user_info.get('last_name', ''),
-                'user_avatar_url': user_info.get('avatar_url'),
-                'stories': [],
-                'has_unviewed': False
-            }
-
-        user_stories[user_id]['stories'].append(story_data)
-        if not story_data['is_viewed']:
-            user_stories[user_id]['has_unviewed'] = True
-
-    # Sort: current user first, then by has_unviewed, then by most recent story
-    result = list(user_stories.values())
-    result.sort(key=lambda x: (
-        x['user_id'] != current_user['id'],  # Current user first
-        not x['has_unviewed'],  # Unviewed stories first
-        x['stories'][0]['created_at'] if x['stories'] else ''  # Most recent first
-    ), reverse=False)
-
-    return result
+    return await story_tray.get_tray(current_user['id'])
 
 @router.post("/", response_model=Story, summary="Create a story")
 async def create_story(
@@ -118,7 +42,7 @@ async def create_story(
         "created_at": now.isoformat()
     }
 
-    result = supabase.table('stories').insert(story).execute()
+    result = await supabase.table('stories').insert(story).execute()
 
     if not result.data:
         raise HTTPException(
@@ -126,8 +50,10 @@ async def create_story(
             detail="Failed to create story"
         )
 
+    await story_tray.invalidate_author(current_user['id'])
+
     # Get user info for response
-    user_result = supabase.table('users').select(
+    user_result = await supabase.table('users').select(
         'first_name, last_name, avatar_url'
     ).eq('id', current_user['id']).execute()
 
@@ -152,7 +78,7 @@ async def get_story(
     """
     supabase = get_supabase()
 
-    result = supabase.table('stories').select(
+    result = await supabase.table('stories').select(
         '*, users(first_name, last_name, avatar_url)'
     ).eq('id', story_id).execute()
 
@@ -172,7 +98,7 @@ async def get_story(
         )
 
     # Check if viewed by current user
-    view_result = supabase.table('story_views').select('id').eq(
+    view_result = await supabase.table('story_views').select('id').eq(
         'story_id', story_id
     ).eq('viewer_id', current_user['id']).execute()
 
@@ -187,7 +113,7 @@ async def get_story(
         'views_count': story.get('views_count', 0),
         'expires_at': story['expires_at'],
         'created_at': story['created_at'],
-        'is_viewed': len(view_result.data) > 0,
+        'is_viewed': len(view_result.data) > 0 or story_view_buffer.is_pending(story_id, current_user['id']),
         'user_first_name': user_info.get('first_name', ''),
         'user_last_name': user_info.get('last_name', ''),
         'user_avatar_url': user_info.get('avatar_url'),
@@ -201,33 +127,23 @@ async def view_story(
     """
     Mark a story as viewed by the current user
     """
-    supabase = get_supabase()
-
     # Check if story exists
-    story_result = supabase.table('stories').select('id, user_id').eq('id', story_id).execute()
+    author_id = await story_view_buffer.get_author(story_id)
 
-    if not story_result.data:
+    if author_id is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Story not found"
         )
 
     # Don't record view if viewing own story
-    if story_result.data[0]['user_id'] == current_user['id']:
+    if author_id == current_user['id']:
         return {"message": "Own story, view not recorded"}
 
-    # Insert view (unique constraint will prevent duplicates)
-    try:
-        view = {
-            "id": str(uuid.uuid4()),
-            "story_id": story_id,
-            "viewer_id": current_user['id'],
-            "viewed_at": datetime.utcnow().isoformat()
-        }
-        supabase.table('story_views').insert(view).execute()
-    except Exception:
-        # Already viewed, ignore duplicate
-        pass
+    # Buffered and written in bulk (duplicates are dropped in memory and by the unique constraint)
+    new_view = story_view_buffer.record(story_id, current_user['id'])
+
+    story_tray.mark_viewed(current_user['id'], story_id, author_id, new_view)
 
     return {"message": "Story viewed"}
 
@@ -242,7 +158,7 @@ async def delete_story(
     supabase = get_supabase()
 
     # Check if story exists and belongs to current user
-    story_result = supabase.table('stories').select('user_id').eq('id', story_id).execute()
+    story_result = await supabase.table('stories').select('user_id').eq('id', story_id).execute()
 
     if not story_result.data:
         raise HTTPException(
@@ -257,6 +173,8 @@ async def delete_story(
         )
 
     # Delete the story
-    supabase.table('stories').delete().eq('id', story_id).execute()
+    await supabase.table('stories').delete().eq('id', story_id).execute()
+    story_view_buffer.forget_story(story_id)
+    await story_tray.invalidate_author(current_user['id'])
 
     return {"message": "Story deleted successfully"}
@@ -1,56 +1,209 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, status
+from fastapi import APIRouter, HTTPException, Depends, Request, status
+from python_multipart.multipart import MultipartParser, parse_options_header
 from routers.auth import get_current_user_dependency
 from database import get_supabase_admin
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+import io
 import uuid
 
 router = APIRouter()
 
 ALLOWED_CONTENT_TYPES = ["image/jpeg", "image/png", "image/gif", "image/webp"]
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+# Uploads are held in memory up to this size, then spill to a temporary file
+SPOOL_MAX_MEMORY = 1024 * 1024
+# Room for multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 64 * 1024
 
+FILE_EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/gif": "gif", "image/webp": "webp"}
 
-@router.post("/", summary="Upload image to storage")
-async def upload_image(
-    file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user_dependency)
-):
+
+def detect_image_type(head: bytes) -> Optional[str]:
+    """Identify an allowed image type from its first bytes (None if not an allowed image)"""
+    if head.startswith(b'\xff\xd8\xff'):
+        return "image/jpeg"
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return "image/png"
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return "image/gif"
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return "image/webp"
+    return None
+
+
+class RejectedUpload(Exception):
+    """Raised from the multipart callbacks to stop reading the request body"""
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class ImageReceiver:
     """
-    Upload an image to Supabase Storage.
-    Returns the public URL of the uploaded image.
+    Incremental multipart/form-data consumer for the `file` field.
+
+    The body is fed chunk by chunk as it arrives. File bytes go into a
+    SpooledTemporaryFile, the type is checked against the magic bytes at the
+    start of the file, and the upload is rejected as soon as it exceeds
+    MAX_FILE_SIZE, so no more than one network chunk past the limit is read.
     """
-    # Validate content type
-    if file.content_type not in ALLOWED_CONTENT_TYPES:
+
+    def __init__(self, boundary: bytes):
+        self.spool = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        self.size = 0
+        self.content_type: Optional[str] = None
+        self.received = False
+        self._head = b''
+        self._in_file = False
+        self._header_field = b''
+        self._header_value = b''
+        self._headers = {}
+        self.parser = MultipartParser(boundary, {
+            'on_part_begin': self._on_part_begin,
+            'on_header_field': self._on_header_field,
+            'on_header_value': self._on_header_value,
+            'on_header_end': self._on_header_end,
+            'on_headers_finished': self._on_headers_finished,
+            'on_part_data': self._on_part_data,
+            'on_part_end': self._on_part_end
+        })
+
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b''
+        self._header_value = b''
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b'content-disposition', b''))
+        self._in_file = options.get(b'name') == b'file' and not self.received
+        if self._in_file:
+            self.received = True
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if not self._in_file:
+            return
+        self.size += end - start
+        if self.size > MAX_FILE_SIZE:
+            raise RejectedUpload(f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB")
+        if self.content_type is None:
+            self._head += data[start:end][:12 - len(self._head)]
+            if len(self._head) >= 12:
+                self._check_type()
+        self.spool.write(data[start:end])
+
+    def _on_part_end(self):
+        if self._in_file and self.content_type is None:
+            self._check_type()
+        self._in_file = False
+
+    def _check_type(self):
+        self.content_type = detect_image_type(self._head)
+        if self.content_type is None:
+            raise RejectedUpload(f"Invalid file type. Allowed: {', '.join(ALLOWED_CONTENT_TYPES)}")
+
+    def close(self):
+        self.spool.close()
+
+
+async def receive_image(request: Request) -> ImageReceiver:
+    """Stream the request body into an ImageReceiver, rejecting bad uploads early"""
+    mime_type, options = parse_options_header(request.headers.get('content-type', ''))
+    boundary = options.get(b'boundary')
+    if mime_type != b'multipart/form-data' or not boundary:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid file type. Allowed: {', '.join(ALLOWED_CONTENT_TYPES)}"
+            detail="Expected a multipart/form-data upload with a `file` field"
         )
 
-    # Read file content
-    content = await file.read()
-
-    # Validate file size
-    if len(content) > MAX_FILE_SIZE:
+    # Refuse declared oversize bodies before reading any of them
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + MULTIPART_OVERHEAD:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"File too large. Maximum size: {MAX_FILE_SIZE // (1024*1024)}MB"
         )
 
-    # Generate unique filename in user's folder
-    file_ext = file.filename.split('.')[-1] if file.filename else 'jpg'
-    unique_filename = f"{current_user['id']}/{uuid.uuid4()}.{file_ext}"
+    receiver = ImageReceiver(boundary)
+    try:
+        async for chunk in request.stream():
+            receiver.parser.write(chunk)
+        receiver.parser.finalize()
+    except RejectedUpload as e:
+        receiver.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=e.detail
+        )
+    except Exception:
+        receiver.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Malformed multipart upload"
+        )
+
+    if not receiver.received or receiver.size == 0:
+        receiver.close()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No file uploaded"
+        )
+
+    receiver.spool.seek(0)
+    return receiver
+
+
+@router.post("/", summary="Upload image to storage", openapi_extra={
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "properties": {"file": {"type": "string", "format": "binary"}},
+            "required": ["file"]
+        }}}
+    }
+})
+async def upload_image(
+    request: Request,
+    current_user: dict = Depends(get_current_user_dependency)
+):
+    """
+    Upload an image to Supabase Storage.
+    Returns the public URL of the uploaded image.
+
+    The multipart body is read incrementally: uploads over the size limit or
+    whose first bytes are not a JPEG, PNG, GIF or WebP image are rejected
+    before the rest of the body is read, and the file is streamed to storage
+    from a spooled temporary file rather than held in memory.
+    """
+    receiver = await receive_image(request)
+
+    # Name the object after the detected type, not the client's filename
+    unique_filename = f"{current_user['id']}/{uuid.uuid4()}.{FILE_EXTENSIONS[receiver.content_type]}"
 
     # Upload to Supabase Storage using admin client
     supabase = get_supabase_admin()
 
     try:
-        result = supabase.storage.from_('uploads').upload(
+        # The storage client sends buffered readers in chunks
+        result = await supabase.storage.from_('uploads').upload(
             path=unique_filename,
-            file=content,
-            file_options={"content-type": file.content_type}
+            file=io.BufferedReader(receiver.spool),
+            file_options={"content-type": receiver.content_type}
         )
 
         # Get public URL
-        public_url = supabase.storage.from_('uploads').get_public_url(unique_filename)
+        public_url = await supabase.storage.from_('uploads').get_public_url(unique_filename)
 
         return {
             "success": True,
@@ -62,3 +215,5 @@ async def upload_image(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to upload image: {str(e)}"
         )
+    finally:
+        receiver.close()
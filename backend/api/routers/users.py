@@ -2,7 +2,12 @@ from fastapi import APIRouter, HTTPException, Depends, status
 from models.user import User, UserUpdate, UserProfile
 from routers.auth import get_current_user_dependency
 from database import get_supabase
+from services.friend_cache import friend_cache
+from services.network_search import network_search
+from services.user_service import user_service
+from utils.cache import user_cache
 from datetime import datetime
+import asyncio
 
 router = APIRouter()
 
@@ -37,7 +42,7 @@ async def update_my_profile(
         update_data["last_name"] = user_update.last_name
     if user_update.username is not None:
         # Check username uniqueness
-        username_check = supabase.table('users').select('id').eq('username', user_update.username).neq('id', current_user['id']).execute()
+        username_check = await supabase.table('users').select('id').eq('username', user_update.username).neq('id', current_user['id']).execute()
         if username_check.data:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -62,7 +67,7 @@ async def update_my_profile(
     update_data["updated_at"] = datetime.utcnow().isoformat()
     
     # Update user
-    result = supabase.table('users').update(update_data).eq('id', current_user['id']).execute()
+    result = await supabase.table('users').update(update_data).eq('id', current_user['id']).execute()
     
     if not result.data:
         raise HTTPException(
@@ -70,11 +75,28 @@ async def update_my_profile(
             detail="Failed to update user"
         )
     
+    user_cache.invalidate(current_user['id'])
+    
     updated_user = result.data[0]
     updated_user.pop('password_hash', None)
     
     return updated_user
 
+@router.get("/typeahead", summary="Search friends and friends-of-friends as you type")
+async def typeahead_users(
+    q: str,
+    current_user: dict = Depends(get_current_user_dependency),
+    limit: int = 10
+):
+    """
+    Prefix-match names and usernames within the current user's network.
+    Friends rank ahead of friends-of-friends.
+    """
+    if not q.strip():
+        return []
+    
+    return await network_search.search(current_user['id'], q, min(max(limit, 1), 50))
+
 @router.get("/{user_id}", response_model=UserProfile, summary="Get user profile by ID")
 async def get_user_profile(
     user_id: str,
@@ -84,68 +106,61 @@ async def get_user_profile(
     Get user profile by user ID
     """
     supabase = get_supabase()
-    
-    # Get user data
-    user_result = supabase.table('users').select('*').eq('id', user_id).execute()
-    
-    if not user_result.data:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
+    is_self = user_id == current_user['id']
+    
+    # Issue every independent lookup at once; the endpoint costs one round trip
+    # instead of the sum of them
+    user_task = asyncio.create_task(supabase.table('users').select('*').eq('id', user_id).execute())
+    tasks = [user_task]
+    if not is_self:
+        friend_task = asyncio.create_task(friend_cache.are_friends(current_user['id'], user_id))
+        request_task = asyncio.create_task(
+            supabase.table('friend_requests').select('id').eq('sender_id', current_user['id']).eq('recipient_id', user_id).eq('status', 'pending').execute()
         )
+        tasks += [friend_task, request_task]
     
-    user = user_result.data[0]
-    
-    # Check if user is private and not a friend
-    if user['is_private'] and user['id'] != current_user['id']:
-        # Check if they are friends
-        friendship_check = supabase.table('friendships').select('id').or_(
-            f"and(user1_id.eq.{current_user['id']},user2_id.eq.{user_id})",
-            f"and(user1_id.eq.{user_id},user2_id.eq.{current_user['id']})"
-        ).execute()
+    try:
+        user_result = await user_task
         
-        if not friendship_check.data:
-            # Return limited profile for private users
-            return UserProfile(
-                id=user['id'],
-                first_name=user['first_name'],
-                last_name=user['last_name'],
-                username=user['username'],
-                avatar_url=user['avatar_url'],
-                bio=None,
-                is_private=True,
-                friend_count=0,
-                post_count=0,
-                is_friend=False,
-                is_friend_request_sent=False
+        if not user_result.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
             )
-    
-    # Get friend status
-    is_friend = False
-    is_friend_request_sent = False
-    
-    if user['id'] != current_user['id']:
-        # Check friendship
-        friendship_check = supabase.table('friendships').select('id').or_(
-            f"and(user1_id.eq.{current_user['id']},user2_id.eq.{user_id})",
-            f"and(user1_id.eq.{user_id},user2_id.eq.{current_user['id']})"
-        ).execute()
-        is_friend = len(friendship_check.data) > 0
         
-        # Check pending friend request
-        if not is_friend:
-            request_check = supabase.table('friend_requests').select('id').eq('sender_id', current_user['id']).eq('recipient_id', user_id).eq('status', 'pending').execute()
-            is_friend_request_sent = len(request_check.data) > 0
-    
-    # Get counts
-    friend_count_result = supabase.table('friendships').select('id', count='exact').or_(
-        f"user1_id.eq.{user_id}",
-        f"user2_id.eq.{user_id}"
-    ).execute()
-    friend_count = friend_count_result.count or 0
-    
-    post_count_result = supabase.table('posts').select('id', count='exact').eq('user_id', user_id).execute()
-    post_count = post_count_result.count or 0
+        user = user_result.data[0]
+        
+        # Get friend status
+        is_friend = False
+        is_friend_request_sent = False
+        
+        if not is_self:
+            is_friend = await friend_task
+            
+            # Return limited profile for private users who are not friends
+            if user['is_private'] and not is_friend:
+                return UserProfile(
+                    id=user['id'],
+                    first_name=user['first_name'],
+                    last_name=user['last_name'],
+                    username=user['username'],
+                    avatar_url=user['avatar_url'],
+                    bio=None,
+                    is_private=True,
+                    friend_count=0,
+                    post_count=0,
+                    is_friend=False,
+                    is_friend_request_sent=False
+                )
+            
+            # Check pending friend request
+            if not is_friend:
+                request_check = await request_task
+                is_friend_request_sent = len(request_check.data) > 0
+    finally:
+        # Early exits (404, private profile, errors) drop the lookups still in flight
+        for task in tasks:
+            task.cancel()
     
     return UserProfile(
         id=user['id'],
@@ -155,8 +170,9 @@ async def get_user_profile(
         avatar_url=user['avatar_url'],
         bio=user['bio'],
         is_private=user['is_private'],
-        friend_count=friend_count,
-        post_count=post_count,
+        # Maintained by triggers on friendships/posts
+        friend_count=user['friend_count'],
+        post_count=user['post_count'],
         is_friend=is_friend,
         is_friend_request_sent=is_friend_request_sent
     )
@@ -168,26 +184,22 @@ async def search_users(
     limit: int = 20
 ):
     """
-    Search users by name or username
+    Search users by name or username, best matches first
     """
     supabase = get_supabase()
     
-    # Search users
-    result = supabase.table('users').select('id, first_name, last_name, username, avatar_url').or_(
-        f"first_name.ilike.%{query}%",
-        f"last_name.ilike.%{query}%",
-        f"username.ilike.%{query}%"
-    ).neq('id', current_user['id']).limit(limit).execute()
+    # Search users (trigram-indexed, ranked; see search_users() in schema.sql)
+    result = await supabase.rpc('search_users', {
+        'search_query': query,
+        'requesting_user_id': current_user['id'],
+        'result_limit': limit
+    }).execute()
     
     users = result.data
     
     # Add friend status for each user
+    relationships = await user_service.resolve_relationships(current_user['id'], [user['id'] for user in users])
     for user in users:
-        # Check if they are friends
-        friendship_check = supabase.table('friendships').select('id').or_(
-            f"and(user1_id.eq.{current_user['id']},user2_id.eq.{user['id']})",
-            f"and(user1_id.eq.{user['id']},user2_id.eq.{current_user['id']})"
-        ).execute()
-        user['is_friend'] = len(friendship_check.data) > 0
+        user.update(relationships[user['id']])
     
     return users
@@ -0,0 +1,62 @@
+"""
+Backfill home_timeline for existing users before switching FEED_ENGINE to "timeline".
+
+Walks every active user in id order and materializes the newest
+TIMELINE_BACKFILL_DEPTH posts of the user and their friends into their
+timeline. Safe to re-run: existing rows are left untouched.
+
+Usage (from backend/api):
+    python -m scripts.backfill_timelines [--batch-size 500] [--user-id <uuid>]
+"""
+import argparse
+import asyncio
+
+from database import get_supabase, close_connections
+from services.timeline_service import timeline_service
+
+
+async def backfill(batch_size: int, user_id: str = None):
+    supabase = get_supabase()
+
+    if user_id:
+        count = await timeline_service.backfill_user(user_id)
+        print(f"{user_id}: {count} entries")
+        return
+
+    last_id = None
+    users_done = 0
+    entries = 0
+    while True:
+        query = supabase.table('users').select('id').eq('is_active', True)
+        if last_id:
+            query = query.gt('id', last_id)
+        result = await query.order('id').limit(batch_size).execute()
+        if not result.data:
+            break
+
+        for user in result.data:
+            entries += await timeline_service.backfill_user(user['id'])
+        users_done += len(result.data)
+        last_id = result.data[-1]['id']
+        print(f"Backfilled {users_done} users ({entries} entries)")
+
+    print(f"Done: {users_done} users, {entries} entries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="Users fetched per page")
+    parser.add_argument("--user-id", help="Backfill a single user")
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            await backfill(args.batch_size, args.user_id)
+        finally:
+            await close_connections()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
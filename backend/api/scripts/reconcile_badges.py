@@ -0,0 +1,72 @@
+"""
+Reconcile the user_badges counters behind GET /badges and the conversations
+rows behind GET /messages/.
+
+Both are maintained by triggers on `messages`, `conversation_reads`,
+`friend_requests` and `notifications`; this walks every user in id order and
+calls reconcile_user_badges() and refresh_user_conversations() (see
+schema.sql), which recount each batch, create missing rows and correct any
+drift. Run it once after adding the tables to backfill them, then periodically
+(e.g. hourly from cron) as a consistency check.
+
+Usage (from backend/api):
+    python -m scripts.reconcile_badges [--batch-size 500] [--user-id <uuid>]
+"""
+import argparse
+import asyncio
+
+from database import get_supabase_admin, close_connections
+
+
+async def reconcile(batch_size: int, user_id: str = None):
+    # The function writes rows of every user, so run it with the service role
+    supabase = get_supabase_admin()
+
+    if user_id:
+        result = await supabase.rpc('reconcile_user_badges', {'user_ids': [user_id]}).execute()
+        conversations = await supabase.rpc('refresh_user_conversations', {'user_ids': [user_id]}).execute()
+        print(f"{user_id}: badges {'reconciled' if result.data else 'already consistent'}, "
+              f"{conversations.data or 0} conversations refreshed")
+        return
+
+    last_id = None
+    checked = 0
+    reconciled = 0
+    refreshed = 0
+    while True:
+        query = supabase.table('users').select('id')
+        if last_id:
+            query = query.gt('id', last_id)
+        result = await query.order('id').limit(batch_size).execute()
+        if not result.data:
+            break
+
+        user_ids = [user['id'] for user in result.data]
+        reconcile_result = await supabase.rpc('reconcile_user_badges', {'user_ids': user_ids}).execute()
+        reconciled += reconcile_result.data or 0
+        conversations_result = await supabase.rpc('refresh_user_conversations', {'user_ids': user_ids}).execute()
+        refreshed += conversations_result.data or 0
+        checked += len(user_ids)
+        last_id = user_ids[-1]
+        print(f"Checked {checked} users ({reconciled} badges reconciled, {refreshed} conversations refreshed)")
+
+    print(f"Done: {checked} users checked, {reconciled} badges reconciled, {refreshed} conversations refreshed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="Users recounted per call")
+    parser.add_argument("--user-id", help="Reconcile a single user")
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            await reconcile(args.batch_size, args.user_id)
+        finally:
+            await close_connections()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Backfill or repair the denormalized users.friend_count / users.post_count columns.
+
+The counters are maintained by triggers on `friendships` and `posts`; this walks
+every user in id order and calls repair_user_counts() (see schema.sql), which
+recounts each batch and corrects any drift. Run it once after adding the
+columns, then periodically (e.g. nightly) as a consistency check.
+
+Usage (from backend/api):
+    python -m scripts.repair_user_counts [--batch-size 500] [--user-id <uuid>]
+"""
+import argparse
+import asyncio
+
+from database import get_supabase_admin, close_connections
+
+
+async def repair(batch_size: int, user_id: str = None):
+    # The function updates rows of every user, so run it with the service role
+    supabase = get_supabase_admin()
+
+    if user_id:
+        result = await supabase.rpc('repair_user_counts', {'user_ids': [user_id]}).execute()
+        print(f"{user_id}: {'repaired' if result.data else 'already consistent'}")
+        return
+
+    last_id = None
+    checked = 0
+    repaired = 0
+    while True:
+        query = supabase.table('users').select('id')
+        if last_id:
+            query = query.gt('id', last_id)
+        result = await query.order('id').limit(batch_size).execute()
+        if not result.data:
+            break
+
+        user_ids = [user['id'] for user in result.data]
+        repair_result = await supabase.rpc('repair_user_counts', {'user_ids': user_ids}).execute()
+        repaired += repair_result.data or 0
+        checked += len(user_ids)
+        last_id = user_ids[-1]
+        print(f"Checked {checked} users ({repaired} repaired)")
+
+    print(f"Done: {checked} users checked, {repaired} repaired")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500, help="Users recounted per call")
+    parser.add_argument("--user-id", help="Repair a single user")
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            await repair(args.batch_size, args.user_id)
+        finally:
+            await close_connections()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
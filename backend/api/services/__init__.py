@@ -1,5 +1,14 @@
 from .auth_service import AuthService
 from .sms_service import SMSService
 from .user_service import UserService
+from .friend_cache import FriendCache
+from .network_search import NetworkSearchService
+from .story_tray import StoryTrayService
+from .story_view_buffer import StoryViewBuffer
+from .like_counter import LikeCounterFolder
+from .message_hub import MessageHub
+from .read_receipts import ReadReceiptService
+from .notification_broadcaster import NotificationBroadcaster
+from .notification_queue import NotificationQueue
 
-__all__ = ["AuthService", "SMSService", "UserService"]
+__all__ = ["AuthService", "SMSService", "UserService", "FriendCache", "NetworkSearchService", "StoryTrayService", "StoryViewBuffer", "LikeCounterFolder", "MessageHub", "ReadReceiptService", "NotificationBroadcaster", "NotificationQueue"]
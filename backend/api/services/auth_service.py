@@ -1,7 +1,8 @@
 from database import get_supabase
-from utils.security import verify_password, get_password_hash, generate_token_pair
+from utils.security import verify_password_async, get_password_hash_async, generate_token_pair, PasswordHasherBusy
 from utils.helpers import format_phone_number, validate_phone_number
 from services.sms_service import sms_service
+from utils.cache import user_cache
 from typing import Optional, Dict
 import uuid
 from datetime import datetime
@@ -43,7 +44,7 @@ class AuthService:
             }
         
         # Check if user exists
-        user_result = self.supabase.table('users').select('*').eq('phone_number', formatted_phone).execute()
+        user_result = await self.supabase.table('users').select('*').eq('phone_number', formatted_phone).execute()
         
         return {
             "success": True,
@@ -56,7 +57,7 @@ class AuthService:
         """Register a new user"""
         try:
             # Hash password
-            hashed_password = get_password_hash(user_data["password"])
+            hashed_password = await get_password_hash_async(user_data["password"])
             
             # Create user record
             new_user = {
@@ -73,7 +74,7 @@ class AuthService:
                 "updated_at": datetime.utcnow().isoformat()
             }
             
-            result = self.supabase.table('users').insert(new_user).execute()
+            result = await self.supabase.table('users').insert(new_user).execute()
             
             if not result.data:
                 return {
@@ -109,7 +110,7 @@ class AuthService:
             }
         
         # Get user by phone number
-        user_result = self.supabase.table('users').select('*').eq('phone_number', formatted_phone).execute()
+        user_result = await self.supabase.table('users').select('*').eq('phone_number', formatted_phone).execute()
         
         if not user_result.data:
             return {
@@ -120,7 +121,15 @@ class AuthService:
         user = user_result.data[0]
         
         # Verify password
-        if not verify_password(password, user['password_hash']):
+        try:
+            password_valid = await verify_password_async(password, user['password_hash'])
+        except PasswordHasherBusy:
+            return {
+                "success": False,
+                "error": "Server is busy, please try again"
+            }
+        
+        if not password_valid:
             return {
                 "success": False,
                 "error": "Invalid credentials"
@@ -144,7 +153,7 @@ class AuthService:
 
     async def get_user_by_id(self, user_id: str) -> Optional[Dict]:
         """Get user by ID"""
-        result = self.supabase.table('users').select('*').eq('id', user_id).execute()
+        result = await self.supabase.table('users').select('*').eq('id', user_id).execute()
         
         if result.data:
             user = result.data[0]
@@ -158,7 +167,8 @@ class AuthService:
         try:
             update_data["updated_at"] = datetime.utcnow().isoformat()
             
-            result = self.supabase.table('users').update(update_data).eq('id', user_id).execute()
+            result = await self.supabase.table('users').update(update_data).eq('id', user_id).execute()
+            user_cache.invalidate(user_id)
             
             if not result.data:
                 return {
@@ -187,7 +197,7 @@ class AuthService:
         if exclude_user_id:
             query = query.neq('id', exclude_user_id)
         
-        result = query.execute()
+        result = await query.execute()
         return len(result.data) == 0
 
 # Create singleton instance
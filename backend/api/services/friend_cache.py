@@ -0,0 +1,75 @@
+from database import get_supabase
+from utils.cache import TTLCache
+from config import settings
+from typing import Set
+
+class FriendCache:
+    """
+    Per-user friend-ID sets built from the `friendships` table.
+
+    After the first lookup a user's friends are served from memory, and
+    are_friends() answers from whichever side is already cached. Friendship
+    writes made through this worker patch the cached sets in place; writes from
+    other workers become visible once the entry's TTL expires.
+
+    Returned sets are shared with the cache and must not be mutated by callers.
+    """
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self._cache = TTLCache(
+            max_size=settings.FRIEND_CACHE_MAX_USERS,
+            ttl=settings.FRIEND_CACHE_TTL_SECONDS
+        )
+
+    async def get_friend_ids(self, user_id: str) -> Set[str]:
+        """Get the set of a user's friend IDs"""
+        friend_ids = self._cache.get(user_id)
+        if friend_ids is not None:
+            return friend_ids
+        
+        friends_result = await self.supabase.table('friendships').select('user1_id, user2_id').or_(
+            f"user1_id.eq.{user_id},user2_id.eq.{user_id}"
+        ).execute()
+        
+        friend_ids = set()
+        for friendship in friends_result.data:
+            if friendship['user1_id'] == user_id:
+                friend_ids.add(friendship['user2_id'])
+            else:
+                friend_ids.add(friendship['user1_id'])
+        
+        self._cache.set(user_id, friend_ids)
+        return friend_ids
+
+    async def are_friends(self, user1_id: str, user2_id: str) -> bool:
+        """Check whether two users are friends, loading at most one friend set"""
+        cached = self._cache.peek(user2_id)
+        if cached is not None and self._cache.peek(user1_id) is None:
+            return user1_id in cached
+        return user2_id in await self.get_friend_ids(user1_id)
+
+    def add_friendship(self, user1_id: str, user2_id: str):
+        """Record a new friendship in any cached sets"""
+        for user_id, friend_id in ((user1_id, user2_id), (user2_id, user1_id)):
+            friend_ids = self._cache.peek(user_id)
+            if friend_ids is not None:
+                friend_ids.add(friend_id)
+
+    def remove_friendship(self, user1_id: str, user2_id: str):
+        """Remove a deleted friendship from any cached sets"""
+        for user_id, friend_id in ((user1_id, user2_id), (user2_id, user1_id)):
+            friend_ids = self._cache.peek(user_id)
+            if friend_ids is not None:
+                friend_ids.discard(friend_id)
+
+    def invalidate(self, user_id: str):
+        """Drop a user's cached friend set"""
+        self._cache.invalidate(user_id)
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring"""
+        return self._cache.stats()
+
+# Create singleton instance
+friend_cache = FriendCache()
@@ -0,0 +1,78 @@
+from database import get_supabase
+from config import settings
+from typing import Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class LikeCounterFolder:
+    """
+    Periodic fold of striped like counters (LIKE_COUNTER_MODE="sharded").
+
+    In sharded mode the like trigger adds +1/-1 to one of several
+    `post_like_shards` rows instead of updating the post, so hot posts do not
+    serialize their likers on one row lock. Every LIKE_COUNTER_FOLD_SECONDS this
+    task calls fold_post_like_shards(), which moves the pending sums into
+    `posts.likes_count` with one UPDATE per post. Feeds read `likes_count` and
+    may therefore lag by up to one fold interval; like/unlike responses include
+    the pending stripes and are exact.
+    """
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self.folds = 0
+        self.posts_folded = 0
+        self.last_fold_ms = 0.0
+
+    def start(self):
+        """Start folding in the background (called from the app lifespan)"""
+        if self._task is None and settings.LIKE_COUNTER_MODE == "sharded":
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background task and fold once more"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+        await self.fold()
+
+    async def fold(self) -> int:
+        """Fold pending stripes now; returns the number of posts updated"""
+        start = time.perf_counter()
+        result = await self.supabase.rpc('fold_post_like_shards', {}).execute()
+        self.last_fold_ms = round((time.perf_counter() - start) * 1000, 1)
+        self.folds += 1
+        self.posts_folded += result.data or 0
+        return result.data or 0
+
+    async def _run(self):
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=settings.LIKE_COUNTER_FOLD_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            if self._stopping.is_set():
+                break
+            try:
+                await self.fold()
+            except Exception as e:
+                logger.error(f"Like counter fold failed: {e}")
+
+    def stats(self) -> dict:
+        """Fold counters for monitoring"""
+        return {
+            "mode": settings.LIKE_COUNTER_MODE,
+            "folds": self.folds,
+            "posts_folded": self.posts_folded,
+            "last_fold_ms": self.last_fold_ms
+        }
+
+# Create singleton instance
+like_counter = LikeCounterFolder()
@@ -0,0 +1,84 @@
+from config import settings
+from typing import Dict, Set
+import asyncio
+
+class Subscription:
+    """One live connection's outbound queue"""
+
+    __slots__ = ('user_id', 'queue', 'overflowed')
+
+    def __init__(self, user_id: str, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        # Set when the client fell too far behind; the connection is then closed
+        self.overflowed = asyncio.Event()
+
+class MessageHub:
+    """
+    In-process publish/subscribe hub for real-time events (GET /messages/ws).
+
+    Each connection gets a bounded queue, so publishing never blocks on a slow
+    client: when a queue is full the connection is marked overflowed and closed,
+    and the client resyncs over REST after reconnecting. Only connections held by
+    this worker are reached; with several workers a recipient connected elsewhere
+    sees the message on their next fetch.
+    """
+
+    def __init__(self, queue_size: int = settings.WS_SEND_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    def subscribe(self, user_id: str) -> Subscription:
+        """Register a connection for a user"""
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a connection"""
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: str, event: dict) -> int:
+        """
+        Queue an event for every live connection of a user
+
+        Returns:
+            int: Number of connections the event was queued for
+        """
+        self.published += 1
+        delivered = 0
+        for subscription in self._subscriptions.get(user_id, ()):
+            if subscription.overflowed.is_set():
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+                delivered += 1
+            except asyncio.QueueFull:
+                self.overflows += 1
+                subscription.overflowed.set()
+        self.delivered += delivered
+        return delivered
+
+    def is_online(self, user_id: str) -> bool:
+        """True if the user has a live connection on this worker"""
+        return user_id in self._subscriptions
+
+    def stats(self) -> dict:
+        """Connection and delivery counters for monitoring"""
+        return {
+            "users": len(self._subscriptions),
+            "connections": sum(len(subscriptions) for subscriptions in self._subscriptions.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows
+        }
+
+# Create singleton instance
+message_hub = MessageHub()
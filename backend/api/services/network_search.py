@@ -0,0 +1,239 @@
+from database import get_supabase
+from services.friend_cache import friend_cache
+from utils.cache import TTLCache
+from config import settings
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List
+import asyncio
+
+# Rows per friendships page; stays under PostgREST's default max-rows (1000)
+FRIENDSHIPS_PAGE_SIZE = 1000
+# Batch queries in flight at once while building one index
+MAX_CONCURRENT_BATCHES = 8
+
+async def _fetch_in_batches(fetch, ids: List[str]) -> List[dict]:
+    """Run fetch(batch) over ID lists short enough for one `in.()` filter in a URL"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_BATCHES)
+    size = settings.NETWORK_INDEX_ID_BATCH
+
+    async def run(batch: List[str]) -> List[dict]:
+        async with semaphore:
+            return await fetch(batch)
+
+    pages = await asyncio.gather(*(run(ids[start:start + size]) for start in range(0, len(ids), size)))
+    return [row for page in pages for row in page]
+
+def _tokens(profile: dict) -> set:
+    """Lowercased names a user can be found by"""
+    first_name = (profile.get('first_name') or '').lower()
+    last_name = (profile.get('last_name') or '').lower()
+    tokens = {first_name, last_name, f"{first_name} {last_name}".strip()}
+    if profile.get('username'):
+        tokens.add(profile['username'].lower())
+    tokens.discard('')
+    return tokens
+
+class _NetworkIndex:
+    """Prefix index over one user's friends (degree 1) and friends-of-friends (degree 2)"""
+
+    __slots__ = ('members', 'degrees', 'links', 'tokens')
+
+    def __init__(self):
+        self.members: Dict[str, dict] = {}
+        self.degrees: Dict[str, int] = {}
+        # Number of the owner's friends connecting to each degree-2 member
+        self.links: Dict[str, int] = {}
+        # Sorted (token, user_id) pairs; a prefix is a contiguous range
+        self.tokens: List[tuple] = []
+
+    def add(self, profile: dict, degree: int):
+        user_id = profile['id']
+        if degree == 2:
+            self.links[user_id] = self.links.get(user_id, 0) + 1
+        if user_id in self.members:
+            self.degrees[user_id] = min(self.degrees[user_id], degree)
+            return
+        self.members[user_id] = profile
+        self.degrees[user_id] = degree
+        for token in _tokens(profile):
+            insort(self.tokens, (token, user_id))
+
+    def unlink(self, user_id: str):
+        """Drop one friend-of-friend connection, removing the member when none remain"""
+        if user_id not in self.links:
+            return
+        self.links[user_id] -= 1
+        if self.links[user_id] <= 0:
+            del self.links[user_id]
+            if self.degrees.get(user_id) == 2:
+                self.remove(user_id)
+
+    def remove(self, user_id: str):
+        profile = self.members.pop(user_id, None)
+        if profile is None:
+            return
+        self.degrees.pop(user_id, None)
+        self.links.pop(user_id, None)
+        for token in _tokens(profile):
+            position = bisect_left(self.tokens, (token, user_id))
+            if position < len(self.tokens) and self.tokens[position] == (token, user_id):
+                del self.tokens[position]
+
+    def search(self, query: str, limit: int) -> List[dict]:
+        words = query.lower().split()
+        if not words:
+            return []
+
+        # Candidates from the whole query as one prefix ("john sm") plus the first word
+        candidates = set()
+        for prefix in {' '.join(words), words[0]}:
+            position = bisect_left(self.tokens, (prefix,))
+            while position < len(self.tokens) and self.tokens[position][0].startswith(prefix):
+                candidates.add(self.tokens[position][1])
+                position += 1
+
+        matches = []
+        phrase = ' '.join(words)
+        for user_id in candidates:
+            profile = self.members[user_id]
+            tokens = _tokens(profile)
+            parts = {part for token in tokens for part in token.split()}
+            # Either the whole query prefixes a name, or every word prefixes one
+            if not any(token.startswith(phrase) for token in tokens) and \
+                    not all(any(part.startswith(word) for part in parts) for word in words):
+                continue
+            exact = (profile.get('username') or '').lower() == query.lower()
+            matches.append((not exact, self.degrees[user_id], profile.get('first_name') or '', user_id))
+
+        matches.sort()
+        return [
+            {**self.members[user_id], "degree": self.degrees[user_id], "is_friend": self.degrees[user_id] == 1}
+            for _, _, _, user_id in matches[:limit]
+        ]
+
+class NetworkSearchService:
+    """
+    Typeahead search scoped to a user's network.
+
+    Each user's index covers their friends and friends-of-friends and is built
+    lazily on their first search (a few batched, paged queries), then answers every
+    keystroke from memory. Friendship changes made through this worker patch
+    the affected indexes; indexes are evicted by LRU and expire after a TTL so
+    profile edits and other workers' changes eventually show up.
+    """
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self._indexes = TTLCache(
+            max_size=settings.NETWORK_INDEX_MAX_USERS,
+            ttl=settings.NETWORK_INDEX_TTL_SECONDS
+        )
+
+    async def search(self, user_id: str, query: str, limit: int = 10) -> List[dict]:
+        """Prefix-search a user's friends and friends-of-friends"""
+        index = self._indexes.get(user_id)
+        if index is None:
+            index = await self._build(user_id)
+        return index.search(query, limit)
+
+    async def add_friendship(self, user1_id: str, user2_id: str):
+        """Patch cached indexes after two users become friends"""
+        # The new friends' own networks changed wholesale; rebuild on next search
+        self._indexes.invalidate(user1_id)
+        self._indexes.invalidate(user2_id)
+
+        # Each existing friend of one side gains the other side as a friend-of-friend
+        affected = []
+        for user_id, new_member_id in ((user1_id, user2_id), (user2_id, user1_id)):
+            for friend_id in await friend_cache.get_friend_ids(user_id):
+                index = self._indexes.peek(friend_id)
+                if index is not None and friend_id != new_member_id:
+                    affected.append((index, new_member_id))
+        if not affected:
+            return
+
+        profiles = await self._fetch_profiles({member_id for _, member_id in affected})
+        for index, member_id in affected:
+            if member_id in profiles:
+                index.add(profiles[member_id], degree=2)
+
+    async def remove_friendship(self, user1_id: str, user2_id: str):
+        """Patch cached indexes after two users stop being friends"""
+        self._indexes.invalidate(user1_id)
+        self._indexes.invalidate(user2_id)
+
+        for user_id, lost_member_id in ((user1_id, user2_id), (user2_id, user1_id)):
+            for friend_id in await friend_cache.get_friend_ids(user_id):
+                index = self._indexes.peek(friend_id)
+                if index is not None:
+                    index.unlink(lost_member_id)
+
+    async def _build(self, user_id: str) -> _NetworkIndex:
+        friend_ids = set(await friend_cache.get_friend_ids(user_id))
+
+        # Friends-of-friends with the number of friends linking to each
+        links: Dict[str, int] = {}
+        seen = set()
+        for friendship in await self._fetch_friendships(list(friend_ids)):
+            # A friendship between two of the user's friends matches both sides' batches
+            if friendship['id'] in seen:
+                continue
+            seen.add(friendship['id'])
+            for via, member in ((friendship['user1_id'], friendship['user2_id']),
+                                (friendship['user2_id'], friendship['user1_id'])):
+                if via in friend_ids and member != user_id:
+                    links[member] = links.get(member, 0) + 1
+
+        profiles = await self._fetch_profiles(friend_ids | set(links))
+
+        index = _NetworkIndex()
+        for friend_id in friend_ids:
+            if friend_id in profiles:
+                index.add(profiles[friend_id], degree=1)
+        for member_id, count in links.items():
+            if member_id in profiles:
+                for _ in range(count):
+                    index.add(profiles[member_id], degree=2)
+
+        self._indexes.set(user_id, index)
+        return index
+
+    async def _fetch_friendships(self, user_ids: List[str]) -> List[dict]:
+        """Every friendship touching the given users, in ID batches paged by friendship ID"""
+
+        async def fetch_batch(batch: List[str]) -> List[dict]:
+            id_list = ','.join(batch)
+            rows = []
+            last_id = None
+            while True:
+                query = self.supabase.table('friendships').select('id, user1_id, user2_id').or_(
+                    f"user1_id.in.({id_list}),user2_id.in.({id_list})"
+                )
+                if last_id is not None:
+                    query = query.gt('id', last_id)
+                result = await query.order('id').limit(FRIENDSHIPS_PAGE_SIZE).execute()
+                rows += result.data
+                if len(result.data) < FRIENDSHIPS_PAGE_SIZE:
+                    return rows
+                last_id = result.data[-1]['id']
+
+        return await _fetch_in_batches(fetch_batch, user_ids)
+
+    async def _fetch_profiles(self, user_ids: Iterable[str]) -> Dict[str, dict]:
+        """Active users' profiles, fetched in ID batches"""
+
+        async def fetch_batch(batch: List[str]) -> List[dict]:
+            result = await self.supabase.table('users').select(
+                'id, first_name, last_name, username, avatar_url'
+            ).in_('id', batch).eq('is_active', True).execute()
+            return result.data
+
+        profiles = await _fetch_in_batches(fetch_batch, list(user_ids))
+        return {profile['id']: profile for profile in profiles}
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the per-user indexes"""
+        return self._indexes.stats()
+
+# Create singleton instance
+network_search = NetworkSearchService()
@@ -0,0 +1,25 @@
+from services.message_hub import MessageHub
+from config import settings
+
+class NotificationBroadcaster(MessageHub):
+    """
+    In-process fan-out of new notifications to open GET /notifications/stream
+    connections.
+
+    Works like the message hub: each stream has a bounded queue and a stream
+    that falls behind is closed, after which the browser reconnects with
+    Last-Event-ID and catches up from the database. Streams held by other
+    workers do not see events published here; they pick the rows up on their
+    next reconnect or listing.
+    """
+
+    def __init__(self):
+        super().__init__(queue_size=settings.NOTIFICATION_STREAM_QUEUE_SIZE)
+
+    def publish_notifications(self, notifications: list):
+        """Publish freshly inserted notification rows to their recipients"""
+        for notification in notifications:
+            self.publish(notification['user_id'], {"type": "notification", "notification": notification})
+
+# Create singleton instance
+notification_broadcaster = NotificationBroadcaster()
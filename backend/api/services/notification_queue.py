@@ -0,0 +1,329 @@
+from database import get_supabase
+from services.notification_broadcaster import notification_broadcaster
+from utils.cache import TTLCache
+from utils.helpers import is_row_error
+from config import settings
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Types collapsed into one row per target (post) within the aggregation window,
+# with the verb used once more than one actor is involved
+AGGREGATED_VERBS = {
+    'post_like': 'liked your post',
+    'post_comment': 'commented on your post'
+}
+
+# user_settings column that turns each notification type off
+PREFERENCE_COLUMNS = {
+    'post_like': 'like_notifications',
+    'post_comment': 'comment_notifications',
+    'friend_request': 'friend_requests_notifications',
+    'friend_accept': 'friend_requests_notifications'
+}
+
+class NotificationEvent:
+    """A domain event waiting to become a notification"""
+
+    __slots__ = ('type', 'actor_id', 'actor_name', 'actor_avatar_url', 'recipient_id', 'post_id', 'data', 'enqueued_at')
+
+    def __init__(self, type: str, actor: dict, recipient_id: Optional[str] = None,
+                 post_id: Optional[str] = None, data: Optional[dict] = None):
+        self.type = type
+        self.actor_id = actor['id']
+        self.actor_name = f"{actor.get('first_name') or ''} {actor.get('last_name') or ''}".strip() or 'Someone'
+        self.actor_avatar_url = actor.get('avatar_url')
+        # None for post events until the worker resolves the post's author
+        self.recipient_id = recipient_id
+        self.post_id = post_id
+        self.data = data or {}
+        self.enqueued_at = time.monotonic()
+
+def render(event: NotificationEvent) -> tuple:
+    """Title and message for an event"""
+    if event.type == 'post_like':
+        return "New like", f"{event.actor_name} liked your post"
+    if event.type == 'post_comment':
+        return "New comment", f"{event.actor_name} commented: {event.data.get('preview', '')}"
+    if event.type == 'friend_request':
+        return "New friend request", f"{event.actor_name} sent you a friend request"
+    return "Friend request accepted", f"{event.actor_name} accepted your friend request"
+
+class NotificationQueue:
+    """
+    Asynchronous notification pipeline.
+
+    Request handlers only enqueue an event (no database round trip). Worker
+    tasks drain the queue in batches of up to NOTIFICATION_BATCH_SIZE,
+    resolve post authors with one query per batch, drop events the recipient
+    has turned off in user_settings (cached for NOTIFICATION_SETTINGS_TTL_SECONDS),
+    write the rest with one RPC that aggregates likes and comments per post, and
+    publish the rows to open notification streams. The queue is bounded: when
+    it is full new events are dropped and counted rather than slowing the
+    request down. A batch that fails on a transient error (connection, timeout,
+    5xx) goes back on the queue and is retried after NOTIFICATION_RETRY_SECONDS;
+    only batches rejected for their data are dropped. Events still queued at
+    shutdown get one more write attempt before the worker exits.
+    """
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.NOTIFICATION_QUEUE_SIZE)
+        self._preferences = TTLCache(
+            max_size=settings.NOTIFICATION_SETTINGS_CACHE_SIZE,
+            ttl=settings.NOTIFICATION_SETTINGS_TTL_SECONDS
+        )
+        # Post ID -> author ID
+        self._authors = TTLCache(
+            max_size=settings.NOTIFICATION_SETTINGS_CACHE_SIZE,
+            ttl=settings.NOTIFICATION_SETTINGS_TTL_SECONDS
+        )
+        # (actor ID, post ID) of recent likes, so re-liking does not notify again
+        self._recent_likes = TTLCache(
+            max_size=settings.NOTIFICATION_SETTINGS_CACHE_SIZE,
+            ttl=settings.NOTIFICATION_SETTINGS_TTL_SECONDS
+        )
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+        self.enqueued = 0
+        self.dropped = 0
+        # Events turned off in the recipient's user_settings
+        self.suppressed = 0
+        # Events with no one to notify (deleted post, own post)
+        self.skipped = 0
+        self.written = 0
+        self.rows_written = 0
+        self.batches = 0
+        self.failures = 0
+        self.requeued = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    def start(self):
+        """Start the workers (called from the app lifespan)"""
+        if not self._workers:
+            self._stopping = False
+            self._workers = [asyncio.create_task(self._run()) for _ in range(settings.NOTIFICATION_WORKERS)]
+
+    async def stop(self):
+        """Stop the workers once the queue is drained"""
+        if self._workers:
+            self._stopping = True
+            await asyncio.gather(*self._workers)
+            self._workers = []
+        # One pass over what is left, so an outage at shutdown cannot loop forever
+        remaining = self._queue.qsize()
+        while remaining > 0:
+            batch = self._take_batch(min(remaining, settings.NOTIFICATION_BATCH_SIZE))
+            remaining -= len(batch)
+            await self._process(batch)
+        if not self._queue.empty():
+            logger.error(f"{self._queue.qsize()} notifications were not written before shutdown")
+
+    def enqueue(self, event: NotificationEvent):
+        """Queue an event without waiting; dropped if the queue is full"""
+        try:
+            self._queue.put_nowait(event)
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def post_liked(self, actor: dict, post_id: str):
+        """Notify a post's author of a like"""
+        if self._recent_likes.peek((actor['id'], post_id)) is not None:
+            return
+        self._recent_likes.set((actor['id'], post_id), True)
+        self.enqueue(NotificationEvent('post_like', actor, post_id=post_id, data={'post_id': post_id}))
+
+    def post_commented(self, actor: dict, post_id: str, comment: dict):
+        """Notify a post's author of a comment"""
+        self.enqueue(NotificationEvent('post_comment', actor, post_id=post_id, data={
+            'post_id': post_id,
+            'comment_id': comment['id'],
+            'preview': comment['content'][:100]
+        }))
+
+    def friend_request_sent(self, actor: dict, recipient_id: str, request_id: str):
+        """Notify the recipient of a friend request"""
+        self.enqueue(NotificationEvent('friend_request', actor, recipient_id=recipient_id, data={'request_id': request_id}))
+
+    def friend_request_accepted(self, actor: dict, sender_id: str, request_id: str):
+        """Notify the sender that their friend request was accepted"""
+        self.enqueue(NotificationEvent('friend_accept', actor, recipient_id=sender_id, data={'request_id': request_id}))
+
+    def _take_batch(self, limit: int = settings.NOTIFICATION_BATCH_SIZE) -> List[NotificationEvent]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _resolve_authors(self, events: List[NotificationEvent]):
+        """Fill in recipient_id for post events with one query for the uncached posts"""
+        missing = {event.post_id for event in events
+                   if event.recipient_id is None and self._authors.get(event.post_id) is None}
+        if missing:
+            result = await self.supabase.table('posts').select('id, user_id').in_('id', list(missing)).execute()
+            for post in result.data:
+                self._authors.set(post['id'], post['user_id'])
+        for event in events:
+            if event.recipient_id is None:
+                event.recipient_id = self._authors.peek(event.post_id)
+
+    async def _get_preferences(self, user_ids: set) -> Dict[str, dict]:
+        """Notification preferences per user; users without a settings row get the defaults"""
+        preferences = {}
+        missing = []
+        for user_id in user_ids:
+            cached = self._preferences.get(user_id)
+            if cached is None:
+                missing.append(user_id)
+            else:
+                preferences[user_id] = cached
+        if missing:
+            result = await self.supabase.table('user_settings').select(
+                'user_id, ' + ', '.join(sorted(set(PREFERENCE_COLUMNS.values())))
+            ).in_('user_id', missing).execute()
+            found = {row['user_id']: row for row in result.data}
+            for user_id in missing:
+                preferences[user_id] = found.get(user_id, {})
+                self._preferences.set(user_id, preferences[user_id])
+        return preferences
+
+    async def _process(self, batch: List[NotificationEvent]) -> bool:
+        """
+        Filter and write a batch
+
+        Returns:
+            bool: False if the batch was put back on the queue to retry
+        """
+        if not batch:
+            return True
+        try:
+            await self._resolve_authors(batch)
+            # Deleted posts and self-likes/comments produce nothing
+            deliverable = [event for event in batch if event.recipient_id and event.recipient_id != event.actor_id]
+            preferences = await self._get_preferences({event.recipient_id for event in deliverable})
+            events = [event for event in deliverable
+                      if preferences[event.recipient_id].get(PREFERENCE_COLUMNS[event.type]) is not False]
+            await self._write(events)
+        except Exception as e:
+            if is_row_error(e):
+                self.failures += len(batch)
+                logger.error(f"Notification batch rejected, dropping {len(batch)} events: {e}")
+                return True
+            logger.error(f"Notification batch failed, requeueing {len(batch)} events: {e}")
+            self._requeue(batch)
+            return False
+
+        # Counted once the batch is done, so a retried batch is not counted twice
+        self.skipped += len(batch) - len(deliverable)
+        self.suppressed += len(deliverable) - len(events)
+        lag_ms = (time.monotonic() - batch[0].enqueued_at) * 1000
+        self.last_lag_ms = round(lag_ms, 1)
+        self.max_lag_ms = max(self.max_lag_ms, self.last_lag_ms)
+        self.batches += 1
+        return True
+
+    def _requeue(self, batch: List[NotificationEvent]):
+        """Put a failed batch back on the queue; events that no longer fit are dropped"""
+        for event in batch:
+            try:
+                self._queue.put_nowait(event)
+                self.requeued += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def _write(self, events: List[NotificationEvent]):
+        """
+        Write a batch with write_notifications() and push the rows to open streams
+
+        Likes and comments on the same post for the same recipient are merged
+        into one item here, and the database folds that item into the
+        recipient's open group row for the post (see write_notifications() in
+        schema.sql), so a viral post keeps a single notification with an actor
+        count and a sample of recent actors. Counts are of distinct actors: an
+        actor already in the item or the group does not add to them.
+        """
+        if not events:
+            return
+        items: Dict[tuple, dict] = {}
+        # Newest event first, so each group's sample starts with its latest actors
+        for event in reversed(events):
+            title, message = render(event)
+            actor = {"id": event.actor_id, "name": event.actor_name, "avatar_url": event.actor_avatar_url}
+            if event.type in AGGREGATED_VERBS:
+                key = (event.recipient_id, event.type, event.post_id)
+                item = items.get(key)
+                if item is not None:
+                    if event.actor_id not in item['actor_ids']:
+                        item['actor_ids'].append(event.actor_id)
+                        item['actor_count'] += 1
+                        if len(item['actors']) < settings.NOTIFICATION_SAMPLE_ACTORS:
+                            item['actors'].append(actor)
+                    continue
+                group_key = f"{event.type}:{event.post_id}"
+            else:
+                key = (event.recipient_id, event.type, id(event))
+                group_key = None
+            items[key] = {
+                "user_id": event.recipient_id,
+                "type": event.type,
+                "title": title,
+                # Used while the group has one actor; later rows read
+                # "<latest actor> and N others <verb>"
+                "message": message,
+                "verb": AGGREGATED_VERBS.get(event.type),
+                "data": {"actor_id": event.actor_id, **event.data},
+                "group_key": group_key,
+                "actors": [actor],
+                "actor_ids": [event.actor_id],
+                "actor_count": 1
+            }
+
+        result = await self.supabase.rpc('write_notifications', {
+            'items': list(items.values()),
+            'window_seconds': settings.NOTIFICATION_AGGREGATION_WINDOW_SECONDS,
+            'sample_size': settings.NOTIFICATION_SAMPLE_ACTORS
+        }).execute()
+        self.written += len(events)
+        self.rows_written += len(result.data)
+        notification_broadcaster.publish_notifications(result.data)
+
+    async def _run(self):
+        while not (self._stopping and self._queue.empty()):
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=0.5)
+            except asyncio.TimeoutError:
+                continue
+            # Give a burst a moment to accumulate so it is written as one batch
+            if not self._stopping and self._queue.qsize() < settings.NOTIFICATION_BATCH_SIZE - 1:
+                await asyncio.sleep(settings.NOTIFICATION_BATCH_WAIT_MS / 1000)
+            if not await self._process([first] + self._take_batch(settings.NOTIFICATION_BATCH_SIZE - 1)):
+                if self._stopping:
+                    # stop() makes the final attempt
+                    break
+                await asyncio.sleep(settings.NOTIFICATION_RETRY_SECONDS)
+
+    def stats(self) -> dict:
+        """Queue depth, lag and throughput counters for monitoring"""
+        return {
+            "depth": self._queue.qsize(),
+            "workers": len(self._workers),
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "suppressed": self.suppressed,
+            "skipped": self.skipped,
+            "written": self.written,
+            "rows_written": self.rows_written,
+            "batches": self.batches,
+            "failed_events": self.failures,
+            "requeued": self.requeued,
+            "last_lag_ms": self.last_lag_ms,
+            "max_lag_ms": self.max_lag_ms
+        }
+
+# Create singleton instance
+notification_queue = NotificationQueue()
@@ -0,0 +1,132 @@
+from database import get_supabase
+from services.message_hub import message_hub
+from utils.pagination import sort_key
+from config import settings
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ReadReceiptService:
+    """
+    Per-conversation read watermarks.
+
+    Each participant has one conversation_reads row holding the newest message
+    they have read (last_read_at, last_read_message_id); a message is read when
+    its position is at or below its recipient's watermark, so reading a
+    conversation never updates message rows. Advances are coalesced in memory
+    and written every READ_RECEIPT_FLUSH_MS with one RPC that ignores any
+    watermark older than the stored one; the other participant's live
+    connections are then sent a "read" event.
+    """
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        # (user_id, conversation_key) -> (created_at, message_id)
+        self._pending: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.advanced = 0
+        self.written = 0
+        self.batches = 0
+
+    def start(self):
+        """Start the background writer (called from the app lifespan)"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the writer and persist pending watermarks"""
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def get_watermarks(self, key: str) -> Dict[str, Tuple[str, str]]:
+        """
+        Get both participants' watermarks for a conversation
+
+        Returns:
+            dict: user ID -> (last_read_at, last_read_message_id), including
+            advances not yet written
+        """
+        result = await self.supabase.table('conversation_reads').select(
+            'user_id, last_read_at, last_read_message_id'
+        ).eq('conversation_key', key).execute()
+
+        watermarks = {
+            row['user_id']: (row['last_read_at'], row['last_read_message_id'])
+            for row in result.data
+        }
+        for user_id in key.split(':'):
+            pending = self._pending.get((user_id, key))
+            if pending is not None and (
+                user_id not in watermarks or sort_key(*pending) > sort_key(*watermarks[user_id])
+            ):
+                watermarks[user_id] = pending
+        return watermarks
+
+    def advance(self, user_id: str, key: str, created_at: str, message_id: str):
+        """Move a user's watermark up to a message (never backwards)"""
+        pending = self._pending.get((user_id, key))
+        if pending is not None and sort_key(created_at, message_id) <= sort_key(*pending):
+            return
+        self._pending[(user_id, key)] = (created_at, str(message_id))
+        self.advanced += 1
+
+    async def flush(self):
+        """Write all pending watermarks with one RPC"""
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        rows = [{
+            "user_id": user_id,
+            "conversation_key": key,
+            "last_read_at": created_at,
+            "last_read_message_id": message_id
+        } for (user_id, key), (created_at, message_id) in batch.items()]
+
+        try:
+            await self.supabase.rpc('advance_read_watermarks', {'watermarks': rows}).execute()
+        except Exception as e:
+            # Keep the batch for the next flush unless a newer advance arrived meanwhile
+            logger.error(f"Read watermark write failed ({len(rows)} rows): {e}")
+            for pair, watermark in batch.items():
+                self._pending.setdefault(pair, watermark)
+            return
+
+        self.written += len(rows)
+        self.batches += 1
+
+        # Tell the other participant their messages were read
+        for row in rows:
+            for peer_id in row['conversation_key'].split(':'):
+                if peer_id != row['user_id']:
+                    message_hub.publish(peer_id, {"type": "read", **row})
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.READ_RECEIPT_FLUSH_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def stats(self) -> dict:
+        """Pending and written watermark counters for monitoring"""
+        return {
+            "pending": len(self._pending),
+            "advanced": self.advanced,
+            "written": self.written,
+            "batches": self.batches
+        }
+
+# Create singleton instance
+read_receipts = ReadReceiptService()
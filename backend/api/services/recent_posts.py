@@ -0,0 +1,152 @@
+from database import get_supabase
+from utils.cache import TTLCache
+from utils.pagination import decode_cursor, encode_cursor, sort_key
+from config import settings
+from collections import deque
+from heapq import merge
+from itertools import dropwhile, islice
+from typing import Iterable, List, Optional, Tuple
+
+class _AuthorBuffer:
+    """Ring buffer of one author's newest post headers, oldest first"""
+
+    __slots__ = ('entries', 'floor')
+
+    def __init__(self, entries: Iterable[tuple], floor: Optional[tuple]):
+        # (sort_key, post_id, created_at)
+        self.entries = deque(entries, maxlen=settings.FEED_RING_SIZE)
+        # Every post of the author at or above this key is buffered; None means all of them
+        self.floor = floor
+
+    def add(self, entry: tuple):
+        if len(self.entries) == self.entries.maxlen:
+            # The oldest header is about to fall out of the ring
+            self.floor = self.entries[1][0] if len(self.entries) > 1 else entry[0]
+        if self.entries and entry[0] < self.entries[-1][0]:
+            self.entries = deque(sorted([*self.entries, entry])[-self.entries.maxlen:], maxlen=self.entries.maxlen)
+        else:
+            self.entries.append(entry)
+
+class RecentPostsService:
+    """
+    Per-author ring buffers of recent post headers (FEED_ENGINE="ring").
+
+    The feed is assembled with a k-way heap merge over the buffers of the
+    viewer's friends, so recent pages need no `posts` sort in Postgres. The
+    merge is only trusted down to the highest per-author floor; pages older than
+    that buffered window return None and the caller falls back to the database.
+    Posts written through other workers appear once the author's buffer expires.
+    """
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self._buffers = TTLCache(
+            max_size=settings.FEED_RING_AUTHORS,
+            ttl=settings.FEED_RING_TTL_SECONDS
+        )
+
+    def add_post(self, post: dict):
+        """Push a newly created post into its author's buffer"""
+        buffer = self._buffers.peek(post['user_id'])
+        if buffer is not None:
+            buffer.add((sort_key(post['created_at'], post['id']), post['id'], post['created_at']))
+
+    def remove_post(self, post_id: str, author_id: str):
+        """Drop a deleted post from its author's buffer"""
+        buffer = self._buffers.peek(author_id)
+        if buffer is not None:
+            buffer.entries = deque(
+                (entry for entry in buffer.entries if entry[1] != post_id),
+                maxlen=buffer.entries.maxlen
+            )
+
+    async def get_page(
+        self,
+        author_ids: List[str],
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Optional[Tuple[List[str], Optional[str]]]:
+        """
+        Merge one feed page from the authors' buffers, newest first
+
+        Returns:
+            tuple: (post IDs, cursor for the next page or None), or None when the
+            page reaches past the buffered window and must be read from the database
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        cursor_key = sort_key(*decode_cursor(cursor)) if cursor else None
+        buffers = await self._get_buffers(author_ids)
+
+        floors = [buffer.floor for buffer in buffers if buffer.floor is not None]
+        floor = max(floors) if floors else None
+        if cursor_key is not None and floor is not None and cursor_key <= floor:
+            return None
+
+        merged = merge(*(reversed(buffer.entries) for buffer in buffers), key=lambda entry: entry[0], reverse=True)
+        if cursor_key is not None:
+            merged = dropwhile(lambda entry: entry[0] >= cursor_key, merged)
+            window = list(islice(merged, limit + 1))
+        else:
+            window = list(islice(merged, offset, offset + limit + 1))
+
+        page = window[:limit]
+        if floor is not None and (len(window) <= limit or page[-1][0] < floor):
+            return None
+
+        page_cursor = None
+        if len(window) > limit:
+            last = page[-1]
+            page_cursor = encode_cursor(last[2], last[1])
+        return [entry[1] for entry in page], page_cursor
+
+    async def _get_buffers(self, author_ids: List[str]) -> List[_AuthorBuffer]:
+        buffers = []
+        missing = []
+        for author_id in author_ids:
+            buffer = self._buffers.get(author_id)
+            if buffer is None:
+                missing.append(author_id)
+            else:
+                buffers.append(buffer)
+
+        if missing:
+            buffers.extend(await self._warm(missing))
+        return buffers
+
+    async def _warm(self, author_ids: List[str]) -> List[_AuthorBuffer]:
+        """Load buffers for cold authors with one newest-first scan"""
+        result = await self.supabase.table('posts').select('id, user_id, created_at').in_(
+            'user_id', author_ids
+        ).order('created_at', desc=True).order('id', desc=True).limit(settings.FEED_RING_WARM_ROWS).execute()
+
+        # If the scan hit its limit, only posts at or above its last row are known for every author
+        scan_floor = None
+        if len(result.data) >= settings.FEED_RING_WARM_ROWS:
+            last = result.data[-1]
+            scan_floor = sort_key(last['created_at'], last['id'])
+
+        headers = {author_id: [] for author_id in author_ids}
+        for post in result.data:
+            headers[post['user_id']].append((sort_key(post['created_at'], post['id']), post['id'], post['created_at']))
+
+        buffers = []
+        for author_id, entries in headers.items():
+            entries.sort()
+            floor = scan_floor
+            if len(entries) > settings.FEED_RING_SIZE:
+                entries = entries[-settings.FEED_RING_SIZE:]
+                floor = entries[0][0]
+            buffer = _AuthorBuffer(entries, floor)
+            self._buffers.set(author_id, buffer)
+            buffers.append(buffer)
+        return buffers
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the author buffers"""
+        return self._buffers.stats()
+
+# Create singleton instance
+recent_posts = RecentPostsService()
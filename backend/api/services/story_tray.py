@@ -0,0 +1,151 @@
+from database import get_supabase
+from services.friend_cache import friend_cache
+from utils.cache import TTLCache
+from utils.pagination import parse_timestamp
+from config import settings
+from datetime import datetime
+from typing import List, Optional
+
+def _sort_tray(tray: List[dict], viewer_id: str):
+    """Current user first, then groups with unviewed stories, then most recent story"""
+    tray.sort(key=lambda x: (
+        x['user_id'] != viewer_id,
+        not x['has_unviewed'],
+        x['stories'][0]['created_at'] if x['stories'] else ''
+    ))
+
+def _find_group(tray: Optional[List[dict]], user_id: str) -> Optional[dict]:
+    """Return the tray group holding a user's stories, if any"""
+    for group in tray or []:
+        if group['user_id'] == user_id:
+            return group
+    return None
+
+class StoryTrayService:
+    """
+    Per-viewer cache of the story tray returned by GET /stories/.
+
+    A cached tray lives until its earliest story expires (or the configured TTL,
+    whichever is sooner), so expired stories never have to be filtered out of
+    it. Creating or deleting a story drops the trays of the author and their
+    friends; viewing a story patches the viewer's tray in place.
+    """
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self._trays = TTLCache(
+            max_size=settings.STORY_TRAY_MAX_VIEWERS,
+            ttl=settings.STORY_TRAY_TTL_SECONDS
+        )
+
+    async def get_tray(self, viewer_id: str) -> List[dict]:
+        """Get active stories of the viewer and their friends, grouped by user"""
+        tray = self._trays.get(viewer_id)
+        if tray is None:
+            tray = await self._build(viewer_id)
+        return tray
+
+    async def invalidate_author(self, author_id: str):
+        """Drop every cached tray that can show the author's stories"""
+        self._trays.invalidate(author_id)
+        for friend_id in await friend_cache.get_friend_ids(author_id):
+            self._trays.invalidate(friend_id)
+
+    def invalidate(self, viewer_id: str):
+        """Drop a single viewer's tray"""
+        self._trays.invalidate(viewer_id)
+
+    def mark_viewed(self, viewer_id: str, story_id: str, author_id: str, new_view: bool):
+        """Patch cached trays after `viewer_id` views one of `author_id`'s stories"""
+        tray = self._trays.peek(viewer_id)
+        group = _find_group(tray, author_id)
+        if group is not None:
+            for story in group['stories']:
+                if story['id'] == story_id:
+                    story['is_viewed'] = True
+            group['has_unviewed'] = any(not story['is_viewed'] for story in group['stories'])
+            _sort_tray(tray, viewer_id)
+
+        # The author's own tray shows view counts
+        own_group = _find_group(self._trays.peek(author_id), author_id) if new_view else None
+        if own_group is not None:
+            for story in own_group['stories']:
+                if story['id'] == story_id:
+                    story['views_count'] += 1
+
+    async def _build(self, viewer_id: str) -> List[dict]:
+        # Get user's friends
+        friend_ids = list(await friend_cache.get_friend_ids(viewer_id))
+
+        # Include current user's own stories
+        friend_ids.append(viewer_id)
+
+        # Get active stories (not expired)
+        now = datetime.utcnow()
+        stories_result = await self.supabase.table('stories').select(
+            '*, users(first_name, last_name, avatar_url)'
+        ).in_('user_id', friend_ids).gt('expires_at', now.isoformat()).order('created_at', desc=True).execute()
+
+        if not stories_result.data:
+            self._trays.set(viewer_id, [])
+            return []
+
+        # Get story views for current user
+        story_ids = [story['id'] for story in stories_result.data]
+        views_result = await self.supabase.table('story_views').select('story_id').eq(
+            'viewer_id', viewer_id
+        ).in_('story_id', story_ids).execute()
+
+        viewed_story_ids = {view['story_id'] for view in views_result.data}
+
+        # Group stories by user
+        user_stories = {}
+        for story in stories_result.data:
+            user_id = story['user_id']
+            user_info = story.get('users', {})
+
+            story_data = {
+                'id': story['id'],
+                'user_id': user_id,
+                'content': story.get('content'),
+                'image_url': story.get('image_url'),
+                'background_color': story.get('background_color', '#000000'),
+                'views_count': story.get('views_count', 0),
+                'expires_at': story['expires_at'],
+                'created_at': story['created_at'],
+                'is_viewed': story['id'] in viewed_story_ids,
+                'user_first_name': user_info.get('first_name', ''),
+                'user_last_name': user_info.get('last_name', ''),
+                'user_avatar_url': user_info.get('avatar_url'),
+            }
+
+            if user_id not in user_stories:
+                user_stories[user_id] = {
+                    'user_id': user_id,
+                    'user_first_name': user_info.get('first_name', ''),
+                    'user_last_name': user_info.get('last_name', ''),
+                    'user_avatar_url': user_info.get('avatar_url'),
+                    'stories': [],
+                    'has_unviewed': False
+                }
+
+            user_stories[user_id]['stories'].append(story_data)
+            if not story_data['is_viewed']:
+                user_stories[user_id]['has_unviewed'] = True
+
+        tray = list(user_stories.values())
+        _sort_tray(tray, viewer_id)
+
+        # Expire the cached tray no later than its first story
+        earliest = min(parse_timestamp(story['expires_at']) for story in stories_result.data)
+        ttl = min(settings.STORY_TRAY_TTL_SECONDS, (earliest - now).total_seconds())
+        if ttl > 0:
+            self._trays.set(viewer_id, tray, ttl=ttl)
+        return tray
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the tray cache"""
+        return self._trays.stats()
+
+# Create singleton instance
+story_tray = StoryTrayService()
@@ -0,0 +1,185 @@
+from database import get_supabase
+from utils.cache import TTLCache
+from utils.helpers import is_row_error
+from config import settings
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class StoryViewBuffer:
+    """
+    Write-behind buffer for story views.
+
+    POST /stories/{story_id}/view only records the (story_id, viewer_id) pair in
+    memory. A background task writes the buffer every STORY_VIEW_FLUSH_MS, or as
+    soon as STORY_VIEW_FLUSH_MAX pairs are waiting, with one conflict-ignoring
+    bulk insert; the statement-level trigger on story_views then applies one
+    views_count update per story. Pairs already buffered or recently written are
+    dropped in memory. If the database is unreachable the batch goes back into
+    the buffer for the next flush (up to STORY_VIEW_DEDUP_SIZE pairs). The
+    buffer is flushed on shutdown, so views are only lost if the worker dies
+    without running its lifespan hook or the database is down at that point.
+    """
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self._pending: Dict[Tuple[str, str], str] = {}
+        # Pairs written recently, so repeated taps never reach the database
+        self._written = TTLCache(
+            max_size=settings.STORY_VIEW_DEDUP_SIZE,
+            ttl=settings.STORY_VIEW_DEDUP_TTL_SECONDS
+        )
+        # Story ID -> author ID, so a view needs no story lookup
+        self._authors = TTLCache(
+            max_size=settings.STORY_VIEW_DEDUP_SIZE,
+            ttl=settings.STORY_VIEW_DEDUP_TTL_SECONDS
+        )
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushed = 0
+        self.batches = 0
+        self.duplicates = 0
+        self.failures = 0
+        self.requeued = 0
+
+    def start(self):
+        """Start the background flusher (called from the app lifespan)"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher and write everything still buffered"""
+        if self._task is not None:
+            # Wake the flusher and let it exit on its own; cancelling it can be
+            # swallowed by wait_for() on Python < 3.12
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def get_author(self, story_id: str) -> Optional[str]:
+        """Get a story's author ID, or None if the story does not exist"""
+        author_id = self._authors.get(story_id)
+        if author_id is None:
+            result = await self.supabase.table('stories').select('user_id').eq('id', story_id).execute()
+            if not result.data:
+                return None
+            author_id = result.data[0]['user_id']
+            self._authors.set(story_id, author_id)
+        return author_id
+
+    def forget_story(self, story_id: str):
+        """Drop a deleted story from the author cache"""
+        self._authors.invalidate(story_id)
+
+    def record(self, story_id: str, viewer_id: str) -> bool:
+        """
+        Buffer a view
+
+        Returns:
+            bool: False if this worker has already seen the pair
+        """
+        key = (story_id, viewer_id)
+        if key in self._pending or self._written.peek(key) is not None:
+            self.duplicates += 1
+            return False
+
+        self._pending[key] = datetime.utcnow().isoformat()
+        # Only on reaching the threshold, so a backlog requeued during an
+        # outage waits for the timer instead of flushing on every view
+        if len(self._pending) == settings.STORY_VIEW_FLUSH_MAX:
+            self._wakeup.set()
+        return True
+
+    def is_pending(self, story_id: str, viewer_id: str) -> bool:
+        """True if the view is buffered but not yet written"""
+        return (story_id, viewer_id) in self._pending
+
+    async def flush(self):
+        """Write all buffered views with one bulk insert"""
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        rows = [{
+            "story_id": story_id,
+            "viewer_id": viewer_id,
+            "viewed_at": viewed_at
+        } for (story_id, viewer_id), viewed_at in batch.items()]
+
+        written = []
+        try:
+            await self.supabase.table('story_views').upsert(
+                rows, on_conflict='story_id,viewer_id', ignore_duplicates=True, returning='minimal'
+            ).execute()
+            written = list(batch)
+        except Exception as e:
+            if not is_row_error(e):
+                logger.error(f"Story view flush failed, keeping {len(rows)} views buffered: {e}")
+                self._requeue(batch)
+                return
+            # Most likely a story deleted since it was viewed; retry row by row
+            # so one bad row does not drop the batch
+            logger.error(f"Bulk story view insert failed ({len(rows)} rows): {e}")
+            for index, row in enumerate(rows):
+                key = (row['story_id'], row['viewer_id'])
+                try:
+                    await self.supabase.table('story_views').upsert(
+                        row, on_conflict='story_id,viewer_id', ignore_duplicates=True, returning='minimal'
+                    ).execute()
+                    written.append(key)
+                except Exception as row_error:
+                    if not is_row_error(row_error):
+                        logger.error(f"Story view retry interrupted, keeping {len(rows) - index} views buffered: {row_error}")
+                        self._requeue({
+                            (rest['story_id'], rest['viewer_id']): rest['viewed_at'] for rest in rows[index:]
+                        })
+                        break
+                    self.failures += 1
+
+        # Only written pairs are deduped; failed ones may be recorded again
+        for key in written:
+            self._written.set(key, True)
+        self.flushed += len(written)
+        self.batches += 1
+
+    def _requeue(self, batch: Dict[Tuple[str, str], str]):
+        """Put unwritten views back in the buffer, dropping any beyond its cap"""
+        for key, viewed_at in batch.items():
+            if len(self._pending) >= settings.STORY_VIEW_DEDUP_SIZE:
+                self.failures += 1
+            elif key not in self._pending:
+                self._pending[key] = viewed_at
+                self.requeued += 1
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.STORY_VIEW_FLUSH_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Story view flush failed: {e}")
+
+    def stats(self) -> dict:
+        """Buffer depth and write counters for monitoring"""
+        return {
+            "pending": len(self._pending),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "duplicates_dropped": self.duplicates,
+            "failed_rows": self.failures,
+            "requeued": self.requeued
+        }
+
+# Create singleton instance
+story_view_buffer = StoryViewBuffer()
@@ -0,0 +1,200 @@
+from database import get_supabase
+from services.friend_cache import friend_cache
+from utils.cache import TTLCache
+from utils.pagination import decode_cursor, encode_cursor, keyset_filter, next_cursor, sort_key
+from config import settings
+from bisect import bisect_left, insort
+from typing import Iterable, List, Optional, Tuple
+
+class _MemoryTimeline:
+    """The newest entries of one user's home timeline, oldest first"""
+
+    __slots__ = ('entries', 'exhaustive')
+
+    def __init__(self, entries: list, exhaustive: bool):
+        # (sort_key, post_id, created_at, author_id)
+        self.entries = entries
+        # True when the entries are the user's entire timeline, not just its head
+        self.exhaustive = exhaustive
+
+class TimelineService:
+    """
+    Fan-out-on-write home timelines (FEED_ENGINE="timeline").
+
+    create_post writes one `home_timeline` row per recipient (the author and their
+    friends), so reading a feed page is a single indexed slice of the viewer's own
+    rows instead of an `in_('user_id', friend_ids)` sort over `posts`. The newest
+    TIMELINE_MEMORY_SIZE entries of recently active users are also kept in memory.
+    """
+
+    def __init__(self):
+        self.supabase = get_supabase()
+        self._memory = TTLCache(
+            max_size=settings.TIMELINE_MEMORY_USERS,
+            ttl=settings.TIMELINE_MEMORY_TTL_SECONDS
+        )
+
+    async def fan_out_post(self, post: dict):
+        """Append a new post to the timelines of its author and the author's friends"""
+        author_id = post['user_id']
+        recipients = set(await friend_cache.get_friend_ids(author_id))
+        recipients.add(author_id)
+
+        rows = [{
+            "user_id": user_id,
+            "post_id": post['id'],
+            "author_id": author_id,
+            "created_at": post['created_at']
+        } for user_id in recipients]
+        await self.supabase.table('home_timeline').upsert(
+            rows, on_conflict='user_id,post_id', ignore_duplicates=True, returning='minimal'
+        ).execute()
+
+        entry = (sort_key(post['created_at'], post['id']), post['id'], post['created_at'], author_id)
+        for user_id in recipients:
+            timeline = self._memory.peek(user_id)
+            if timeline is not None:
+                insort(timeline.entries, entry)
+                if len(timeline.entries) > settings.TIMELINE_MEMORY_SIZE:
+                    del timeline.entries[0]
+                    timeline.exhaustive = False
+
+    async def retract_post(self, post_id: str, author_id: str):
+        """Remove a deleted post from every timeline"""
+        await self.supabase.table('home_timeline').delete(returning='minimal').eq('post_id', post_id).execute()
+
+        recipients = set(await friend_cache.get_friend_ids(author_id))
+        recipients.add(author_id)
+        for user_id in recipients:
+            self._retract_memory(user_id, lambda entry: entry[1] == post_id)
+
+    async def retract_friendship(self, user1_id: str, user2_id: str):
+        """Remove each user's posts from the other's timeline after unfriending"""
+        await self.supabase.table('home_timeline').delete(returning='minimal').or_(
+            f"and(user_id.eq.{user1_id},author_id.eq.{user2_id}),"
+            f"and(user_id.eq.{user2_id},author_id.eq.{user1_id})"
+        ).execute()
+
+        self._retract_memory(user1_id, lambda entry: entry[3] == user2_id)
+        self._retract_memory(user2_id, lambda entry: entry[3] == user1_id)
+
+    async def add_friendship(self, user1_id: str, user2_id: str):
+        """Backfill each new friend's recent posts into the other's timeline"""
+        await self.backfill_user(user1_id, [user2_id])
+        await self.backfill_user(user2_id, [user1_id])
+
+    async def backfill_user(self, user_id: str, author_ids: Optional[Iterable[str]] = None) -> int:
+        """
+        Materialize the newest TIMELINE_BACKFILL_DEPTH posts of `author_ids`
+        (default: the user and all of their friends) into the user's timeline
+
+        Returns:
+            int: Number of timeline rows written or already present
+        """
+        if author_ids is None:
+            author_ids = set(await friend_cache.get_friend_ids(user_id))
+            author_ids.add(user_id)
+        author_ids = list(author_ids)
+        if not author_ids:
+            return 0
+
+        posts_result = await self.supabase.table('posts').select('id, user_id, created_at').in_(
+            'user_id', author_ids
+        ).order('created_at', desc=True).limit(settings.TIMELINE_BACKFILL_DEPTH).execute()
+
+        if posts_result.data:
+            rows = [{
+                "user_id": user_id,
+                "post_id": post['id'],
+                "author_id": post['user_id'],
+                "created_at": post['created_at']
+            } for post in posts_result.data]
+            await self.supabase.table('home_timeline').upsert(
+                rows, on_conflict='user_id,post_id', ignore_duplicates=True, returning='minimal'
+            ).execute()
+
+        # Rebuild from the table on next read
+        self._memory.invalidate(user_id)
+        return len(posts_result.data)
+
+    async def get_page(
+        self,
+        user_id: str,
+        limit: int,
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[str], Optional[str]]:
+        """
+        Get one page of a user's timeline, newest first
+
+        Args:
+            user_id: Timeline owner
+            limit: Page size
+            offset: Offset into the timeline (ignored when `cursor` is given)
+            cursor: Keyset cursor from a previous page
+
+        Returns:
+            tuple: (post IDs, cursor for the next page or None)
+
+        Raises:
+            ValueError: If the cursor is malformed
+        """
+        if cursor:
+            cursor_key = sort_key(*decode_cursor(cursor))
+
+        timeline = await self._load_memory(user_id)
+
+        # Serve from memory when the requested window lies inside the cached head
+        if cursor:
+            end = bisect_left(timeline.entries, (cursor_key,))
+        else:
+            end = max(0, len(timeline.entries) - offset)
+        window = timeline.entries[max(0, end - limit - 1):end][::-1]
+
+        if len(window) > limit or timeline.exhaustive:
+            page_cursor = None
+            if len(window) > limit:
+                last = window[limit - 1]
+                page_cursor = encode_cursor(last[2], last[1])
+            return [entry[1] for entry in window[:limit]], page_cursor
+
+        # Older than the cached head: read the slice from the table
+        query = self.supabase.table('home_timeline').select('post_id, created_at').eq('user_id', user_id)
+        if cursor:
+            query = query.or_(keyset_filter(cursor, id_column='post_id'))
+            query = query.order('created_at', desc=True).order('post_id', desc=True).limit(limit + 1)
+        else:
+            query = query.order('created_at', desc=True).order('post_id', desc=True).range(offset, offset + limit)
+        result = await query.execute()
+
+        page_cursor = next_cursor(result.data, limit, id_column='post_id')
+        return [row['post_id'] for row in result.data[:limit]], page_cursor
+
+    async def _load_memory(self, user_id: str) -> _MemoryTimeline:
+        timeline = self._memory.get(user_id)
+        if timeline is not None:
+            return timeline
+
+        result = await self.supabase.table('home_timeline').select('post_id, author_id, created_at').eq(
+            'user_id', user_id
+        ).order('created_at', desc=True).order('post_id', desc=True).limit(settings.TIMELINE_MEMORY_SIZE).execute()
+
+        entries = sorted(
+            (sort_key(row['created_at'], row['post_id']), row['post_id'], row['created_at'], row['author_id'])
+            for row in result.data
+        )
+        timeline = _MemoryTimeline(entries, exhaustive=len(entries) < settings.TIMELINE_MEMORY_SIZE)
+        self._memory.set(user_id, timeline)
+        return timeline
+
+    def _retract_memory(self, user_id: str, predicate):
+        timeline = self._memory.peek(user_id)
+        if timeline is not None:
+            timeline.entries = [entry for entry in timeline.entries if not predicate(entry)]
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the in-memory tier"""
+        return self._memory.stats()
+
+# Create singleton instance
+timeline_service = TimelineService()
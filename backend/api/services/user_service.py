@@ -1,4 +1,6 @@
 from database import get_supabase
+from utils.cache import user_cache
+from services.friend_cache import friend_cache
 from typing import Optional, Dict, List
 from datetime import datetime
 
@@ -9,7 +11,7 @@ class UserService:
     async def get_user_profile(self, user_id: str, current_user_id: str) -> Optional[Dict]:
         """Get user profile with privacy considerations"""
         # Get user data
-        user_result = self.supabase.table('users').select('*').eq('id', user_id).execute()
+        user_result = await self.supabase.table('users').select('*').eq('id', user_id).execute()
         
         if not user_result.data:
             return None
@@ -24,12 +26,7 @@ class UserService:
         # Check if user is private and not a friend
         if user.get('is_private', False):
             # Check friendship
-            friendship_check = self.supabase.table('friendships').select('id').or_(
-                f"and(user1_id.eq.{current_user_id},user2_id.eq.{user_id})",
-                f"and(user1_id.eq.{user_id},user2_id.eq.{current_user_id})"
-            ).execute()
-            
-            if not friendship_check.data:
+            if not await friend_cache.are_friends(current_user_id, user_id):
                 # Return limited profile for private users
                 return {
                     "id": user['id'],
@@ -45,57 +42,79 @@ class UserService:
         return user
 
     async def search_users(self, query: str, current_user_id: str, limit: int = 20) -> List[Dict]:
-        """Search users by name or username"""
-        result = self.supabase.table('users').select(
-            'id, first_name, last_name, username, avatar_url, is_private'
-        ).or_(
-            f"first_name.ilike.%{query}%",
-            f"last_name.ilike.%{query}%",
-            f"username.ilike.%{query}%"
-        ).neq('id', current_user_id).limit(limit).execute()
+        """Search users by name or username, best matches first"""
+        result = await self.supabase.rpc('search_users', {
+            'search_query': query,
+            'requesting_user_id': current_user_id,
+            'result_limit': limit
+        }).execute()
         
         users = result.data
         
         # Add friend status for each user
+        relationships = await self.resolve_relationships(current_user_id, [user['id'] for user in users])
         for user in users:
-            # Check if they are friends
-            friendship_check = self.supabase.table('friendships').select('id').or_(
-                f"and(user1_id.eq.{current_user_id},user2_id.eq.{user['id']})",
-                f"and(user1_id.eq.{user['id']},user2_id.eq.{current_user_id})"
-            ).execute()
-            user['is_friend'] = len(friendship_check.data) > 0
-            
-            # Check pending friend request
-            if not user['is_friend']:
-                request_check = self.supabase.table('friend_requests').select('id').eq(
-                    'sender_id', current_user_id
-                ).eq('recipient_id', user['id']).eq('status', 'pending').execute()
-                user['is_friend_request_sent'] = len(request_check.data) > 0
-            else:
-                user['is_friend_request_sent'] = False
+            user.update(relationships[user['id']])
         
         return users
 
+    async def resolve_relationships(self, current_user_id: str, user_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Resolve friendship and pending request status for many users at once
+        
+        Friendship comes from the friend cache (at most one query) and both
+        directions of pending requests from a single friend_requests query.
+        
+        Returns:
+            dict: user_id -> {is_friend, is_friend_request_sent, request_received}
+        """
+        relationships = {
+            user_id: {
+                "is_friend": False,
+                "is_friend_request_sent": False,
+                "request_received": False
+            }
+            for user_id in user_ids
+        }
+        if not relationships:
+            return relationships
+        
+        friend_ids = await friend_cache.get_friend_ids(current_user_id)
+        pending_ids = []
+        for user_id, relationship in relationships.items():
+            if user_id in friend_ids:
+                relationship["is_friend"] = True
+            else:
+                pending_ids.append(user_id)
+        
+        if pending_ids:
+            id_list = ','.join(pending_ids)
+            request_result = await self.supabase.table('friend_requests').select('sender_id, recipient_id').or_(
+                f"and(sender_id.eq.{current_user_id},recipient_id.in.({id_list})),"
+                f"and(recipient_id.eq.{current_user_id},sender_id.in.({id_list}))"
+            ).eq('status', 'pending').execute()
+            
+            for request in request_result.data:
+                if request['sender_id'] == current_user_id:
+                    relationships[request['recipient_id']]["is_friend_request_sent"] = True
+                else:
+                    relationships[request['sender_id']]["request_received"] = True
+        
+        return relationships
+
     async def get_user_stats(self, user_id: str) -> Dict:
         """Get user statistics (friend count, post count, etc.)"""
-        # Get friend count
-        friend_count_result = self.supabase.table('friendships').select('id', count='exact').or_(
-            f"user1_id.eq.{user_id}",
-            f"user2_id.eq.{user_id}"
-        ).execute()
-        friend_count = friend_count_result.count or 0
-        
-        # Get post count
-        post_count_result = self.supabase.table('posts').select('id', count='exact').eq('user_id', user_id).execute()
-        post_count = post_count_result.count or 0
+        # Counters are maintained by triggers on friendships/posts
+        result = await self.supabase.table('users').select('friend_count, post_count').eq('id', user_id).execute()
+        counts = result.data[0] if result.data else {}
         
         # Get follower count (if you implement following feature)
-        # follower_count_result = self.supabase.table('follows').select('id', count='exact').eq('following_id', user_id).execute()
+        # follower_count_result = await self.supabase.table('follows').select('id', count='exact').eq('following_id', user_id).execute()
         # follower_count = follower_count_result.count or 0
         
         return {
-            "friend_count": friend_count,
-            "post_count": post_count,
+            "friend_count": counts.get('friend_count', 0),
+            "post_count": counts.get('post_count', 0),
             # "follower_count": follower_count,
             # "following_count": following_count
         }
@@ -114,7 +133,8 @@ class UserService:
             
             filtered_data["updated_at"] = datetime.utcnow().isoformat()
             
-            result = self.supabase.table('users').update(filtered_data).eq('id', user_id).execute()
+            result = await self.supabase.table('users').update(filtered_data).eq('id', user_id).execute()
+            user_cache.invalidate(user_id)
             
             if not result.data:
                 return {
@@ -139,7 +159,7 @@ class UserService:
     async def check_friendship_status(self, user1_id: str, user2_id: str) -> Dict:
         """Check friendship status between two users"""
         # Check if they are friends
-        friendship_check = self.supabase.table('friendships').select('id, created_at').or_(
+        friendship_check = await self.supabase.table('friendships').select('id, created_at').or_(
             f"and(user1_id.eq.{user1_id},user2_id.eq.{user2_id})",
             f"and(user1_id.eq.{user2_id},user2_id.eq.{user1_id})"
         ).execute()
@@ -151,7 +171,7 @@ class UserService:
             }
         
         # Check for pending friend requests
-        request_check = self.supabase.table('friend_requests').select('id, sender_id, status').or_(
+        request_check = await self.supabase.table('friend_requests').select('id, sender_id, status').or_(
             f"and(sender_id.eq.{user1_id},recipient_id.eq.{user2_id})",
             f"and(sender_id.eq.{user2_id},recipient_id.eq.{user1_id})"
         ).eq('status', 'pending').execute()
@@ -167,40 +187,18 @@ class UserService:
 
     async def get_mutual_friends(self, user1_id: str, user2_id: str) -> List[Dict]:
         """Get mutual friends between two users"""
-        # Get user1's friends
-        user1_friends = self.supabase.table('friendships').select('user1_id, user2_id').or_(
-            f"user1_id.eq.{user1_id}",
-            f"user2_id.eq.{user1_id}"
-        ).execute()
-        
-        user1_friend_ids = []
-        for friendship in user1_friends.data:
-            if friendship['user1_id'] == user1_id:
-                user1_friend_ids.append(friendship['user2_id'])
-            else:
-                user1_friend_ids.append(friendship['user1_id'])
-        
-        # Get user2's friends
-        user2_friends = self.supabase.table('friendships').select('user1_id, user2_id').or_(
-            f"user1_id.eq.{user2_id}",
-            f"user2_id.eq.{user2_id}"
-        ).execute()
-        
-        user2_friend_ids = []
-        for friendship in user2_friends.data:
-            if friendship['user1_id'] == user2_id:
-                user2_friend_ids.append(friendship['user2_id'])
-            else:
-                user2_friend_ids.append(friendship['user1_id'])
+        # Get both users' friends
+        user1_friend_ids = await friend_cache.get_friend_ids(user1_id)
+        user2_friend_ids = await friend_cache.get_friend_ids(user2_id)
         
         # Find mutual friends
-        mutual_friend_ids = list(set(user1_friend_ids) & set(user2_friend_ids))
+        mutual_friend_ids = list(user1_friend_ids & user2_friend_ids)
         
         if not mutual_friend_ids:
             return []
         
         # Get mutual friends' details
-        mutual_friends = self.supabase.table('users').select(
+        mutual_friends = await self.supabase.table('users').select(
             'id, first_name, last_name, username, avatar_url'
         ).in_('id', mutual_friend_ids).execute()
         
@@ -209,10 +207,11 @@ class UserService:
     async def deactivate_user(self, user_id: str) -> Dict:
         """Deactivate user account"""
         try:
-            result = self.supabase.table('users').update({
+            result = await self.supabase.table('users').update({
                 'is_active': False,
                 'updated_at': datetime.utcnow().isoformat()
             }).eq('id', user_id).execute()
+            user_cache.invalidate(user_id)
             
             if not result.data:
                 return {
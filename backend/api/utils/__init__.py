@@ -1,4 +1,7 @@
-from .security import create_access_token, create_refresh_token, verify_token, get_password_hash, verify_password
+from .security import (
+    create_access_token, create_refresh_token, verify_token, get_password_hash, verify_password,
+    get_password_hash_async, verify_password_async, PasswordHasherBusy
+)
 from .helpers import format_phone_number, validate_phone_number, generate_username
 
 __all__ = [
@@ -7,6 +10,9 @@ __all__ = [
     "verify_token",
     "get_password_hash",
     "verify_password",
+    "get_password_hash_async",
+    "verify_password_async",
+    "PasswordHasherBusy",
     "format_phone_number",
     "validate_phone_number",
     "generate_username"
@@ -1,7 +1,9 @@
 import re
 import random
 import string
+from postgrest.exceptions import APIError
 from typing import Optional
+import uuid
 
 def format_phone_number(phone_number: str) -> str:
     """
@@ -171,3 +173,36 @@ def calculate_age(birth_date) -> Optional[int]:
     from datetime import date
     today = date.today()
     return today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+
+def conversation_key(user1_id: str, user2_id: str) -> str:
+    """
+    Canonical key for the conversation between two users
+    
+    Matches the generated `messages.conversation_key` column: the two user IDs,
+    lowest first, joined by a colon.
+    
+    Args:
+        user1_id: One participant
+        user2_id: The other participant
+        
+    Returns:
+        str: Conversation key
+    """
+    first, second = sorted(str(uuid.UUID(str(user_id))) for user_id in (user1_id, user2_id))
+    return f"{first}:{second}"
+
+def is_row_error(error: Exception) -> bool:
+    """
+    Check whether a failed write was caused by the rows themselves
+    
+    Postgres data and integrity errors (SQLSTATE classes 22 and 23) fail the
+    same way on every retry; anything else (connection errors, timeouts,
+    gateway errors) may succeed later.
+    
+    Args:
+        error: Exception raised by a Supabase query or RPC
+        
+    Returns:
+        bool: True if retrying the same rows cannot succeed
+    """
+    return isinstance(error, APIError) and (error.code or '')[:2] in ('22', '23')
@@ -0,0 +1,109 @@
+import base64
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+def encode_cursor(created_at: str, row_id: str) -> str:
+    """
+    Encode a keyset position as an opaque cursor
+
+    Args:
+        created_at: Timestamp of the last row on the page
+        row_id: ID of the last row on the page (tie-breaker)
+
+    Returns:
+        str: URL-safe cursor string
+    """
+    raw = json.dumps([created_at, str(row_id)], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Opaque cursor string
+
+    Returns:
+        tuple: (created_at, id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        # Both values are interpolated into PostgREST filters, so only accept
+        # well-formed timestamps and UUIDs
+        datetime.fromisoformat(created_at.replace('Z', '+00:00'))
+        row_id = str(uuid.UUID(row_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+    return created_at, row_id
+
+def parse_timestamp(value: str) -> datetime:
+    """
+    Parse a stored ISO 8601 timestamp as naive UTC
+
+    Values written with and without an offset (or with a trailing 'Z')
+    compare correctly; timestamps without an offset are taken as UTC.
+
+    Args:
+        value: ISO 8601 timestamp
+
+    Returns:
+        datetime: Naive UTC datetime
+    """
+    ts = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+def sort_key(created_at: str, row_id: str) -> tuple:
+    """
+    Comparable (created_at, id) key for ordering rows in memory
+
+    Args:
+        created_at: ISO 8601 timestamp of the row
+        row_id: ID of the row (tie-breaker)
+
+    Returns:
+        tuple: (datetime, id), with the timestamp as naive UTC
+    """
+    return (parse_timestamp(created_at), row_id)
+
+def keyset_filter(cursor: str, column: str = 'created_at', descending: bool = True, id_column: str = 'id') -> str:
+    """
+    Build a PostgREST `or` filter selecting rows after a cursor
+
+    Rows are ordered by (column, id); the filter keeps rows strictly past the
+    cursor position in that order, so the query can be served by a composite
+    (column, id) index range scan.
+
+    Args:
+        cursor: Opaque cursor string
+        column: Timestamp column used for ordering
+        descending: True when paging from newest to oldest
+        id_column: Unique column used as the tie-breaker
+
+    Returns:
+        str: Filter body for `.or_()`
+    """
+    created_at, row_id = decode_cursor(cursor)
+    op = 'lt' if descending else 'gt'
+    # Quote values: timestamps contain characters that are reserved in PostgREST filters
+    return f'{column}.{op}."{created_at}",and({column}.eq."{created_at}",{id_column}.{op}.{row_id})'
+
+def next_cursor(rows: list, limit: int, column: str = 'created_at', id_column: str = 'id') -> Optional[str]:
+    """
+    Return the cursor for the page after `rows`, or None if this is the last page
+
+    Queries should fetch `limit + 1` rows; the extra row only signals that
+    another page exists and is trimmed by the caller.
+    """
+    if len(rows) <= limit:
+        return None
+    last = rows[limit - 1]
+    return encode_cursor(last[column], last[id_column])
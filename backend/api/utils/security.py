@@ -1,5 +1,7 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, Union
+import asyncio
 import jwt
 from jwt import PyJWTError
 from passlib.context import CryptContext
@@ -9,6 +11,18 @@ import uuid
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt is deliberately slow (hundreds of ms per call) and its C backends release
+# the GIL, so hashing runs on a small dedicated thread pool instead of the event loop.
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
+_password_jobs = 0  # running + queued jobs
+_password_jobs_rejected = 0
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing pool queue is full"""
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -17,6 +31,39 @@ def get_password_hash(password: str) -> str:
     """Hash a password"""
     return pwd_context.hash(password)
 
+async def _run_password_job(func, *args):
+    """Run a password job on the hashing pool, rejecting it if the queue is full"""
+    global _password_jobs, _password_jobs_rejected
+    
+    if _password_jobs >= settings.PASSWORD_HASH_WORKERS + settings.PASSWORD_HASH_MAX_QUEUE:
+        _password_jobs_rejected += 1
+        raise PasswordHasherBusy("Password hashing pool is saturated")
+    
+    _password_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_jobs -= 1
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool without blocking the event loop"""
+    return await _run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool without blocking the event loop"""
+    return await _run_password_job(get_password_hash, password)
+
+def password_pool_stats() -> dict:
+    """Queue depth counters for the password hashing pool"""
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "max_queue": settings.PASSWORD_HASH_MAX_QUEUE,
+        "in_flight": _password_jobs,
+        "queued": max(0, _password_jobs - settings.PASSWORD_HASH_WORKERS),
+        "rejected": _password_jobs_rejected
+    }
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -4,10 +4,11 @@
 -- Enable necessary extensions
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "pgcrypto";
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
 
 -- Create custom types
 CREATE TYPE friend_status AS ENUM ('pending', 'accepted', 'blocked');
-CREATE TYPE notification_type AS ENUM ('friend_request', 'message', 'post_like', 'story_view', 'birthday');
+CREATE TYPE notification_type AS ENUM ('friend_request', 'message', 'post_like', 'story_view', 'birthday', 'post_comment', 'friend_accept');
 
 -- Users table - Core user authentication and basic info
 CREATE TABLE users (
@@ -18,6 +19,9 @@ CREATE TABLE users (
     is_verified BOOLEAN DEFAULT FALSE,
     is_active BOOLEAN DEFAULT TRUE,
     last_login TIMESTAMPTZ,
+    -- Denormalized counters, maintained by triggers on friendships/posts
+    friend_count INTEGER NOT NULL DEFAULT 0,
+    post_count INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
@@ -62,6 +66,26 @@ CREATE TABLE friends (
     CHECK (requester_id != addressee_id)
 );
 
+-- Friendships table - Accepted friendships, one row per pair
+CREATE TABLE friendships (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    user1_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    user2_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE(user1_id, user2_id),
+    CHECK (user1_id != user2_id)
+);
+
+-- Friend requests table - Requests and their responses
+CREATE TABLE friend_requests (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    sender_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    recipient_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'accepted', 'rejected')),
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    CHECK (sender_id != recipient_id)
+);
+
 -- Posts table - User posts/content
 CREATE TABLE posts (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -95,6 +119,27 @@ CREATE TABLE post_comments (
     updated_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Home timeline table - Fan-out-on-write feed entries (FEED_ENGINE=timeline)
+-- One row per (recipient, post); written by create_post, retracted on post delete and unfriend
+CREATE TABLE home_timeline (
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    post_id UUID REFERENCES posts(id) ON DELETE CASCADE,
+    author_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (user_id, post_id)
+);
+
+-- Striped like counters (app.settings.like_counter_mode = 'sharded')
+-- Likes add +1/-1 to one of 16 rows per post instead of updating the posts row;
+-- fold_post_like_shards() periodically moves the sums into posts.likes_count.
+-- No foreign key: rows for deleted posts are simply discarded by the next fold.
+CREATE TABLE post_like_shards (
+    post_id UUID NOT NULL,
+    shard SMALLINT NOT NULL,
+    delta INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (post_id, shard)
+);
+
 -- Stories table - Temporary content that expires
 CREATE TABLE stories (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -125,22 +170,48 @@ CREATE TABLE messages (
     image_url TEXT,
     is_read BOOLEAN DEFAULT FALSE,
     read_at TIMESTAMPTZ,
+    -- Ordered participant pair, identical for both directions of a conversation
+    conversation_key TEXT GENERATED ALWAYS AS (
+        LEAST(sender_id, recipient_id)::TEXT || ':' || GREATEST(sender_id, recipient_id)::TEXT
+    ) STORED,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW(),
     CHECK (sender_id != recipient_id)
 );
 
--- Conversations table - To group messages and track conversation metadata
+-- Read watermarks - one row per participant per conversation. A message is
+-- read once its (created_at, id) is at or below its recipient's watermark;
+-- messages.is_read is no longer written.
+CREATE TABLE conversation_reads (
+    conversation_key TEXT NOT NULL,
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    last_read_at TIMESTAMPTZ NOT NULL,
+    last_read_message_id UUID NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (conversation_key, user_id)
+);
+
+-- Conversations table - one row per participant pair, maintained by triggers on
+-- messages and conversation_reads; serves the inbox (GET /messages/)
 CREATE TABLE conversations (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    -- participant_one_id is always the lower of the two IDs
     participant_one_id UUID REFERENCES users(id) ON DELETE CASCADE,
     participant_two_id UUID REFERENCES users(id) ON DELETE CASCADE,
-    last_message_id UUID REFERENCES messages(id),
+    conversation_key TEXT GENERATED ALWAYS AS (
+        participant_one_id::TEXT || ':' || participant_two_id::TEXT
+    ) STORED,
+    last_message_id UUID REFERENCES messages(id) ON DELETE SET NULL,
+    last_message_sender_id UUID,
+    last_message_preview TEXT,
     last_message_at TIMESTAMPTZ,
+    participant_one_unread INTEGER NOT NULL DEFAULT 0,
+    participant_two_unread INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW(),
     UNIQUE(participant_one_id, participant_two_id),
-    CHECK (participant_one_id != participant_two_id)
+    UNIQUE(conversation_key),
+    CHECK (participant_one_id < participant_two_id)
 );
 
 -- Notifications table
@@ -152,9 +223,32 @@ CREATE TABLE notifications (
     message TEXT,
     data JSONB, -- Additional data for the notification
     is_read BOOLEAN DEFAULT FALSE,
+    -- Aggregated notifications ("Alex and 41 others liked your post"): rows with
+    -- the same user_id and group_key inside the aggregation window are one row
+    group_key TEXT,
+    actor_count INTEGER NOT NULL DEFAULT 1,
+    recent_actors JSONB NOT NULL DEFAULT '[]', -- newest first: [{id, name, avatar_url}]
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- Distinct actors folded into an aggregated notification, so actor_count counts
+-- people rather than events (written by write_notifications())
+CREATE TABLE notification_actors (
+    notification_id UUID REFERENCES notifications(id) ON DELETE CASCADE,
+    actor_id UUID NOT NULL,
+    PRIMARY KEY (notification_id, actor_id)
+);
+
+-- Badge counters per user - maintained by triggers on messages, friend_requests
+-- and notifications so GET /badges is a single primary-key read
+CREATE TABLE user_badges (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    unread_messages INTEGER NOT NULL DEFAULT 0,
+    pending_friend_requests INTEGER NOT NULL DEFAULT 0,
+    unread_notifications INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
 -- Blocked users table
 CREATE TABLE blocked_users (
     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
@@ -174,6 +268,8 @@ CREATE TABLE user_settings (
     friend_requests_notifications BOOLEAN DEFAULT TRUE,
     message_notifications BOOLEAN DEFAULT TRUE,
     birthday_notifications BOOLEAN DEFAULT TRUE,
+    like_notifications BOOLEAN DEFAULT TRUE,
+    comment_notifications BOOLEAN DEFAULT TRUE,
     privacy_profile_public BOOLEAN DEFAULT FALSE,
     privacy_posts_public BOOLEAN DEFAULT FALSE,
     privacy_stories_public BOOLEAN DEFAULT FALSE,
@@ -185,14 +281,33 @@ CREATE TABLE user_settings (
 -- Create indexes for better performance
 CREATE INDEX idx_users_phone_number ON users(phone_number);
 CREATE INDEX idx_users_created_at ON users(created_at);
+-- Trigram indexes serve the substring/similarity matches in search_users()
+CREATE INDEX idx_users_username_trgm ON users USING gin (username gin_trgm_ops);
+CREATE INDEX idx_users_first_name_trgm ON users USING gin (first_name gin_trgm_ops);
+CREATE INDEX idx_users_last_name_trgm ON users USING gin (last_name gin_trgm_ops);
+CREATE INDEX idx_users_full_name_trgm ON users USING gin ((first_name || ' ' || last_name) gin_trgm_ops);
+-- Prefix matches for queries too short for trigrams (the short-query branch of search_users())
+CREATE INDEX idx_users_username_prefix ON users (lower(username) text_pattern_ops);
+CREATE INDEX idx_users_first_name_prefix ON users (lower(first_name) text_pattern_ops);
+CREATE INDEX idx_users_last_name_prefix ON users (lower(last_name) text_pattern_ops);
 CREATE INDEX idx_phone_verifications_phone ON phone_verifications(phone_number, country_code);
 CREATE INDEX idx_phone_verifications_expires ON phone_verifications(expires_at);
 CREATE INDEX idx_profiles_user_id ON profiles(user_id);
 CREATE INDEX idx_friends_requester ON friends(requester_id);
 CREATE INDEX idx_friends_addressee ON friends(addressee_id);
 CREATE INDEX idx_friends_status ON friends(status);
+-- Friend lists: WHERE user1_id = ? OR user2_id = ? (user1_id is covered by the unique index)
+CREATE INDEX idx_friendships_user2 ON friendships(user2_id);
+CREATE INDEX idx_friend_requests_sender ON friend_requests(sender_id, status);
+CREATE INDEX idx_friend_requests_recipient ON friend_requests(recipient_id, status);
 CREATE INDEX idx_posts_user_id ON posts(user_id);
 CREATE INDEX idx_posts_created_at ON posts(created_at DESC);
+-- Keyset (cursor) pagination for the home feed: ORDER BY created_at DESC, id DESC
+CREATE INDEX idx_posts_created_at_id ON posts(created_at DESC, id DESC);
+CREATE INDEX idx_posts_user_id_created_at_id ON posts(user_id, created_at DESC, id DESC);
+CREATE INDEX idx_home_timeline_user_created ON home_timeline(user_id, created_at DESC, post_id DESC);
+CREATE INDEX idx_home_timeline_post_id ON home_timeline(post_id);
+CREATE INDEX idx_home_timeline_user_author ON home_timeline(user_id, author_id);
 CREATE INDEX idx_post_likes_post_id ON post_likes(post_id);
 CREATE INDEX idx_post_likes_user_id ON post_likes(user_id);
 CREATE INDEX idx_post_comments_post_id ON post_comments(post_id);
@@ -202,9 +317,16 @@ CREATE INDEX idx_story_views_story_id ON story_views(story_id);
 CREATE INDEX idx_messages_sender ON messages(sender_id);
 CREATE INDEX idx_messages_recipient ON messages(recipient_id);
 CREATE INDEX idx_messages_created_at ON messages(created_at DESC);
-CREATE INDEX idx_conversations_participants ON conversations(participant_one_id, participant_two_id);
-CREATE INDEX idx_notifications_user_id ON notifications(user_id);
+-- Conversation history pages: WHERE conversation_key = ? ORDER BY created_at DESC, id DESC
+CREATE INDEX idx_messages_conversation_created ON messages(conversation_key, created_at DESC, id DESC);
+-- Inbox pages: WHERE participant_one_id = ? OR participant_two_id = ? ORDER BY last_message_at DESC, id DESC
+CREATE INDEX idx_conversations_one_last_message ON conversations(participant_one_id, last_message_at DESC, id DESC);
+CREATE INDEX idx_conversations_two_last_message ON conversations(participant_two_id, last_message_at DESC, id DESC);
+-- Notification pages and stream replay: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+CREATE INDEX idx_notifications_user_created ON notifications(user_id, created_at DESC, id DESC);
 CREATE INDEX idx_notifications_created_at ON notifications(created_at DESC);
+-- Open aggregation group lookup in write_notifications()
+CREATE INDEX idx_notifications_group ON notifications(user_id, group_key, created_at DESC) WHERE group_key IS NOT NULL;
 CREATE INDEX idx_blocked_users_blocker ON blocked_users(blocker_id);
 
 -- Create functions for automatic timestamp updates
@@ -227,19 +349,64 @@ CREATE TRIGGER update_conversations_updated_at BEFORE UPDATE ON conversations FO
 CREATE TRIGGER update_user_settings_updated_at BEFORE UPDATE ON user_settings FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
 -- Function to update post likes count
+-- In 'sharded' mode the delta goes to a random stripe of post_like_shards, so
+-- concurrent likes on a hot post no longer queue on the posts row lock
 CREATE OR REPLACE FUNCTION update_post_likes_count()
 RETURNS TRIGGER AS $$
+DECLARE
+    sharded BOOLEAN := current_setting('app.settings.like_counter_mode', true) = 'sharded';
 BEGIN
     IF TG_OP = 'INSERT' THEN
-        UPDATE posts SET likes_count = likes_count + 1 WHERE id = NEW.post_id;
+        IF sharded THEN
+            INSERT INTO post_like_shards (post_id, shard, delta)
+            VALUES (NEW.post_id, floor(random() * 16)::SMALLINT, 1)
+            ON CONFLICT (post_id, shard) DO UPDATE SET delta = post_like_shards.delta + 1;
+        ELSE
+            UPDATE posts SET likes_count = likes_count + 1 WHERE id = NEW.post_id;
+        END IF;
         RETURN NEW;
     ELSIF TG_OP = 'DELETE' THEN
-        UPDATE posts SET likes_count = likes_count - 1 WHERE id = OLD.post_id;
+        IF sharded THEN
+            INSERT INTO post_like_shards (post_id, shard, delta)
+            VALUES (OLD.post_id, floor(random() * 16)::SMALLINT, -1)
+            ON CONFLICT (post_id, shard) DO UPDATE SET delta = post_like_shards.delta - 1;
+        ELSE
+            UPDATE posts SET likes_count = likes_count - 1 WHERE id = OLD.post_id;
+        END IF;
         RETURN OLD;
     END IF;
     RETURN NULL;
 END;
-$$ language 'plpgsql';
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+-- Likes recorded in stripes but not folded into posts.likes_count yet
+CREATE OR REPLACE FUNCTION pending_post_likes(target_post_id UUID)
+RETURNS INTEGER AS $$
+    SELECT COALESCE(SUM(delta), 0)::INTEGER FROM post_like_shards WHERE post_id = target_post_id;
+$$ language 'sql' STABLE SECURITY DEFINER SET search_path = public;
+
+-- Fold pending like stripes into posts.likes_count (one UPDATE per post).
+-- Claiming rows with DELETE ... RETURNING makes concurrent folds safe; likes
+-- arriving meanwhile start new stripes. Returns the number of posts updated.
+CREATE OR REPLACE FUNCTION fold_post_like_shards()
+RETURNS INTEGER AS $$
+DECLARE
+    folded INTEGER;
+BEGIN
+    WITH claimed AS (
+        DELETE FROM post_like_shards RETURNING post_id, delta
+    ), totals AS (
+        SELECT post_id, SUM(delta) AS delta FROM claimed GROUP BY post_id
+    )
+    UPDATE posts
+    SET likes_count = posts.likes_count + totals.delta
+    FROM totals
+    WHERE posts.id = totals.post_id AND totals.delta <> 0;
+
+    GET DIAGNOSTICS folded = ROW_COUNT;
+    RETURN folded;
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
 
 -- Function to update post comments count
 CREATE OR REPLACE FUNCTION update_post_comments_count()
@@ -256,13 +423,44 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
--- Function to update story views count
+-- Function to update story views count (statement-level: one UPDATE per story
+-- for a bulk insert of buffered views)
 CREATE OR REPLACE FUNCTION update_story_views_count()
 RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE stories
+    SET views_count = views_count + counts.new_views
+    FROM (SELECT story_id, COUNT(*) AS new_views FROM new_story_views GROUP BY story_id) AS counts
+    WHERE stories.id = counts.story_id;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Function to update user friend counts
+CREATE OR REPLACE FUNCTION update_user_friend_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE users SET friend_count = friend_count + 1 WHERE id IN (NEW.user1_id, NEW.user2_id);
+        RETURN NEW;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE users SET friend_count = friend_count - 1 WHERE id IN (OLD.user1_id, OLD.user2_id);
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Function to update user post counts
+CREATE OR REPLACE FUNCTION update_user_post_count()
+RETURNS TRIGGER AS $$
 BEGIN
     IF TG_OP = 'INSERT' THEN
-        UPDATE stories SET views_count = views_count + 1 WHERE id = NEW.story_id;
+        UPDATE users SET post_count = post_count + 1 WHERE id = NEW.user_id;
         RETURN NEW;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE users SET post_count = post_count - 1 WHERE id = OLD.user_id;
+        RETURN OLD;
     END IF;
     RETURN NULL;
 END;
@@ -271,7 +469,459 @@ $$ language 'plpgsql';
 -- Create triggers for count updates
 CREATE TRIGGER trigger_update_post_likes_count AFTER INSERT OR DELETE ON post_likes FOR EACH ROW EXECUTE FUNCTION update_post_likes_count();
 CREATE TRIGGER trigger_update_post_comments_count AFTER INSERT OR DELETE ON post_comments FOR EACH ROW EXECUTE FUNCTION update_post_comments_count();
-CREATE TRIGGER trigger_update_story_views_count AFTER INSERT ON story_views FOR EACH ROW EXECUTE FUNCTION update_story_views_count();
+CREATE TRIGGER trigger_update_story_views_count AFTER INSERT ON story_views REFERENCING NEW TABLE AS new_story_views FOR EACH STATEMENT EXECUTE FUNCTION update_story_views_count();
+CREATE TRIGGER trigger_update_user_friend_count AFTER INSERT OR DELETE ON friendships FOR EACH ROW EXECUTE FUNCTION update_user_friend_count();
+CREATE TRIGGER trigger_update_user_post_count AFTER INSERT OR DELETE ON posts FOR EACH ROW EXECUTE FUNCTION update_user_post_count();
+
+-- Add deltas to a user's badge counters (never below zero)
+CREATE OR REPLACE FUNCTION bump_user_badges(target_user_id UUID, messages_delta INTEGER, requests_delta INTEGER, notifications_delta INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO user_badges (user_id, unread_messages, pending_friend_requests, unread_notifications)
+    VALUES (target_user_id, GREATEST(messages_delta, 0), GREATEST(requests_delta, 0), GREATEST(notifications_delta, 0))
+    ON CONFLICT (user_id) DO UPDATE SET
+        unread_messages = GREATEST(user_badges.unread_messages + messages_delta, 0),
+        pending_friend_requests = GREATEST(user_badges.pending_friend_requests + requests_delta, 0),
+        unread_notifications = GREATEST(user_badges.unread_notifications + notifications_delta, 0),
+        updated_at = NOW();
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+-- True if a message is at or below its recipient's read watermark
+CREATE OR REPLACE FUNCTION message_is_read(key TEXT, reader_id UUID, message_created_at TIMESTAMPTZ, message_id UUID)
+RETURNS BOOLEAN AS $$
+    SELECT EXISTS (
+        SELECT 1 FROM conversation_reads r
+        WHERE r.conversation_key = key AND r.user_id = reader_id
+          AND (r.last_read_at, r.last_read_message_id) >= (message_created_at, message_id)
+    );
+$$ language 'sql' STABLE SECURITY DEFINER SET search_path = public;
+
+-- Function to update the recipient's unread message badge
+CREATE OR REPLACE FUNCTION update_message_badges()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NOT message_is_read(NEW.conversation_key, NEW.recipient_id, NEW.created_at, NEW.id) THEN
+            PERFORM bump_user_badges(NEW.recipient_id, 1, 0, 0);
+        END IF;
+        RETURN NEW;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF NOT message_is_read(OLD.conversation_key, OLD.recipient_id, OLD.created_at, OLD.id) THEN
+            PERFORM bump_user_badges(OLD.recipient_id, -1, 0, 0);
+        END IF;
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+-- Function to clear the unread messages a watermark advance covers, in the
+-- reader's badge and in their side of the conversation
+CREATE OR REPLACE FUNCTION apply_read_watermark()
+RETURNS TRIGGER AS $$
+DECLARE
+    cleared INTEGER;
+BEGIN
+    SELECT COUNT(*) INTO cleared FROM messages m
+    WHERE m.conversation_key = NEW.conversation_key
+      AND m.recipient_id = NEW.user_id
+      AND (m.created_at, m.id) <= (NEW.last_read_at, NEW.last_read_message_id)
+      AND (TG_OP = 'INSERT' OR (m.created_at, m.id) > (OLD.last_read_at, OLD.last_read_message_id));
+
+    IF cleared > 0 THEN
+        PERFORM bump_user_badges(NEW.user_id, -cleared, 0, 0);
+        UPDATE conversations SET
+            participant_one_unread = CASE WHEN participant_one_id = NEW.user_id
+                THEN GREATEST(participant_one_unread - cleared, 0) ELSE participant_one_unread END,
+            participant_two_unread = CASE WHEN participant_two_id = NEW.user_id
+                THEN GREATEST(participant_two_unread - cleared, 0) ELSE participant_two_unread END
+        WHERE conversation_key = NEW.conversation_key;
+    END IF;
+    RETURN NEW;
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+-- Function to keep a conversation's last message and unread counts current.
+-- Runs in the sending transaction, so the inbox never disagrees with messages.
+CREATE OR REPLACE FUNCTION update_conversation_on_message()
+RETURNS TRIGGER AS $$
+DECLARE
+    one_id UUID;
+    two_id UUID;
+    unread_delta INTEGER;
+    newer BOOLEAN;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        one_id := LEAST(NEW.sender_id, NEW.recipient_id);
+        two_id := GREATEST(NEW.sender_id, NEW.recipient_id);
+        unread_delta := CASE WHEN message_is_read(NEW.conversation_key, NEW.recipient_id, NEW.created_at, NEW.id) THEN 0 ELSE 1 END;
+
+        INSERT INTO conversations (participant_one_id, participant_two_id, last_message_id, last_message_sender_id,
+                                   last_message_preview, last_message_at, participant_one_unread, participant_two_unread)
+        VALUES (one_id, two_id, NEW.id, NEW.sender_id, LEFT(NEW.content, 100), NEW.created_at,
+                CASE WHEN NEW.recipient_id = one_id THEN unread_delta ELSE 0 END,
+                CASE WHEN NEW.recipient_id = two_id THEN unread_delta ELSE 0 END)
+        ON CONFLICT (participant_one_id, participant_two_id) DO NOTHING;
+
+        IF NOT FOUND THEN
+            -- Messages can commit slightly out of created_at order; keep the newest
+            SELECT last_message_at IS NULL OR (last_message_at, last_message_id) < (NEW.created_at, NEW.id) INTO newer
+            FROM conversations WHERE participant_one_id = one_id AND participant_two_id = two_id FOR UPDATE;
+
+            UPDATE conversations SET
+                last_message_id = CASE WHEN newer THEN NEW.id ELSE last_message_id END,
+                last_message_sender_id = CASE WHEN newer THEN NEW.sender_id ELSE last_message_sender_id END,
+                last_message_preview = CASE WHEN newer THEN LEFT(NEW.content, 100) ELSE last_message_preview END,
+                last_message_at = CASE WHEN newer THEN NEW.created_at ELSE last_message_at END,
+                participant_one_unread = participant_one_unread + CASE WHEN NEW.recipient_id = one_id THEN unread_delta ELSE 0 END,
+                participant_two_unread = participant_two_unread + CASE WHEN NEW.recipient_id = two_id THEN unread_delta ELSE 0 END
+            WHERE participant_one_id = one_id AND participant_two_id = two_id;
+        END IF;
+        RETURN NEW;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF NOT message_is_read(OLD.conversation_key, OLD.recipient_id, OLD.created_at, OLD.id) THEN
+            UPDATE conversations SET
+                participant_one_unread = CASE WHEN participant_one_id = OLD.recipient_id
+                    THEN GREATEST(participant_one_unread - 1, 0) ELSE participant_one_unread END,
+                participant_two_unread = CASE WHEN participant_two_id = OLD.recipient_id
+                    THEN GREATEST(participant_two_unread - 1, 0) ELSE participant_two_unread END
+            WHERE conversation_key = OLD.conversation_key;
+        END IF;
+        -- The foreign key has already cleared last_message_id if this was the last message
+        IF EXISTS (SELECT 1 FROM conversations WHERE conversation_key = OLD.conversation_key AND last_message_id IS NULL) THEN
+            PERFORM refresh_conversations(ARRAY[OLD.conversation_key]);
+        END IF;
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+-- Function to update the recipient's pending friend request badge
+CREATE OR REPLACE FUNCTION update_friend_request_badges()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NEW.status = 'pending' THEN
+            PERFORM bump_user_badges(NEW.recipient_id, 0, 1, 0);
+        END IF;
+        RETURN NEW;
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF (OLD.status = 'pending') <> (NEW.status = 'pending') THEN
+            PERFORM bump_user_badges(NEW.recipient_id, 0, CASE WHEN NEW.status = 'pending' THEN 1 ELSE -1 END, 0);
+        END IF;
+        RETURN NEW;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF OLD.status = 'pending' THEN
+            PERFORM bump_user_badges(OLD.recipient_id, 0, -1, 0);
+        END IF;
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+-- Function to update the user's unread notification badge
+CREATE OR REPLACE FUNCTION update_notification_badges()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        IF NOT COALESCE(NEW.is_read, FALSE) THEN
+            PERFORM bump_user_badges(NEW.user_id, 0, 0, 1);
+        END IF;
+        RETURN NEW;
+    ELSIF TG_OP = 'UPDATE' THEN
+        IF COALESCE(OLD.is_read, FALSE) <> COALESCE(NEW.is_read, FALSE) THEN
+            PERFORM bump_user_badges(NEW.user_id, 0, 0, CASE WHEN NEW.is_read THEN -1 ELSE 1 END);
+        END IF;
+        RETURN NEW;
+    ELSIF TG_OP = 'DELETE' THEN
+        IF NOT COALESCE(OLD.is_read, FALSE) THEN
+            PERFORM bump_user_badges(OLD.user_id, 0, 0, -1);
+        END IF;
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+CREATE TRIGGER trigger_update_message_badges AFTER INSERT OR DELETE ON messages FOR EACH ROW EXECUTE FUNCTION update_message_badges();
+CREATE TRIGGER trigger_apply_read_watermark AFTER INSERT OR UPDATE ON conversation_reads FOR EACH ROW EXECUTE FUNCTION apply_read_watermark();
+CREATE TRIGGER trigger_update_conversation_on_message AFTER INSERT OR DELETE ON messages FOR EACH ROW EXECUTE FUNCTION update_conversation_on_message();
+CREATE TRIGGER trigger_update_friend_request_badges AFTER INSERT OR UPDATE OF status OR DELETE ON friend_requests FOR EACH ROW EXECUTE FUNCTION update_friend_request_badges();
+CREATE TRIGGER trigger_update_notification_badges AFTER INSERT OR UPDATE OF is_read OR DELETE ON notifications FOR EACH ROW EXECUTE FUNCTION update_notification_badges();
+
+-- Advance read watermarks in bulk. Takes a JSON array of {user_id,
+-- conversation_key, last_read_at, last_read_message_id}; a watermark only
+-- moves forward, and only for a participant of the conversation.
+CREATE OR REPLACE FUNCTION advance_read_watermarks(watermarks JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    advanced INTEGER;
+BEGIN
+    INSERT INTO conversation_reads (conversation_key, user_id, last_read_at, last_read_message_id, updated_at)
+    SELECT w.conversation_key, w.user_id, w.last_read_at, w.last_read_message_id, NOW()
+    FROM jsonb_to_recordset(watermarks) AS w(conversation_key TEXT, user_id UUID, last_read_at TIMESTAMPTZ, last_read_message_id UUID)
+    WHERE w.user_id::TEXT = ANY(string_to_array(w.conversation_key, ':'))
+    ON CONFLICT (conversation_key, user_id) DO UPDATE SET
+        last_read_at = EXCLUDED.last_read_at,
+        last_read_message_id = EXCLUDED.last_read_message_id,
+        updated_at = NOW()
+    WHERE (EXCLUDED.last_read_at, EXCLUDED.last_read_message_id)
+        > (conversation_reads.last_read_at, conversation_reads.last_read_message_id);
+
+    GET DIAGNOSTICS advanced = ROW_COUNT;
+    RETURN advanced;
+END;
+$$ language 'plpgsql';
+
+-- Rebuild conversations rows (last message, preview, unread counts) from
+-- messages for the given conversation keys, deleting rows with no messages
+-- left. Used to backfill the table and by the reconciliation job; returns the
+-- number of rows changed.
+CREATE OR REPLACE FUNCTION refresh_conversations(conversation_keys TEXT[])
+RETURNS INTEGER AS $$
+DECLARE
+    changed INTEGER;
+    removed INTEGER;
+BEGIN
+    WITH latest AS (
+        SELECT DISTINCT ON (m.conversation_key)
+               m.conversation_key, m.id, m.sender_id, m.content, m.created_at,
+               LEAST(m.sender_id, m.recipient_id) AS one_id,
+               GREATEST(m.sender_id, m.recipient_id) AS two_id
+        FROM messages m
+        WHERE m.conversation_key = ANY(conversation_keys)
+        ORDER BY m.conversation_key, m.created_at DESC, m.id DESC
+    )
+    INSERT INTO conversations (participant_one_id, participant_two_id, last_message_id, last_message_sender_id,
+                               last_message_preview, last_message_at, participant_one_unread, participant_two_unread)
+    SELECT l.one_id, l.two_id, l.id, l.sender_id, LEFT(l.content, 100), l.created_at,
+           (SELECT COUNT(*) FROM messages u WHERE u.conversation_key = l.conversation_key AND u.recipient_id = l.one_id
+              AND NOT message_is_read(u.conversation_key, u.recipient_id, u.created_at, u.id)),
+           (SELECT COUNT(*) FROM messages u WHERE u.conversation_key = l.conversation_key AND u.recipient_id = l.two_id
+              AND NOT message_is_read(u.conversation_key, u.recipient_id, u.created_at, u.id))
+    FROM latest l
+    ON CONFLICT (participant_one_id, participant_two_id) DO UPDATE SET
+        last_message_id = EXCLUDED.last_message_id,
+        last_message_sender_id = EXCLUDED.last_message_sender_id,
+        last_message_preview = EXCLUDED.last_message_preview,
+        last_message_at = EXCLUDED.last_message_at,
+        participant_one_unread = EXCLUDED.participant_one_unread,
+        participant_two_unread = EXCLUDED.participant_two_unread
+    WHERE conversations.last_message_id IS DISTINCT FROM EXCLUDED.last_message_id
+       OR conversations.last_message_preview IS DISTINCT FROM EXCLUDED.last_message_preview
+       OR conversations.participant_one_unread <> EXCLUDED.participant_one_unread
+       OR conversations.participant_two_unread <> EXCLUDED.participant_two_unread;
+    GET DIAGNOSTICS changed = ROW_COUNT;
+
+    DELETE FROM conversations c
+    WHERE c.conversation_key = ANY(conversation_keys)
+      AND NOT EXISTS (SELECT 1 FROM messages m WHERE m.conversation_key = c.conversation_key);
+    GET DIAGNOSTICS removed = ROW_COUNT;
+
+    RETURN changed + removed;
+END;
+$$ language 'plpgsql' SECURITY DEFINER SET search_path = public;
+
+-- Refresh every conversation of the given users (see refresh_conversations)
+CREATE OR REPLACE FUNCTION refresh_user_conversations(user_ids UUID[])
+RETURNS INTEGER AS $$
+    SELECT refresh_conversations(ARRAY(
+        SELECT DISTINCT m.conversation_key FROM messages m
+        WHERE m.sender_id = ANY(user_ids) OR m.recipient_id = ANY(user_ids)
+        UNION
+        SELECT c.conversation_key FROM conversations c
+        WHERE c.participant_one_id = ANY(user_ids) OR c.participant_two_id = ANY(user_ids)
+    ));
+$$ language 'sql';
+
+-- Write a batch of notifications. Takes a JSON array of {user_id, type, title,
+-- message, verb, data, group_key, actors, actor_ids, actor_count}, where
+-- actor_ids are the item's distinct actors and actor_count their number. Items
+-- without a group_key become new rows; the others are folded into the user's
+-- newest row with that group_key if it was created or bumped within
+-- `window_seconds`: the actor count grows by the actors not already recorded in
+-- notification_actors, the sample keeps the `sample_size` latest distinct
+-- actors, and the row is marked unread and moved to the top of the list.
+-- Returns the inserted or updated rows.
+CREATE OR REPLACE FUNCTION write_notifications(items JSONB, window_seconds INTEGER, sample_size INTEGER)
+RETURNS SETOF notifications AS $$
+DECLARE
+    item RECORD;
+    existing notifications%ROWTYPE;
+    created notifications%ROWTYPE;
+    new_actors INTEGER;
+    total INTEGER;
+    actors JSONB;
+BEGIN
+    FOR item IN
+        SELECT * FROM jsonb_to_recordset(items) AS x(user_id UUID, type notification_type, title TEXT, message TEXT,
+            verb TEXT, data JSONB, group_key TEXT, actors JSONB, actor_ids JSONB, actor_count INTEGER)
+    LOOP
+        IF item.group_key IS NOT NULL THEN
+            -- Serialize writers of the same group so concurrent batches do not both open one
+            PERFORM pg_advisory_xact_lock(hashtext(item.user_id::TEXT || ':' || item.group_key));
+            SELECT * INTO existing FROM notifications
+            WHERE user_id = item.user_id AND group_key = item.group_key
+              AND created_at > NOW() - make_interval(secs => window_seconds)
+            ORDER BY created_at DESC LIMIT 1
+            FOR UPDATE;
+
+            IF FOUND THEN
+                -- Repeat actors (a second comment, a like after unliking) do not count again
+                WITH added AS (
+                    INSERT INTO notification_actors (notification_id, actor_id)
+                    SELECT existing.id, actor_id::UUID FROM jsonb_array_elements_text(item.actor_ids) AS actor_id
+                    ON CONFLICT DO NOTHING
+                    RETURNING 1
+                )
+                SELECT COUNT(*) INTO new_actors FROM added;
+                total := existing.actor_count + new_actors;
+                SELECT COALESCE(jsonb_agg(sample.actor ORDER BY sample.position), '[]') INTO actors
+                FROM (
+                    SELECT deduped.actor, deduped.position FROM (
+                        SELECT DISTINCT ON (a.actor->>'id') a.actor, a.position
+                        FROM jsonb_array_elements(item.actors || existing.recent_actors) WITH ORDINALITY AS a(actor, position)
+                        ORDER BY a.actor->>'id', a.position
+                    ) deduped
+                    ORDER BY deduped.position
+                    LIMIT sample_size
+                ) sample;
+
+                RETURN QUERY
+                UPDATE notifications SET
+                    actor_count = total,
+                    recent_actors = actors,
+                    title = item.title,
+                    message = CASE WHEN total = 1 THEN item.message
+                        ELSE (actors->0->>'name') || ' and ' || (total - 1)
+                             || CASE WHEN total = 2 THEN ' other ' ELSE ' others ' END || item.verb
+                    END,
+                    data = item.data,
+                    is_read = FALSE,
+                    created_at = NOW()
+                WHERE id = existing.id
+                RETURNING *;
+                CONTINUE;
+            END IF;
+        END IF;
+
+        INSERT INTO notifications (user_id, type, title, message, data, group_key, actor_count, recent_actors)
+        VALUES (
+            item.user_id, item.type, item.title,
+            CASE WHEN item.actor_count = 1 THEN item.message
+                 ELSE (item.actors->0->>'name') || ' and ' || (item.actor_count - 1)
+                      || CASE WHEN item.actor_count = 2 THEN ' other ' ELSE ' others ' END || item.verb
+            END,
+            item.data, item.group_key, item.actor_count, item.actors
+        )
+        RETURNING * INTO created;
+
+        IF item.group_key IS NOT NULL THEN
+            INSERT INTO notification_actors (notification_id, actor_id)
+            SELECT created.id, actor_id::UUID FROM jsonb_array_elements_text(item.actor_ids) AS actor_id
+            ON CONFLICT DO NOTHING;
+        END IF;
+        RETURN NEXT created;
+    END LOOP;
+END;
+$$ language 'plpgsql';
+
+-- Recompute badge counters for the given users and fix any drift (creating
+-- missing rows). Used by the reconciliation job (scripts/reconcile_badges.py).
+-- Returns the number of users corrected.
+CREATE OR REPLACE FUNCTION reconcile_user_badges(user_ids UUID[])
+RETURNS INTEGER AS $$
+DECLARE
+    repaired INTEGER;
+BEGIN
+    -- Lock existing rows first so concurrent trigger updates are not lost
+    PERFORM 1 FROM user_badges WHERE user_id = ANY(user_ids) ORDER BY user_id FOR UPDATE;
+
+    INSERT INTO user_badges (user_id, unread_messages, pending_friend_requests, unread_notifications)
+    SELECT u.id,
+           (SELECT COUNT(*) FROM messages m WHERE m.recipient_id = u.id AND NOT message_is_read(m.conversation_key, m.recipient_id, m.created_at, m.id)),
+           (SELECT COUNT(*) FROM friend_requests fr WHERE fr.recipient_id = u.id AND fr.status = 'pending'),
+           (SELECT COUNT(*) FROM notifications n WHERE n.user_id = u.id AND NOT COALESCE(n.is_read, FALSE))
+    FROM users u
+    WHERE u.id = ANY(user_ids)
+    ON CONFLICT (user_id) DO UPDATE SET
+        unread_messages = EXCLUDED.unread_messages,
+        pending_friend_requests = EXCLUDED.pending_friend_requests,
+        unread_notifications = EXCLUDED.unread_notifications,
+        updated_at = NOW()
+    WHERE user_badges.unread_messages <> EXCLUDED.unread_messages
+       OR user_badges.pending_friend_requests <> EXCLUDED.pending_friend_requests
+       OR user_badges.unread_notifications <> EXCLUDED.unread_notifications;
+
+    GET DIAGNOSTICS repaired = ROW_COUNT;
+    RETURN repaired;
+END;
+$$ language 'plpgsql';
+
+-- Like and unlike posts for one user in a single idempotent round trip.
+-- Liking an already-liked post or unliking a post that is not liked is a no-op;
+-- unknown post IDs are skipped. Returns the fresh count and liked state per post,
+-- and whether this call inserted the like (false for likes that already existed).
+CREATE OR REPLACE FUNCTION set_post_likes(acting_user_id UUID, like_post_ids UUID[], unlike_post_ids UUID[])
+RETURNS TABLE (post_id UUID, likes_count INTEGER, is_liked BOOLEAN, newly_liked BOOLEAN) AS $$
+#variable_conflict use_column
+DECLARE
+    inserted_post_ids UUID[];
+BEGIN
+    WITH inserted AS (
+        INSERT INTO post_likes (post_id, user_id)
+        SELECT posts.id, acting_user_id FROM posts WHERE posts.id = ANY(like_post_ids)
+        ON CONFLICT (post_id, user_id) DO NOTHING
+        RETURNING post_likes.post_id
+    )
+    SELECT COALESCE(array_agg(inserted.post_id), '{}') INTO inserted_post_ids FROM inserted;
+
+    DELETE FROM post_likes
+    WHERE post_likes.user_id = acting_user_id AND post_likes.post_id = ANY(unlike_post_ids);
+
+    -- The count triggers have run by now; add stripes not yet folded (sharded mode)
+    RETURN QUERY
+    SELECT posts.id,
+           posts.likes_count + pending_post_likes(posts.id),
+           EXISTS (SELECT 1 FROM post_likes WHERE post_likes.post_id = posts.id AND post_likes.user_id = acting_user_id),
+           posts.id = ANY(inserted_post_ids)
+    FROM posts
+    WHERE posts.id = ANY(like_post_ids || unlike_post_ids);
+END;
+$$ language 'plpgsql';
+
+-- Recompute friend_count/post_count for the given users and fix any drift.
+-- Used for the one-time backfill and the periodic repair job
+-- (scripts/repair_user_counts.py). Returns the number of users corrected.
+CREATE OR REPLACE FUNCTION repair_user_counts(user_ids UUID[])
+RETURNS INTEGER AS $$
+DECLARE
+    repaired INTEGER;
+BEGIN
+    -- Lock the rows first so concurrent count triggers either commit before
+    -- the recount below or wait until it is written
+    PERFORM 1 FROM users WHERE id = ANY(user_ids) ORDER BY id FOR UPDATE;
+
+    WITH actual AS (
+        SELECT u.id,
+               (SELECT COUNT(*) FROM friendships f WHERE f.user1_id = u.id OR f.user2_id = u.id) AS friend_count,
+               (SELECT COUNT(*) FROM posts p WHERE p.user_id = u.id) AS post_count
+        FROM users u
+        WHERE u.id = ANY(user_ids)
+    )
+    UPDATE users
+    SET friend_count = actual.friend_count, post_count = actual.post_count
+    FROM actual
+    WHERE users.id = actual.id
+      AND (users.friend_count <> actual.friend_count OR users.post_count <> actual.post_count);
+
+    GET DIAGNOSTICS repaired = ROW_COUNT;
+    RETURN repaired;
+END;
+$$ language 'plpgsql';
 
 -- Function to clean up expired stories
 CREATE OR REPLACE FUNCTION cleanup_expired_stories()
@@ -289,18 +939,92 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- Function to search users by name or username, ranked by match quality
+-- Exact username > username prefix > name prefix > trigram similarity
+CREATE OR REPLACE FUNCTION search_users(search_query TEXT, requesting_user_id UUID, result_limit INTEGER DEFAULT 20)
+RETURNS TABLE (
+    id UUID,
+    first_name VARCHAR,
+    last_name VARCHAR,
+    username VARCHAR,
+    avatar_url TEXT,
+    is_private BOOLEAN,
+    score REAL
+) AS $$
+DECLARE
+    q TEXT := lower(trim(search_query));
+    -- Escape LIKE wildcards so user input is matched literally
+    pattern TEXT := replace(replace(replace(lower(trim(search_query)), '\', '\\'), '%', '\%'), '_', '\_');
+BEGIN
+    -- One or two characters have no trigrams to index, so only match prefixes,
+    -- which the lower(...) text_pattern_ops indexes can serve
+    IF length(q) < 3 THEN
+        RETURN QUERY
+        SELECT u.id, u.first_name, u.last_name, u.username, u.avatar_url, u.is_private,
+            (CASE
+                WHEN lower(u.username) = q THEN 3.0
+                WHEN lower(u.username) LIKE pattern || '%' THEN 2.0
+                ELSE 1.0
+            END)::REAL AS score
+        FROM users u
+        WHERE u.id <> requesting_user_id
+          AND u.is_active
+          AND (
+              lower(u.username) LIKE pattern || '%'
+              OR lower(u.first_name) LIKE pattern || '%'
+              OR lower(u.last_name) LIKE pattern || '%'
+          )
+        ORDER BY score DESC, u.username
+        LIMIT result_limit;
+        RETURN;
+    END IF;
+
+    RETURN QUERY
+    SELECT u.id, u.first_name, u.last_name, u.username, u.avatar_url, u.is_private,
+        (CASE
+            WHEN lower(u.username) = q THEN 3.0
+            WHEN lower(u.username) LIKE pattern || '%' THEN 2.0
+            WHEN lower(u.first_name) LIKE pattern || '%' OR lower(u.last_name) LIKE pattern || '%' THEN 1.0
+            ELSE 0.0
+        END + GREATEST(
+            similarity(u.username, q),
+            similarity(u.first_name || ' ' || u.last_name, q)
+        ))::REAL AS score
+    FROM users u
+    WHERE u.id <> requesting_user_id
+      AND u.is_active
+      AND (
+          u.username ILIKE '%' || pattern || '%'
+          OR u.first_name ILIKE '%' || pattern || '%'
+          OR u.last_name ILIKE '%' || pattern || '%'
+          OR (u.first_name || ' ' || u.last_name) % q
+      )
+    ORDER BY score DESC, u.username
+    LIMIT result_limit;
+END;
+-- Plan each call with the actual pattern; a generic plan cannot use the prefix indexes
+$$ language 'plpgsql' STABLE SET plan_cache_mode = force_custom_plan;
+
 -- Row Level Security (RLS) Policies
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE profiles ENABLE ROW LEVEL SECURITY;
 ALTER TABLE friends ENABLE ROW LEVEL SECURITY;
+ALTER TABLE friendships ENABLE ROW LEVEL SECURITY;
+ALTER TABLE friend_requests ENABLE ROW LEVEL SECURITY;
 ALTER TABLE posts ENABLE ROW LEVEL SECURITY;
 ALTER TABLE post_likes ENABLE ROW LEVEL SECURITY;
 ALTER TABLE post_comments ENABLE ROW LEVEL SECURITY;
+ALTER TABLE home_timeline ENABLE ROW LEVEL SECURITY;
+ALTER TABLE user_badges ENABLE ROW LEVEL SECURITY;
+ALTER TABLE conversation_reads ENABLE ROW LEVEL SECURITY;
+-- Internal counters: no policies, only the SECURITY DEFINER functions touch it
+ALTER TABLE post_like_shards ENABLE ROW LEVEL SECURITY;
 ALTER TABLE stories ENABLE ROW LEVEL SECURITY;
 ALTER TABLE story_views ENABLE ROW LEVEL SECURITY;
 ALTER TABLE messages ENABLE ROW LEVEL SECURITY;
 ALTER TABLE conversations ENABLE ROW LEVEL SECURITY;
 ALTER TABLE notifications ENABLE ROW LEVEL SECURITY;
+ALTER TABLE notification_actors ENABLE ROW LEVEL SECURITY;
 ALTER TABLE blocked_users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE user_settings ENABLE ROW LEVEL SECURITY;
 
@@ -317,6 +1041,8 @@ CREATE POLICY "Users can update own profile" ON profiles FOR UPDATE USING (auth.
 CREATE POLICY "Users can view their friend relationships" ON friends FOR SELECT USING (auth.uid() = requester_id OR auth.uid() = addressee_id);
 CREATE POLICY "Users can create friend requests" ON friends FOR INSERT WITH CHECK (auth.uid() = requester_id);
 CREATE POLICY "Users can update friend requests they're involved in" ON friends FOR UPDATE USING (auth.uid() = requester_id OR auth.uid() = addressee_id);
+CREATE POLICY "Users can view their friendships" ON friendships FOR SELECT USING (auth.uid() = user1_id OR auth.uid() = user2_id);
+CREATE POLICY "Users can view their friend requests" ON friend_requests FOR SELECT USING (auth.uid() = sender_id OR auth.uid() = recipient_id);
 
 -- Post policies
 CREATE POLICY "Users can view public posts and posts from friends" ON posts FOR SELECT USING (
@@ -332,6 +1058,12 @@ CREATE POLICY "Users can create their own posts" ON posts FOR INSERT WITH CHECK
 CREATE POLICY "Users can update their own posts" ON posts FOR UPDATE USING (auth.uid() = user_id);
 CREATE POLICY "Users can delete their own posts" ON posts FOR DELETE USING (auth.uid() = user_id);
 
+-- Home timeline policies
+CREATE POLICY "Users can view their own timeline" ON home_timeline FOR SELECT USING (auth.uid() = user_id);
+CREATE POLICY "Users can view their own badges" ON user_badges FOR SELECT USING (auth.uid() = user_id);
+CREATE POLICY "Participants can view their conversations" ON conversations FOR SELECT USING (auth.uid() = participant_one_id OR auth.uid() = participant_two_id);
+CREATE POLICY "Participants can view read watermarks" ON conversation_reads FOR SELECT USING (auth.uid()::TEXT = ANY(string_to_array(conversation_key, ':')));
+
 -- Message policies
 CREATE POLICY "Users can view their own messages" ON messages FOR SELECT USING (auth.uid() = sender_id OR auth.uid() = recipient_id);
 CREATE POLICY "Users can send messages" ON messages FOR INSERT WITH CHECK (auth.uid() = sender_id);
@@ -340,6 +1072,9 @@ CREATE POLICY "Users can update their own messages" ON messages FOR UPDATE USING
 -- Notification policies
 CREATE POLICY "Users can view their own notifications" ON notifications FOR SELECT USING (auth.uid() = user_id);
 CREATE POLICY "Users can update their own notifications" ON notifications FOR UPDATE USING (auth.uid() = user_id);
+CREATE POLICY "Users can view actors of their notifications" ON notification_actors FOR SELECT USING (
+    EXISTS (SELECT 1 FROM notifications n WHERE n.id = notification_id AND n.user_id = auth.uid())
+);
 
 -- User settings policies
 CREATE POLICY "Users can view their own settings" ON user_settings FOR SELECT USING (auth.uid() = user_id);